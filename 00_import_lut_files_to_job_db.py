@@ -0,0 +1,48 @@
+import re
+
+import gmw_job_db
+
+# One-off migration of the touch (LUT) files written by stages 05 and 06
+# before the job database (gmw_jobs.db) was used, so the models and tiles
+# already submitted are not submitted again. Can be run more than once;
+# jobs already in the database are not changed.
+
+job_db_file = "gmw_jobs.db"
+
+# Stage 05: {prj_name}_mdl_{mdl_n}.txt
+mdls_created_lut_dir = "gmw_prj_mdls_created"
+mdls_job_stage = "train_mdls"
+# Stage 06: {tile_name}_{year}_mng_cls_count_{mdl_n}_subd.txt
+sub_cls_lut_dir = "gmw_tiles_cls_sub"
+
+mdl_lut_re = re.compile(r"^(?P<prj>.+)_mdl_(?P<mdl_n>\d+)$")
+cls_lut_re = re.compile(r"^(?P<job>.+_(?P<year>\d{4})_mng_cls_count_.+)_subd$")
+
+
+def get_mdl_job(lut_name):
+    lut_match = mdl_lut_re.match(lut_name)
+    if lut_match is None:
+        return None
+    return (
+        mdls_job_stage,
+        f"{lut_match.group('prj')}_rf_cls_{lut_match.group('mdl_n')}",
+    )
+
+
+def get_cls_job(lut_name):
+    lut_match = cls_lut_re.match(lut_name)
+    if lut_match is None:
+        return None
+    return f"apply_mdls_{lut_match.group('year')}", lut_match.group("job")
+
+
+if __name__ == "__main__":
+    job_db_conn = gmw_job_db.open_job_db(job_db_file)
+    for lut_dir, get_job in [
+        (mdls_created_lut_dir, get_mdl_job),
+        (sub_cls_lut_dir, get_cls_job),
+    ]:
+        n_stage_jobs = gmw_job_db.import_lut_files(job_db_conn, lut_dir, get_job)
+        for stage, n_jobs in sorted(n_stage_jobs.items()):
+            print(f"{lut_dir}: {n_jobs} jobs added to {stage}")
+    job_db_conn.close()
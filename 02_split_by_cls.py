@@ -1,9 +1,17 @@
 
+# Only required if 01_create_training_subsets.py was run with split_by_cls = False
 import os
 import glob
 
 import rsgislib.tools.filetools
 
+from gmw_vec_tools import (
+    get_split_out_vec_lyr,
+    read_vec_gdf,
+    run_write_jobs,
+    write_vec_gdf,
+)
+
 
 def split_by_attribute(
     vec_file: str,
@@ -18,6 +26,7 @@ def split_by_attribute(
     out_vec_base_post:str = "",
     dissolve: bool = False,
     chk_lyr_names: bool = True,
+    n_workers: int = 1,
 ):
     """
     A function which splits a vector layer by an attribute value into either
@@ -40,12 +49,16 @@ def split_by_attribute(
     :param chk_lyr_names: If True (default) layer names (from split_col_name) will be
                           checked, which means punctuation removed and all characters
                           being ascii characters.
+    :param n_workers: the number of threads used to write the outputs while the
+                      next layer is calculated (Default: 1). Multiple layer
+                      outputs are always written in sequence.
 
     """
-    import geopandas
+    import functools
+
     import tqdm
 
-    import rsgislib.tools.utils
+    import rsgislib
 
     if multi_layers:
         if out_vec_file is None:
@@ -60,74 +73,49 @@ def split_by_attribute(
                 "and file extension needs to be specified."
             )
 
-    if "parquet" in os.path.basename(vec_file):
-        base_gpdf = geopandas.read_parquet(vec_file)
-    else:
-        base_gpdf = geopandas.read_file(vec_file, layer=vec_lyr)
-    unq_col = base_gpdf[split_col_name]
-    unq_vals = unq_col.unique()
-
-    for val in tqdm.tqdm(unq_vals):
-        # Subset to value.
-        c_gpdf = base_gpdf.loc[base_gpdf[split_col_name] == val]
-        # Check for empty or NA geometries.
-        c_gpdf = c_gpdf[~c_gpdf.is_empty]
-        c_gpdf = c_gpdf[~c_gpdf.isna()]
-        # Dissolve if requested.
-        if dissolve:
-            # Test resolve if an error thrown then it is probably a topological
-            # error which can sometimes be solved using a 0 buffer, so try that
-            # to see if it works.
-            try:
-                c_gpdf.dissolve(by=split_col_name)
-            except:
-                c_gpdf["geometry"] = c_gpdf.buffer(0)
-                c_gpdf = c_gpdf.dissolve(by=split_col_name)
-        # Write output to disk.
-        val_str = f"{val}"
-        if multi_layers and (out_format == "GPKG"):
-            if chk_lyr_names:
-                val_str = rsgislib.tools.utils.check_str(
-                    val_str,
-                    rm_non_ascii=True,
-                    rm_dashs=True,
-                    rm_spaces=False,
-                    rm_punc=True,
+    base_gpdf = read_vec_gdf(vec_file, vec_lyr)
+    # Check for empty or NA geometries.
+    base_gpdf = base_gpdf[~(base_gpdf.is_empty | base_gpdf.geometry.isna())]
+    split_grps = base_gpdf.groupby(split_col_name, sort=False)
+
+    def _get_write_jobs():
+        for val, c_gpdf in tqdm.tqdm(split_grps, total=split_grps.ngroups):
+            # Dissolve if requested.
+            if dissolve:
+                # Test resolve if an error thrown then it is probably a topological
+                # error which can sometimes be solved using a 0 buffer, so try that
+                # to see if it works.
+                try:
+                    c_gpdf = c_gpdf.dissolve(by=split_col_name)
+                except:
+                    c_gpdf["geometry"] = c_gpdf.buffer(0)
+                    c_gpdf = c_gpdf.dissolve(by=split_col_name)
+            # Write output to disk.
+            if multi_layers and (out_format == "GPKG"):
+                val_str = get_split_out_vec_lyr(val, "", "", chk_lyr_names)
+                yield functools.partial(
+                    c_gpdf.to_file, out_vec_file, layer=val_str, driver="GPKG"
                 )
-            c_gpdf.to_file(out_vec_file, layer=val_str, driver="GPKG")
-        else:
-            if chk_lyr_names:
-                val_str = rsgislib.tools.utils.check_str(
-                    val_str,
-                    rm_non_ascii=True,
-                    rm_dashs=True,
-                    rm_spaces=False,
-                    rm_punc=True,
-                )
-
-            out_vec_base_pre_tmp = out_vec_base_pre
-            if out_vec_base_pre != "":
-                out_vec_base_pre_tmp = f"{out_vec_base_pre}_"
-            out_vec_base_post_tmp = out_vec_base_post
-            if out_vec_base_post != "":
-                out_vec_base_post_tmp = f"_{out_vec_base_post}"
-            out_vec_lyr = f"{out_vec_base_pre_tmp}{val_str}{out_vec_base_post_tmp}"
-            out_vec_file = os.path.join(
-                out_file_path, f"{out_vec_lyr}.{out_file_ext}"
-            )
-            if out_format == "PARQUET":
-                out_compress = None
-                if "gzip" in out_file_ext:
-                    out_compress = "gzip"
-                elif "sz" in out_file_ext:
-                    out_compress = "snappy"
-
-                c_gpdf.to_parquet(out_vec_file, compression=out_compress)
-            elif out_format == "GPKG":
-                c_gpdf.to_file(out_vec_file, layer=out_vec_lyr, driver=out_format)
             else:
-                c_gpdf.to_file(out_vec_file, driver=out_format)
+                out_vec_lyr = get_split_out_vec_lyr(
+                    val, out_vec_base_pre, out_vec_base_post, chk_lyr_names
+                )
+                out_lyr_vec_file = os.path.join(
+                    out_file_path, f"{out_vec_lyr}.{out_file_ext}"
+                )
+                yield functools.partial(
+                    write_vec_gdf,
+                    c_gpdf,
+                    out_lyr_vec_file,
+                    out_vec_lyr,
+                    out_file_ext,
+                    out_format,
+                )
 
+    if multi_layers and (out_format == "GPKG"):
+        # Layers are all written to the same file so cannot be written in parallel.
+        n_workers = 1
+    run_write_jobs(_get_write_jobs(), n_workers=n_workers)
 
 
 
@@ -148,5 +136,6 @@ for vec_file in vec_files:
         out_vec_base_post = "",
         dissolve = False,
         chk_lyr_names = True,
+        n_workers = 4,
     )
 
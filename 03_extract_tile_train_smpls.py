@@ -1,9 +1,18 @@
 import os
+import functools
 import ee
 import geopandas
 import datetime
 import pb_gee_tools.datasets
-import pb_gee_tools.convert_types
+
+import gmw_gee_tasks
+import gmw_gee_tools
+import gmw_indices
+import gmw_smpl_tools
+import gmw_job_db
+import gmw_smpls_store
+import gmw_tile_cat
+import gmw_tile_tools
 
 ee.Authenticate()
 ee.Initialize(project="ee-petebunting-gmw")
@@ -12,45 +21,7 @@ ee.Initialize(project="ee-petebunting-gmw")
 def _make_float(img):
     return img.float()
 
-
-def calc_band_indices(img):
-    img = img.multiply(0.0001).float()
-    ndvi = img.normalizedDifference(["NIR", "Red"]).rename("NDVI")
-    ndwi = img.normalizedDifference(["NIR", "SWIR1"]).rename("NDWI")
-    nbr = img.normalizedDifference(["NIR", "SWIR2"]).rename("NBR")
-    evi = img.expression(
-        "2.5 * ((NIR - RED) / (NIR + 6 * RED - 7.5 * BLUE + 1))",
-        {
-            "NIR": img.select("NIR"),
-            "RED": img.select("Red"),
-            "BLUE": img.select("Blue"),
-        },
-    ).rename(["EVI"])
-    mvi = img.expression(
-        "((NIR - GREEN) / (SWIR - GREEN))",
-        {
-            "NIR": img.select("NIR"),
-            "SWIR": img.select("SWIR1"),
-            "GREEN": img.select("Green"),
-        },
-    ).rename(["MVI"])
-
-    return img.addBands([ndvi, ndwi, nbr, evi, mvi])
-
-
-bands = [
-    "Blue",
-    "Green",
-    "Red",
-    "NIR",
-    "SWIR1",
-    "SWIR2",
-    "NDVI",
-    "NDWI",
-    "NBR",
-    "EVI",
-    "MVI",
-]
+bands = gmw_indices.bands
 
 start_date = datetime.datetime(year=2020, month=1, day=1)
 end_date = datetime.datetime(year=2020, month=12, day=31)
@@ -59,16 +30,33 @@ out_no_data_val = 0.0
 # gmw_hab_msk_img = ee.Image('projects/ee-petebunting-gmw/assets/gmw_v23_hab_msk')
 
 train_data_dir = "gmw_prj_train_data_split"
+# If True the samples are read from the hive partitioned parquet dataset
+# written by 01_create_training_subsets.py rather than individual files.
+use_smpls_store = False
+train_data_store_dir = "gmw_prj_train_data_store"
 train_csv_smpls_dir = "gmw_tile_smpls_csv_files"
+# If True the number of training samples for each tile is calculated before
+# the export. This is a blocking request which evaluates the whole sampling so
+# it is off by default; the counts are recorded by 04_merge_smpls_for_prjs.py
+# from the exported CSV files.
+calc_n_smpls = False
+# The maximum number of points sent to GEE within a single request. Tiles with
+# more points are sampled and exported in parts ({tile}_cls_smpls_{n}, where
+# the first part is {tile}_cls_smpls), which are all read by stage 04.
+max_n_req_pts = 100000
+job_db_file = "gmw_jobs.db"
+job_stage = "tile_smpls"
+max_running_tasks = 20
 
 prj_rgns_vec_file = "gmw_tiles_prj_def.geojson"
 prj_rgns_vec_lyr = "gmw_tiles_prj_def"
 prjs_col_name = "gmw_prj"
 tiles_col_name = "gmw_tile_name"
 
-prj_tiles_gdf = geopandas.read_file(prj_rgns_vec_file, layer=prj_rgns_vec_lyr)
-prjs_unq_col = prj_tiles_gdf[prjs_col_name]
-prjs_names = prjs_unq_col.unique()
+tile_cat = gmw_tile_cat.read_tile_cat(
+    prj_rgns_vec_file, prj_rgns_vec_lyr, prjs_col_name, tiles_col_name
+)
+prjs_names = tile_cat["prjs"]
 
 start_prj = 0
 n_prjs = len(prjs_names)
@@ -77,11 +65,26 @@ end_tile = (n_prjs-start_prj)
 
 prjs_names = prjs_names[start_prj:end_tile]
 
+if use_smpls_store:
+    train_data_parts = gmw_smpls_store.get_partitions(
+        train_data_store_dir, [prjs_col_name, "ref_cls"]
+    )
+
+job_db_conn = gmw_job_db.open_job_db(job_db_file)
+# Tiles which have been exported or are still running.
+tile_smpls_jobs = gmw_job_db.get_jobs(
+    job_db_conn,
+    job_stage,
+    states=[gmw_job_db.JOB_SUCCEEDED] + gmw_job_db.JOB_ACTIVE_STATES,
+)
+job_db_conn.close()
+
+gee_tasks = list()
 n = 1
 for prj_name in prjs_names:
     print(f"Processing {prj_name} - {n} of {n_prjs}")
 
-    prj_sub_gdf = prj_tiles_gdf[prj_tiles_gdf[prjs_col_name] == prj_name]
+    prj_tiles_df = gmw_tile_cat.get_prj_tiles_df(tile_cat, prj_name, tiles_col_name)
 
     vec_mng_smpls_file = os.path.join(
         train_data_dir, f"{prj_name}_refs_smps_1.parquet.sz"
@@ -93,18 +96,44 @@ for prj_name in prjs_names:
         train_data_dir, f"{prj_name}_refs_smps_3.parquet.sz"
     )
 
-    if (
-        os.path.exists(vec_mng_smpls_file)
-        and os.path.exists(vec_wtr_smpls_file)
-        and os.path.exists(vec_oth_smpls_file)
-    ):
-        mng_pts_gdf = geopandas.read_parquet(vec_mng_smpls_file)
-        wat_pts_gdf = geopandas.read_parquet(vec_wtr_smpls_file)
-        oth_pts_gdf = geopandas.read_parquet(vec_oth_smpls_file)
+    if use_smpls_store:
+        smpls_avail = all(
+            (prj_name, cls_val) in train_data_parts for cls_val in [1, 2, 3]
+        )
+    else:
+        smpls_avail = (
+            os.path.exists(vec_mng_smpls_file)
+            and os.path.exists(vec_wtr_smpls_file)
+            and os.path.exists(vec_oth_smpls_file)
+        )
 
-        n_mng_pts = len(mng_pts_gdf)
-        n_wat_pts = len(wat_pts_gdf)
-        n_oth_pts = len(oth_pts_gdf)
+    if smpls_avail:
+        if use_smpls_store:
+            mng_pts_gdf, wat_pts_gdf, oth_pts_gdf = [
+                gmw_smpls_store.read_partition(
+                    train_data_store_dir,
+                    {prjs_col_name: prj_name, "ref_cls": cls_val},
+                    geo=True,
+                )
+                for cls_val in [1, 2, 3]
+            ]
+        else:
+            mng_pts_gdf = geopandas.read_parquet(vec_mng_smpls_file)
+            wat_pts_gdf = geopandas.read_parquet(vec_wtr_smpls_file)
+            oth_pts_gdf = geopandas.read_parquet(vec_oth_smpls_file)
+
+        # Only the points within the project tiles, with the tile of each
+        # point used as the strata when sampling.
+        cls_pts = list()
+        for pts_gdf in [mng_pts_gdf, wat_pts_gdf, oth_pts_gdf]:
+            pt_tiles = gmw_tile_tools.get_pt_tile_names(
+                len(pts_gdf),
+                gmw_tile_tools.get_tile_pt_idxs(pts_gdf, prj_tiles_df, tiles_col_name),
+            )
+            in_tile_msk = pt_tiles != ""
+            cls_pts.append((pts_gdf.iloc[in_tile_msk], pt_tiles[in_tile_msk]))
+
+        n_mng_pts, n_wat_pts, n_oth_pts = [len(pts_gdf) for pts_gdf, _ in cls_pts]
 
         min_n_pts = min(n_mng_pts, n_wat_pts)
         min_n_pts = min(min_n_pts, n_oth_pts)
@@ -115,113 +144,95 @@ for prj_name in prjs_names:
             f"min_n_pts: {min_n_pts} (mng: {n_mng_pts}, wtr: {n_wat_pts}, oth: {n_oth_pts})"
         )
 
-        mng_pts_gdf = mng_pts_gdf.sample(min_n_pts, random_state=42)
-        wat_pts_gdf = wat_pts_gdf.sample(min_n_pts, random_state=42)
-        oth_pts_gdf = oth_pts_gdf.sample(min_n_pts, random_state=42)
+        # Sample each class stratified by tile so the samples are spread
+        # across the tiles of the project (see gmw_smpl_tools.get_strata_ids).
+        mng_pts_gdf, wat_pts_gdf, oth_pts_gdf = [
+            pts_gdf.iloc[
+                gmw_smpl_tools.stratified_sample_idxs([pt_tiles], min_n_pts, seed=42)
+            ]
+            for pts_gdf, pt_tiles in cls_pts
+        ]
+
+        # Assign the points to the project tiles in a single pass.
+        mng_tile_idxs = gmw_tile_tools.get_tile_pt_idxs(
+            mng_pts_gdf, prj_tiles_df, tiles_col_name
+        )
+        wat_tile_idxs = gmw_tile_tools.get_tile_pt_idxs(
+            wat_pts_gdf, prj_tiles_df, tiles_col_name
+        )
+        oth_tile_idxs = gmw_tile_tools.get_tile_pt_idxs(
+            oth_pts_gdf, prj_tiles_df, tiles_col_name
+        )
 
-        tile_names = prj_sub_gdf[tiles_col_name]
+        tile_names = tile_cat["prj_tiles"][prj_name]
         for tile_name in tile_names:
             print(f"\t{tile_name}")
-            out_file_name = f"{tile_name}_cls_smpls"
-            lcl_csv_file = os.path.join(train_csv_smpls_dir, f"{out_file_name}.csv")
-            if not os.path.exists(lcl_csv_file):
-                tile_sub_gdf = prj_sub_gdf[prj_sub_gdf[tiles_col_name] == tile_name]
-
-                mng_pts_sub_gdf = mng_pts_gdf.clip(tile_sub_gdf)
-                wat_pts_sub_gdf = wat_pts_gdf.clip(tile_sub_gdf)
-                oth_pts_sub_gdf = oth_pts_gdf.clip(tile_sub_gdf)
-
-                n_mng_pts_sub = len(mng_pts_sub_gdf)
-                n_wat_pts_sub = len(wat_pts_sub_gdf)
-                n_oth_pts_sub = len(oth_pts_sub_gdf)
-
-                if (n_mng_pts_sub > 0) or (n_wat_pts_sub > 0) or (n_oth_pts_sub > 0):
-
-                    if n_mng_pts_sub > 0:
-                        gee_mng_pts = pb_gee_tools.convert_types.get_gee_pts_gp_gdf(
-                            mng_pts_sub_gdf
-                        )
-
-                    if n_wat_pts_sub > 0:
-                        gee_wtr_pts = pb_gee_tools.convert_types.get_gee_pts_gp_gdf(
-                            wat_pts_sub_gdf
-                        )
-
-                    if n_oth_pts_sub > 0:
-                        gee_oth_pts = pb_gee_tools.convert_types.get_gee_pts_gp_gdf(
-                            oth_pts_sub_gdf
-                        )
-
-                    if (n_mng_pts_sub > 0) and (n_wat_pts_sub > 0) and (n_oth_pts_sub > 0):
-                        train_smpls = ee.FeatureCollection(
-                            [
-                                ee.Feature(gee_mng_pts, {"class": 1}),
-                                ee.Feature(gee_wtr_pts, {"class": 2}),
-                                ee.Feature(gee_oth_pts, {"class": 3}),
-                            ]
-                        )
-                    elif (n_mng_pts_sub > 0) and (n_wat_pts_sub > 0):
-                        train_smpls = ee.FeatureCollection(
-                            [
-                                ee.Feature(gee_mng_pts, {"class": 1}),
-                                ee.Feature(gee_wtr_pts, {"class": 2}),
-                            ]
-                        )
-                    elif (n_mng_pts_sub > 0) and (n_oth_pts_sub > 0):
-                        train_smpls = ee.FeatureCollection(
-                            [
-                                ee.Feature(gee_mng_pts, {"class": 1}),
-                                ee.Feature(gee_oth_pts, {"class": 3}),
-                            ]
-                        )
-                    elif (n_wat_pts_sub > 0) and (n_oth_pts_sub > 0):
-                        train_smpls = ee.FeatureCollection(
-                            [
-                                ee.Feature(gee_wtr_pts, {"class": 2}),
-                                ee.Feature(gee_oth_pts, {"class": 3}),
-                            ]
-                        )
-                    elif n_mng_pts_sub > 0:
-                        train_smpls = ee.FeatureCollection(
-                            [
-                                ee.Feature(gee_mng_pts, {"class": 1}),
-                            ]
-                        )
-                    elif n_wat_pts_sub > 0:
-                        train_smpls = ee.FeatureCollection(
-                            [
-                                ee.Feature(gee_wtr_pts, {"class": 2}),
-                            ]
-                        )
-                    elif n_oth_pts_sub > 0:
-                        train_smpls = ee.FeatureCollection(
-                            [
-                                ee.Feature(gee_oth_pts, {"class": 3}),
-                            ]
-                        )
-
-                    # Get layer bbox: minx, miny, maxx, maxy
-                    tile_bbox = tile_sub_gdf.total_bounds
-
-                    # Create the GEE geometry from the bbox.
-                    roi_west = tile_bbox[0]
-                    roi_east = tile_bbox[2]
-                    roi_north = tile_bbox[3]
-                    roi_south = tile_bbox[1]
-                    tile_aoi = ee.Geometry.BBox(roi_west, roi_south, roi_east, roi_north)
-
-                    ls_img_col = pb_gee_tools.datasets.get_sr_landsat_collection(
-                        aoi=tile_aoi,
-                        start_date=start_date,
-                        end_date=end_date,
-                        cloud_thres=70,
-                        ignore_ls7=False,
-                        out_lstm_bands=True,
-                    ).select(["Blue", "Green", "Red", "NIR", "SWIR1", "SWIR2"])
-
-                    sen2_ls_indices_img_col = ls_img_col.map(calc_band_indices)
-
-                    def sample_img_training(img):
+            mng_pts_sub_gdf = mng_pts_gdf.iloc[mng_tile_idxs[tile_name]]
+            wat_pts_sub_gdf = wat_pts_gdf.iloc[wat_tile_idxs[tile_name]]
+            oth_pts_sub_gdf = oth_pts_gdf.iloc[oth_tile_idxs[tile_name]]
+
+            # The points are sent as one or more FeatureCollections of at most
+            # max_n_req_pts points, each of which is exported by its own task.
+            n_tile_pts = len(mng_pts_sub_gdf) + len(wat_pts_sub_gdf) + len(oth_pts_sub_gdf)
+            n_parts = -(-n_tile_pts // max_n_req_pts)
+            out_file_names = list()
+            for part_idx in range(n_parts):
+                out_file_name = f"{tile_name}_cls_smpls"
+                if part_idx > 0:
+                    out_file_name = f"{out_file_name}_{part_idx + 1}"
+                out_file_names.append(out_file_name)
+            parts_done = [
+                (out_file_name in tile_smpls_jobs)
+                or os.path.exists(
+                    os.path.join(train_csv_smpls_dir, f"{out_file_name}.csv")
+                )
+                for out_file_name in out_file_names
+            ]
+
+            train_smpls_parts = list()
+            if not all(parts_done):
+                train_smpls_fcs = gmw_gee_tools.get_gee_cls_pts_fcs(
+                    [
+                        (1, mng_pts_sub_gdf),
+                        (2, wat_pts_sub_gdf),
+                        (3, oth_pts_sub_gdf),
+                    ],
+                    cls_col="class",
+                    max_n_pts=max_n_req_pts,
+                )
+                train_smpls_parts = [
+                    (out_file_name, train_smpls)
+                    for out_file_name, train_smpls, part_done in zip(
+                        out_file_names, train_smpls_fcs, parts_done
+                    )
+                    if not part_done
+                ]
+
+            if len(train_smpls_parts) > 0:
+                # Get tile bbox: minx, miny, maxx, maxy
+                tile_bbox = tile_cat["tile_bbox"][tile_name]
+
+                # Create the GEE geometry from the bbox.
+                roi_west = tile_bbox[0]
+                roi_east = tile_bbox[2]
+                roi_north = tile_bbox[3]
+                roi_south = tile_bbox[1]
+                tile_aoi = ee.Geometry.BBox(roi_west, roi_south, roi_east, roi_north)
+
+                ls_img_col = pb_gee_tools.datasets.get_sr_landsat_collection(
+                    aoi=tile_aoi,
+                    start_date=start_date,
+                    end_date=end_date,
+                    cloud_thres=70,
+                    ignore_ls7=False,
+                    out_lstm_bands=True,
+                ).select(gmw_indices.ls_bands)
+
+                sen2_ls_indices_img_col = ls_img_col.map(gmw_indices.calc_band_indices)
+
+                for out_file_name, train_smpls in train_smpls_parts:
+
+                    def sample_img_training(img, train_smpls=train_smpls):
                         training = img.sampleRegions(
                             collection=train_smpls, properties=["class"], scale=30
                         )
@@ -230,16 +241,26 @@ for prj_name in prjs_names:
                     training_data = sen2_ls_indices_img_col.map(sample_img_training)
                     training_data = training_data.flatten()
 
-                    n_smples = int(training_data.size().getInfo())
-                    print(f"\t\tThere are {n_smples} training samples.")
-
-                    task = ee.batch.Export.table.toDrive(
-                        collection=training_data,
-                        folder="gmw_v4_chng_2020_ls_train_smpls",
-                        description=out_file_name,
-                        fileNamePrefix=out_file_name,
-                        fileFormat="CSV",
+                    if calc_n_smpls:
+                        n_smples = int(training_data.size().getInfo())
+                        print(f"\t\t{out_file_name}: {n_smples} training samples.")
+
+                    gee_tasks.append(
+                        (
+                            out_file_name,
+                            functools.partial(
+                                ee.batch.Export.table.toDrive,
+                                collection=training_data,
+                                folder="gmw_v4_chng_2020_ls_train_smpls",
+                                description=out_file_name,
+                                fileNamePrefix=out_file_name,
+                                fileFormat="CSV",
+                            ),
+                        )
                     )
-                    task.start()
     print("")
     n += 1
+
+gmw_gee_tasks.run_gee_tasks(
+    gee_tasks, job_db_file, job_stage, max_running=max_running_tasks
+)
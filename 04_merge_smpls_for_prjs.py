@@ -1,72 +1,161 @@
 import os
+import re
+import argparse
 import pandas
-import geopandas
-import tqdm
 
 import rsgislib.tools.filetools
 
+import gmw_indices
+import gmw_smpl_tools
+import gmw_smpls_store
+import gmw_tile_cat
+
+bands = gmw_indices.bands
+max_n_smpls = 100000
+smpls_seed = 42
+# The samples are stratified by class and then tile. If True they are also
+# stratified by the acquisition date of the Landsat scene.
+smpls_strat_by_date = False
+
 train_data_dir = "gmw_prj_train_data_split"
 train_csv_smpls_dir = "gmw_tile_smpls_csv_files"
 out_smpls_dir = "gmw_prj_train_smpls"
+# CSV file recording the number of samples exported for each tile.
+tile_smpls_counts_file = "gmw_tile_smpls_counts.csv"
+# If True the samples are read from and written to hive partitioned parquet
+# datasets rather than individual files.
+use_smpls_store = False
+train_data_store_dir = "gmw_prj_train_data_store"
+out_smpls_store_dir = "gmw_prj_train_smpls_store"
 
 prj_rgns_vec_file = "gmw_tiles_prj_def.geojson"
 prj_rgns_vec_lyr = "gmw_tiles_prj_def"
 prjs_col_name = "gmw_prj"
 tiles_col_name = "gmw_tile_name"
 
-prj_tiles_gdf = geopandas.read_file(prj_rgns_vec_file, layer=prj_rgns_vec_lyr)
-prjs_unq_col = prj_tiles_gdf[prjs_col_name]
-prjs_names = prjs_unq_col.unique()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="The number of processes used to merge the projects.",
+    )
+    args = parser.parse_args()
 
-start_prj = 0
-n_prjs = len(prjs_names)
-print(f"n_prjs: {n_prjs}\n")
-end_tile = (n_prjs-start_prj)
+    tile_cat = gmw_tile_cat.read_tile_cat(
+        prj_rgns_vec_file, prj_rgns_vec_lyr, prjs_col_name, tiles_col_name
+    )
+    prjs_names = tile_cat["prjs"]
 
-prjs_names = prjs_names[start_prj:end_tile]
-#prjs_names = ["GMW-01-006"]
-n = 1
-for prj_name in tqdm.tqdm(prjs_names):
-    #print(f"Processing {prj_name} - {n} of {n_prjs}")
+    start_prj = 0
+    n_prjs = len(prjs_names)
+    print(f"n_prjs: {n_prjs}\n")
+    end_tile = (n_prjs-start_prj)
 
-    out_prj_smpls_file = os.path.join(out_smpls_dir, f"{prj_name}_train_smpls.parquet.sz")
-    if not os.path.exists(out_prj_smpls_file):
-        prj_sub_gdf = prj_tiles_gdf[prj_tiles_gdf[prjs_col_name] == prj_name]
+    prjs_names = prjs_names[start_prj:end_tile]
+    #prjs_names = ["GMW-01-006"]
 
-        vec_mng_smpls_file = os.path.join(
-            train_data_dir, f"{prj_name}_refs_smps_1.parquet.sz"
-        )
-        vec_wtr_smpls_file = os.path.join(
-            train_data_dir, f"{prj_name}_refs_smps_2.parquet.sz"
+    if use_smpls_store:
+        train_data_parts = gmw_smpls_store.get_partitions(
+            train_data_store_dir, [prjs_col_name, "ref_cls"]
         )
-        vec_oth_smpls_file = os.path.join(
-            train_data_dir, f"{prj_name}_refs_smps_3.parquet.sz"
+        out_smpls_parts = gmw_smpls_store.get_partitions(
+            out_smpls_store_dir, [prjs_col_name]
         )
 
-        if (
-                os.path.exists(vec_mng_smpls_file)
-                and os.path.exists(vec_wtr_smpls_file)
-                and os.path.exists(vec_oth_smpls_file)
-        ):
-            tile_smpls_lst = list()
-            tile_names = prj_sub_gdf[tiles_col_name]
-            for tile_name in tile_names:
-                tile_smpls_file_name = f"{tile_name}_cls_smpls"
-                tile_smpls_file = os.path.join(train_csv_smpls_dir, f"{tile_smpls_file_name}.csv")
-                #print(f"Processing {tile_smpls_file}")
-                if os.path.exists(tile_smpls_file):
-                    file_size = rsgislib.tools.filetools.get_file_size(tile_smpls_file)
-                    #print(file_size)
-                    if file_size > 100:
-                        tile_smpls_lst.append(pandas.read_csv(tile_smpls_file))
-
-            if len(tile_smpls_lst) > 0:
-                gmw_prj_smpls_df = pandas.concat(tile_smpls_lst)
-                #print(f"\t{len(gmw_prj_smpls_df)} samples")
-                if len(gmw_prj_smpls_df) > 100000:
-                    gmw_prj_smpls_df = gmw_prj_smpls_df.sample(n=100000, random_state=42)
-
-                gmw_prj_smpls_df.to_parquet(out_prj_smpls_file, compression="snappy")
-
-    #print("")
-    n += 1
+    # The sample CSV files of each tile: {tile}_cls_smpls.csv and, for tiles
+    # exported in parts by stage 03, {tile}_cls_smpls_{n}.csv
+    tile_smpls_re = re.compile(r"^(?P<tile>.+)_cls_smpls(_\d+)?\.csv$")
+    tiles_smpls_files = dict()
+    for entry in os.scandir(train_csv_smpls_dir):
+        tile_smpls_match = tile_smpls_re.match(entry.name)
+        if entry.is_file() and (tile_smpls_match is not None):
+            tiles_smpls_files.setdefault(tile_smpls_match.group("tile"), list()).append(
+                entry.path
+            )
+
+    prj_jobs = list()
+    for prj_name in prjs_names:
+        out_prj_smpls_file = os.path.join(out_smpls_dir, f"{prj_name}_train_smpls.parquet.sz")
+        if use_smpls_store:
+            out_smpls_exist = (prj_name,) in out_smpls_parts
+        else:
+            out_smpls_exist = os.path.exists(out_prj_smpls_file)
+
+        if not out_smpls_exist:
+            vec_mng_smpls_file = os.path.join(
+                train_data_dir, f"{prj_name}_refs_smps_1.parquet.sz"
+            )
+            vec_wtr_smpls_file = os.path.join(
+                train_data_dir, f"{prj_name}_refs_smps_2.parquet.sz"
+            )
+            vec_oth_smpls_file = os.path.join(
+                train_data_dir, f"{prj_name}_refs_smps_3.parquet.sz"
+            )
+
+            if use_smpls_store:
+                smpls_avail = all(
+                    (prj_name, cls_val) in train_data_parts for cls_val in [1, 2, 3]
+                )
+            else:
+                smpls_avail = (
+                    os.path.exists(vec_mng_smpls_file)
+                    and os.path.exists(vec_wtr_smpls_file)
+                    and os.path.exists(vec_oth_smpls_file)
+                )
+
+            if smpls_avail:
+                prj_tile_smpls_files = list()
+                prj_size = 0
+                tile_names = tile_cat["prj_tiles"][prj_name]
+                for tile_name in tile_names:
+                    for tile_smpls_file in sorted(tiles_smpls_files.get(tile_name, list())):
+                        #print(f"Processing {tile_smpls_file}")
+                        file_size = rsgislib.tools.filetools.get_file_size(tile_smpls_file)
+                        #print(file_size)
+                        if file_size > 100:
+                            prj_tile_smpls_files.append((tile_name, tile_smpls_file))
+                            prj_size += file_size
+
+                if len(prj_tile_smpls_files) > 0:
+                    prj_job = {
+                        "prj_name": prj_name,
+                        "tile_smpls_files": prj_tile_smpls_files,
+                        "prj_size": prj_size,
+                    }
+                    if not use_smpls_store:
+                        prj_job["out_smpls_file"] = out_prj_smpls_file
+                    prj_jobs.append(prj_job)
+
+    print(f"Merging the samples for {len(prj_jobs)} projects.")
+    prjs_tile_counts, prjs_errs = gmw_smpl_tools.run_merge_prj_tile_smpls(
+        prj_jobs,
+        n_workers=args.workers,
+        bands=bands,
+        out_smpls_store_dir=out_smpls_store_dir if use_smpls_store else None,
+        prjs_col_name=prjs_col_name,
+        tiles_col_name=tiles_col_name,
+        max_n_smpls=max_n_smpls,
+        seed=smpls_seed,
+        strat_by_date=smpls_strat_by_date,
+    )
+    if len(prjs_errs) > 0:
+        print(f"Failed to merge the samples for {len(prjs_errs)} projects:")
+        for prj_name in sorted(prjs_errs):
+            print(f"\t{prj_name}")
+
+    tile_smpls_counts = list()
+    for prj_name, tile_counts in prjs_tile_counts.items():
+        for tile_name, tile_count in tile_counts.items():
+            tile_smpls_counts.append(
+                {prjs_col_name: prj_name, tiles_col_name: tile_name, "n_smpls": tile_count}
+            )
+
+    if len(tile_smpls_counts) > 0:
+        tile_smpls_counts_df = pandas.DataFrame(tile_smpls_counts)
+        if os.path.exists(tile_smpls_counts_file):
+            tile_smpls_counts_df = pandas.concat(
+                [pandas.read_csv(tile_smpls_counts_file), tile_smpls_counts_df]
+            ).drop_duplicates(subset=[tiles_col_name], keep="last")
+        tile_smpls_counts_df.to_csv(tile_smpls_counts_file, index=False)
@@ -1,37 +1,45 @@
 import os
+import functools
 import ee
+import numpy
 import pandas
-import geopandas
-import pathlib
-import glob
+
+import gmw_gee_tasks
+import gmw_gee_tools
+import gmw_indices
+import gmw_job_db
+import gmw_smpl_tools
+import gmw_smpls_store
+import gmw_tile_cat
 
 ee.Authenticate()
 ee.Initialize(project="ee-petebunting-gmw")
 
-bands = [
-    "Blue",
-    "Green",
-    "Red",
-    "NIR",
-    "SWIR1",
-    "SWIR2",
-    "NDVI",
-    "NDWI",
-    "NBR",
-    "EVI",
-    "MVI",
-]
+bands = gmw_indices.bands
 
+job_db_file = "gmw_jobs.db"
+job_stage = "train_mdls"
+max_running_tasks = 20
+# The directory of the LUT files used before the job database, which are
+# imported into the database by 00_import_lut_files_to_job_db.py.
 mdls_created_lut_dir = "gmw_prj_mdls_created"
+n_mdls = 10
+mdls_seed = 42
+# The maximum number of samples used to train each model (see
+# gmw_smpl_tools.get_mdl_n_smpls).
+max_n_mdl_smpls = 20000
 train_prj_smpls_dir = "gmw_prj_train_smpls"
+# If True the samples are read from the hive partitioned parquet dataset
+# written by 04_merge_smpls_for_prjs.py rather than individual files.
+use_smpls_store = False
+train_prj_smpls_store_dir = "gmw_prj_train_smpls_store"
 
 prj_rgns_vec_file = "gmw_tiles_prj_def.geojson"
 prj_rgns_vec_lyr = "gmw_tiles_prj_def"
 prjs_col_name = "gmw_prj"
 
-prj_tiles_gdf = geopandas.read_file(prj_rgns_vec_file, layer=prj_rgns_vec_lyr)
-prjs_unq_col = prj_tiles_gdf[prjs_col_name]
-prjs_names = prjs_unq_col.unique()
+tile_cat = gmw_tile_cat.read_tile_cat(prj_rgns_vec_file, prj_rgns_vec_lyr, prjs_col_name)
+prjs_names = tile_cat["prjs"]
 
 start_prj = 0
 n_prjs = len(prjs_names)
@@ -40,53 +48,89 @@ end_tile = (n_prjs-start_prj)
 
 prjs_names = prjs_names[start_prj:end_tile]
 
+if use_smpls_store:
+    train_prj_smpls_parts = gmw_smpls_store.get_partitions(
+        train_prj_smpls_store_dir, [prjs_col_name]
+    )
+
+job_db_conn = gmw_job_db.open_job_db(job_db_file)
+# Models which have been created or are still being created.
+mdl_jobs = gmw_job_db.get_jobs(
+    job_db_conn,
+    job_stage,
+    states=[gmw_job_db.JOB_SUCCEEDED] + gmw_job_db.JOB_ACTIVE_STATES,
+)
+job_db_conn.close()
+if (len(mdl_jobs) == 0) and os.path.isdir(mdls_created_lut_dir):
+    raise Exception(
+        f"There are no models in {job_db_file} but {mdls_created_lut_dir} exists; "
+        "run 00_import_lut_files_to_job_db.py so the existing models are not "
+        "exported again."
+    )
+
+gee_tasks = list()
 n = 1
 for prj_name in prjs_names:
     print(f"Processing {prj_name} - {n} of {n_prjs}")
 
     prj_smpls_file = os.path.join(train_prj_smpls_dir, f"{prj_name}_train_smpls.parquet.sz")
-    if os.path.exists(prj_smpls_file):
-        mdl_lut_files = glob.glob(os.path.join(mdls_created_lut_dir, f"{prj_name}_mdl_*.txt"))
-        if len(mdl_lut_files) < 10:
-            for i in range(10):
+    if use_smpls_store:
+        prj_smpls_exist = (prj_name,) in train_prj_smpls_parts
+    else:
+        prj_smpls_exist = os.path.exists(prj_smpls_file)
+
+    if prj_smpls_exist:
+        prj_mdl_names = [f'{prj_name}_rf_cls_{i+1}' for i in range(n_mdls)]
+        if any(mdl_name not in mdl_jobs for mdl_name in prj_mdl_names):
+            # Read the samples once for all the models of the ensemble.
+            if use_smpls_store:
+                data_df = gmw_smpls_store.read_partition(
+                    train_prj_smpls_store_dir,
+                    {prjs_col_name: prj_name},
+                    columns=bands + ["class"],
+                )
+            else:
+                data_df = pandas.read_parquet(
+                    prj_smpls_file, columns=bands + ["class"]
+                )
+            data_cls = data_df["class"].to_numpy()
+            n_mdl_smpls = gmw_smpl_tools.get_mdl_n_smpls(len(data_df), max_n_mdl_smpls)
+            # A different (reproducible) sample for each model of the ensemble.
+            mdl_seeds = numpy.random.SeedSequence(mdls_seed).spawn(n_mdls)
+            for i in range(n_mdls):
                 print(f"\tIteration: {i+1}")
-                mdl_lut_file = os.path.join(mdls_created_lut_dir, f"{prj_name}_mdl_{i+1}.txt")
-                if not os.path.exists(mdl_lut_file):
-                    data_df = pandas.read_parquet(prj_smpls_file)
-                    if len(data_df) > 20000:
-                        data_df = data_df.sample(n=20000)
-                    else:
-                        data_df = data_df.sample(frac=0.5)
-                    print(f"\t\tThere are {len(data_df)} training samples.")
-                    def row_to_feature(row):
-                        geometry = None
-                        properties = {col: row[col] for col in data_df.columns if col not in ['latitude', 'longitude', '.geo']}
-                        return ee.Feature(geometry, properties)
-
-                    # Convert the DataFrame to a list of Features
-                    features = data_df.apply(row_to_feature, axis=1).tolist()
-                    # Create a FeatureCollection
-                    training_data = ee.FeatureCollection(features)
+                if prj_mdl_names[i] not in mdl_jobs:
+                    # Sample with the classes balanced.
+                    mdl_smpl_idxs = gmw_smpl_tools.stratified_sample_idxs(
+                        data_cls, n_mdl_smpls, seed=mdl_seeds[i]
+                    )
+                    print(f"\t\tThere are {len(mdl_smpl_idxs)} training samples.")
+                    # Convert the samples to a FeatureCollection
+                    training_data = gmw_gee_tools.get_gee_df_fc(
+                        data_df, bands + ["class"], row_idxs=mdl_smpl_idxs
+                    )
                     print("\t\tTraining Model")
                     trained_cls_mdl = ee.Classifier.smileRandomForest(numberOfTrees=100).train(training_data, "class", bands)
 
                     print("\t\tSaving trained model")
-                    asset_id = f'projects/ee-petebunting-gmw/assets/gmw_ls_cls_mdls/{prj_name}_rf_cls_{i+1}'
-                    task = ee.batch.Export.classifier.toAsset(
-                        classifier=trained_cls_mdl,
-                        description=f'{prj_name}_rf_cls_{i+1}',
-                        assetId=asset_id
+                    task_name = prj_mdl_names[i]
+                    asset_id = f'projects/ee-petebunting-gmw/assets/gmw_ls_cls_mdls/{task_name}'
+                    gee_tasks.append(
+                        (
+                            task_name,
+                            functools.partial(
+                                ee.batch.Export.classifier.toAsset,
+                                classifier=trained_cls_mdl,
+                                description=task_name,
+                                assetId=asset_id,
+                            ),
+                        )
                     )
-                    task.start()
-                    pathlib.Path(mdl_lut_file).touch()
                     print("\t\tDone")
 
     print("")
     n += 1
 
-
-
-
-
-
-
+gmw_gee_tasks.run_gee_tasks(
+    gee_tasks, job_db_file, job_stage, max_running=max_running_tasks
+)
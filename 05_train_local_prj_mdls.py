@@ -0,0 +1,93 @@
+import os
+import glob
+import argparse
+import pandas
+
+import gmw_indices
+import gmw_local_mdls
+
+# Trains the project model ensembles locally with scikit-learn, in the same
+# way as 05_train_gmw_prj_mdls.py trains them on GEE, and reports the
+# accuracy of the models on held-out samples. Used to test the number of
+# trees and samples before using the GEE quota.
+
+bands = gmw_indices.bands
+
+n_mdls = 10
+mdls_seed = 42
+test_frac = 0.2
+train_prj_smpls_dir = "gmw_prj_train_smpls"
+out_mdls_dir = "gmw_local_mdls"
+out_acc_file = "gmw_local_mdls_acc.csv"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="The number of processes used to train the projects.",
+    )
+    parser.add_argument(
+        "--n_jobs",
+        type=int,
+        default=1,
+        help="The number of threads used by each random forest.",
+    )
+    parser.add_argument(
+        "--n_trees", type=int, default=100, help="The number of trees per model."
+    )
+    parser.add_argument(
+        "--n_smpls",
+        type=int,
+        default=20000,
+        help="The maximum number of samples used to train each model.",
+    )
+    parser.add_argument(
+        "--save_mdls",
+        action="store_true",
+        default=False,
+        help="Save the models to the output directory.",
+    )
+    args = parser.parse_args()
+
+    prj_smpls_files = dict()
+    for prj_smpls_file in glob.glob(
+        os.path.join(train_prj_smpls_dir, "*_train_smpls.parquet.sz")
+    ):
+        prj_name = os.path.basename(prj_smpls_file).replace(
+            "_train_smpls.parquet.sz", ""
+        )
+        prj_smpls_files[prj_name] = prj_smpls_file
+    print(f"n_prjs: {len(prj_smpls_files)}\n")
+
+    if args.save_mdls and not os.path.exists(out_mdls_dir):
+        os.mkdir(out_mdls_dir)
+
+    prjs_info, prjs_errs = gmw_local_mdls.run_local_prj_ensembles(
+        prj_smpls_files,
+        n_workers=args.workers,
+        bands=bands,
+        out_mdls_dir=out_mdls_dir if args.save_mdls else None,
+        n_mdls=n_mdls,
+        n_trees=args.n_trees,
+        max_n_smpls=args.n_smpls,
+        test_frac=test_frac,
+        seed=mdls_seed,
+        n_jobs=args.n_jobs,
+    )
+    if len(prjs_errs) > 0:
+        print(f"Failed to train the models for {len(prjs_errs)} projects:")
+        for prj_name in sorted(prjs_errs):
+            print(f"\t{prj_name}")
+
+    if len(prjs_info) > 0:
+        prjs_info_df = pandas.DataFrame(prjs_info).sort_values("prj_name")
+        prjs_info_df["n_trees"] = args.n_trees
+        prjs_info_df["n_smpls"] = args.n_smpls
+        prjs_info_df.to_csv(out_acc_file, index=False)
+        print(prjs_info_df.drop(columns=["n_trees", "n_smpls"]).to_string(index=False))
+        print(
+            f"\nMean ensemble accuracy: {prjs_info_df['acc'].mean():.4f}; "
+            f"total training time: {prjs_info_df['train_time'].sum():.1f} s"
+        )
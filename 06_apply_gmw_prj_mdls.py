@@ -1,53 +1,16 @@
 import os
+import sys
+import functools
 import ee
-import geopandas
 import datetime
-import pb_gee_tools.datasets
-import pathlib
 
-ee.Authenticate()
-ee.Initialize(project="ee-petebunting-gmw")
+import gmw_gee_cls
+import gmw_gee_tasks
+import gmw_indices
+import gmw_job_db
+import gmw_tile_cat
 
-def calc_vld_msk(img):
-    return img.select('NIR').gt(0).rename('VLD_MSK')
-
-def calc_band_indices(img):
-    img = img.multiply(0.0001).float()
-    ndvi = img.normalizedDifference(["NIR", "Red"]).rename("NDVI")
-    ndwi = img.normalizedDifference(["NIR", "SWIR1"]).rename("NDWI")
-    nbr = img.normalizedDifference(["NIR", "SWIR2"]).rename("NBR")
-    evi = img.expression(
-        "2.5 * ((NIR - RED) / (NIR + 6 * RED - 7.5 * BLUE + 1))",
-        {
-            "NIR": img.select("NIR"),
-            "RED": img.select("Red"),
-            "BLUE": img.select("Blue"),
-        },
-    ).rename(["EVI"])
-    mvi = img.expression(
-        "((NIR - GREEN) / (SWIR - GREEN))",
-        {
-            "NIR": img.select("NIR"),
-            "SWIR": img.select("SWIR1"),
-            "GREEN": img.select("Green"),
-        },
-    ).rename(["MVI"])
-
-    return img.addBands([ndvi, ndwi, nbr, evi, mvi])
-
-bands = [
-    "Blue",
-    "Green",
-    "Red",
-    "NIR",
-    "SWIR1",
-    "SWIR2",
-    "NDVI",
-    "NDWI",
-    "NBR",
-    "EVI",
-    "MVI",
-]
+bands = gmw_indices.bands
 
 year = 2002
 
@@ -57,22 +20,41 @@ out_no_data_val = 0.0
 
 out_gdrive_dir = f"gmw_{year}_mng_count_tiles"
 
-gmw_hab_msk_img = ee.Image('projects/ee-petebunting-gmw/assets/gmw_v23_hab_msk')
-
-def apply_gmw_msk(img):
-  return img.updateMask(gmw_hab_msk_img)
-
-mdls_created_lut_dir = "gmw_prj_mdls_created"
-sub_cls_lut_dir = "gmw_tiles_cls_sub"
+gmw_hab_msk_asset_id = 'projects/ee-petebunting-gmw/assets/gmw_v23_hab_msk'
+
+# How the classification is exported for each project. The classification
+# graph (Landsat collection, indices, classification and counts) is built
+# once for each project over the union of its tiles:
+#  - "tiles": a task for each tile, all sharing the project graph.
+#  - "mosaic": a single task for each project exporting the bbox of its tiles,
+#    which is split into the tiles locally by 06_split_prj_cls_mosaics.py
+#    once downloaded. Best suited to projects with contiguous tiles.
+prj_export_mode = "tiles"
+
+# The model applied to each project (i.e., {prj_name}_rf_cls_{mdl_n}) or, if
+# cls_ensemble is True, all the n_mdls models trained for the project by
+# 05_train_gmw_prj_mdls.py, which are applied within the same graph with the
+# class being the majority vote and the model vote (MNG_VOTES) and agreement
+# (AGREE) counts output as additional bands.
+mdl_n = 1
+cls_ensemble = False
+n_mdls = 10
+
+job_db_file = "gmw_jobs.db"
+mdls_job_stage = "train_mdls"
+job_stage = f"apply_mdls_{year}"
+max_running_tasks = 20
+max_task_attempts = 3
 
 prj_rgns_vec_file = "gmw_tiles_prj_def_hab_intersect.geojson"
 prj_rgns_vec_lyr = "gmw_tiles_prj_def_hab_intersect"
 prjs_col_name = "gmw_prj"
 tiles_col_name = "gmw_tile_name"
 
-prj_tiles_gdf = geopandas.read_file(prj_rgns_vec_file, layer=prj_rgns_vec_lyr)
-prjs_unq_col = prj_tiles_gdf[prjs_col_name]
-prjs_names = prjs_unq_col.unique()
+tile_cat = gmw_tile_cat.read_tile_cat(
+    prj_rgns_vec_file, prj_rgns_vec_lyr, prjs_col_name, tiles_col_name
+)
+prjs_names = tile_cat["prjs"]
 
 start_prj = 0
 n_prjs = len(prjs_names)
@@ -84,73 +66,135 @@ prjs_names = prjs_names[start_prj:end_tile]
 #prjs_names = ["GMW-09-008", "GMW-04-002", "GMW-05-001", "GMW-01-009"]
 #end_tile = len(prjs_names)
 
-n = 1
+job_db_conn = gmw_job_db.open_job_db(job_db_file)
+# Models which have been successfully created.
+mdl_jobs = gmw_job_db.get_jobs(
+    job_db_conn, mdls_job_stage, states=[gmw_job_db.JOB_SUCCEEDED]
+)
+# Tiles (or project mosaics) which have been classified, are still running
+# or have failed too many times to be resubmitted.
+cls_jobs = gmw_job_db.get_jobs(job_db_conn, job_stage)
+done_cls_jobs = set(
+    job_name
+    for job_name, job in cls_jobs.items()
+    if (job["state"] != gmw_job_db.JOB_FAILED)
+    or (job["n_attempts"] >= max_task_attempts)
+)
+n_active_jobs = sum(
+    job["state"] in gmw_job_db.JOB_ACTIVE_STATES for job in cls_jobs.values()
+)
+job_db_conn.close()
+if len(mdl_jobs) == 0:
+    print(
+        f"No models have been created in {job_db_file}; if the models were "
+        "created before the job database was used run "
+        "00_import_lut_files_to_job_db.py."
+    )
+
+# Plan the pending (project, models, tiles) work before anything is
+# requested from GEE.
+prj_plans = list()
 for prj_name in prjs_names:
-    print(f"Processing {prj_name} - {n} of {n_prjs}")
-    mdl_n = 1
-
-    mdl_lut_file = os.path.join(mdls_created_lut_dir, f"{prj_name}_mdl_{mdl_n}.txt")
-    cls_mdl_asset_id = f'projects/ee-petebunting-gmw/assets/gmw_ls_cls_mdls/{prj_name}_rf_cls_{mdl_n}'
-    trained_cls = ee.Classifier.load(cls_mdl_asset_id)
-    if os.path.exists(mdl_lut_file):
-        prj_sub_gdf = prj_tiles_gdf[prj_tiles_gdf[prjs_col_name] == prj_name]
-
-        tile_names = prj_sub_gdf[tiles_col_name]
-        for tile_name in tile_names:
-            print(f"\t{tile_name}")
-            out_cls_name = f"{tile_name}_{year}_mng_cls_count_{mdl_n}"
-            lut_chk_file = os.path.join(sub_cls_lut_dir, f"{out_cls_name}_subd.txt")
-
-            if not os.path.exists(lut_chk_file):
-                tile_sub_gdf = prj_sub_gdf[prj_sub_gdf[tiles_col_name] == tile_name]
-
-                # Get layer bbox: minx, miny, maxx, maxy
-                tile_bbox = tile_sub_gdf.total_bounds
-
-                # Create the GEE geometry from the bbox.
-                roi_west = tile_bbox[0]
-                roi_east = tile_bbox[2]
-                roi_north = tile_bbox[3]
-                roi_south = tile_bbox[1]
-                tile_aoi = ee.Geometry.BBox(roi_west, roi_south, roi_east, roi_north)
-
-                ls_img_col = pb_gee_tools.datasets.get_sr_landsat_collection(
-                    aoi=tile_aoi,
-                    start_date=start_date,
-                    end_date=end_date,
-                    cloud_thres=70,
-                    ignore_ls7=False,
-                    out_lstm_bands=True,
-                ).select(["Blue", "Green", "Red", "NIR", "SWIR1", "SWIR2"])
-
-                ls_img_col = ls_img_col.map(apply_gmw_msk)
-
-                ls_indices_img_col = ls_img_col.map(calc_band_indices)
-                ls_vld_msk_img_col = ls_img_col.map(calc_vld_msk)
-
-                def apply_cls(img):
-                    out_cls = img.classify(trained_cls)
-                    mng_msk_img = out_cls.eq(1).mask(out_cls.eq(1)).rename("Mangroves")
-                    return mng_msk_img
-
-                cls_mng_imgs = ls_indices_img_col.map(apply_cls)
-
-                cls_mng_img = cls_mng_imgs.reduce(ee.Reducer.sum())#.mask(gmw_hab_msk_img)
-                vld_msk_img = ls_vld_msk_img_col.reduce(ee.Reducer.sum())#.mask(gmw_hab_msk_img)
-                out_img = ee.ImageCollection([cls_mng_img, vld_msk_img]).toBands().toInt()
-
-                task = ee.batch.Export.image.toDrive(
+    if cls_ensemble:
+        prj_mdl_ns = [i + 1 for i in range(n_mdls)]
+    else:
+        prj_mdl_ns = [mdl_n]
+    # Only the models which have been successfully created.
+    prj_mdl_ns = [
+        prj_mdl_n
+        for prj_mdl_n in prj_mdl_ns
+        if f"{prj_name}_rf_cls_{prj_mdl_n}" in mdl_jobs
+    ]
+    out_mdl_name = f"ens{len(prj_mdl_ns)}" if cls_ensemble else f"{mdl_n}"
+    out_prj_name = f"{prj_name}_{year}_mng_cls_count_{out_mdl_name}"
+    if (len(prj_mdl_ns) == 0) or (out_prj_name in done_cls_jobs):
+        continue
+    tile_names = [
+        tile_name
+        for tile_name in tile_cat["prj_tiles"][prj_name]
+        if f"{tile_name}_{year}_mng_cls_count_{out_mdl_name}" not in done_cls_jobs
+    ]
+    if len(tile_names) > 0:
+        prj_plans.append((prj_name, prj_mdl_ns, out_mdl_name, tile_names))
+
+print(
+    f"{sum(len(prj_plan[3]) for prj_plan in prj_plans)} tiles to be classified "
+    f"in {len(prj_plans)} projects, {n_active_jobs} GEE tasks running.\n"
+)
+if (len(prj_plans) == 0) and (n_active_jobs == 0):
+    sys.exit()
+
+ee.Authenticate()
+ee.Initialize(project="ee-petebunting-gmw")
+
+gmw_hab_msk_img = ee.Image(gmw_hab_msk_asset_id)
+
+gee_tasks = list()
+n = 1
+for prj_name, prj_mdl_ns, out_mdl_name, tile_names in prj_plans:
+    print(f"Processing {prj_name} - {n} of {len(prj_plans)}")
+    for tile_name in tile_names:
+        print(f"\t{tile_name}")
+    out_prj_name = f"{prj_name}_{year}_mng_cls_count_{out_mdl_name}"
+    trained_clss = [
+        gmw_gee_cls.load_classifier(
+            f'projects/ee-petebunting-gmw/assets/gmw_ls_cls_mdls/{prj_name}_rf_cls_{prj_mdl_n}'
+        )
+        for prj_mdl_n in prj_mdl_ns
+    ]
+
+    # Build the classification graph once for the tiles of the project.
+    tile_bboxes = [tile_cat["tile_bbox"][tile_name] for tile_name in tile_names]
+    ls_img_col = gmw_gee_cls.get_ls_img_col(
+        gmw_gee_cls.get_tiles_aoi(tile_bboxes),
+        start_date,
+        end_date,
+        msk_img=gmw_hab_msk_img,
+    )
+    if cls_ensemble:
+        out_img = gmw_gee_cls.get_ens_cls_count_img(ls_img_col, trained_clss)
+    else:
+        out_img = gmw_gee_cls.get_cls_count_img(ls_img_col, trained_clss[0])
+
+    if prj_export_mode == "mosaic":
+        out_regions = [(out_prj_name, gmw_gee_cls.get_tiles_bbox(tile_bboxes))]
+    else:
+        out_regions = [
+            (f"{tile_name}_{year}_mng_cls_count_{out_mdl_name}", tile_bbox)
+            for tile_name, tile_bbox in zip(tile_names, tile_bboxes)
+        ]
+
+    for out_cls_name, out_bbox in out_regions:
+        # Create the GEE geometry from the bbox: minx, miny, maxx, maxy
+        out_aoi = ee.Geometry.BBox(*out_bbox)
+        gee_tasks.append(
+            (
+                out_cls_name,
+                functools.partial(
+                    ee.batch.Export.image.toDrive,
                     image=out_img,
                     description=out_cls_name,
                     folder=out_gdrive_dir,
                     crs="EPSG:4326",
                     scale=30,
-                    region=tile_aoi,
+                    region=out_aoi,
                     fileFormat="GeoTIFF",
-                    formatOptions={"cloudOptimized": True, "noData": out_no_data_val},
-                )
-                task.start()
-                pathlib.Path(lut_chk_file).touch()
+                    formatOptions={
+                        "cloudOptimized": True,
+                        "noData": out_no_data_val,
+                    },
+                ),
+            )
+        )
 
     print("")
     n += 1
+
+print(f"{len(gee_tasks)} GEE tasks ({prj_export_mode}).")
+gmw_gee_tasks.run_gee_tasks(
+    gee_tasks,
+    job_db_file,
+    job_stage,
+    max_running=max_running_tasks,
+    max_attempts=max_task_attempts,
+)
@@ -0,0 +1,104 @@
+import os
+import glob
+import argparse
+
+import gmw_local_cls
+import gmw_local_mdls
+import gmw_tile_cat
+
+# Applies the locally trained project models (05_train_local_prj_mdls.py) to
+# a local archive of Landsat scenes, producing the same mangrove count and
+# valid count tiles as 06_apply_gmw_prj_mdls.py does on GEE.
+
+year = 2002
+
+# The scenes for each tile are GeoTIFFs with the Blue, Green, Red, NIR, SWIR1
+# and SWIR2 bands (scaled by 10000) on the same pixel grid within:
+# {ls_scenes_dir}/{year}/{tile_name}/*.tif
+ls_scenes_dir = "gmw_ls_scenes"
+# Optional directory of habitat mask tiles ({tile_name}_hab_msk.tif) on the
+# same grid as the scenes.
+hab_msk_dir = None
+mdls_dir = "gmw_local_mdls"
+# The models of the project ensembles to be applied (e.g., list(range(1, 11))
+# for all the models trained by 05_train_local_prj_mdls.py). Where more than
+# one model is used the class is the majority vote and, as with the GEE
+# ensemble mode, the model vote (MNG_VOTES) and agreement (AGREE) counts are
+# output as additional bands.
+mdl_ns = [1]
+blk_size = 512
+
+out_dir = f"gmw_{year}_mng_count_tiles_local"
+if len(mdl_ns) == 1:
+    out_mdl_name = f"{mdl_ns[0]}"
+else:
+    out_mdl_name = f"ens{len(mdl_ns)}"
+
+prj_rgns_vec_file = "gmw_tiles_prj_def_hab_intersect.geojson"
+prj_rgns_vec_lyr = "gmw_tiles_prj_def_hab_intersect"
+prjs_col_name = "gmw_prj"
+tiles_col_name = "gmw_tile_name"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="The number of processes used to classify the tiles.",
+    )
+    args = parser.parse_args()
+
+    if not os.path.exists(out_dir):
+        os.mkdir(out_dir)
+
+    tile_cat = gmw_tile_cat.read_tile_cat(
+        prj_rgns_vec_file, prj_rgns_vec_lyr, prjs_col_name, tiles_col_name
+    )
+
+    tile_jobs = list()
+    for tile_name, prj_name in tile_cat["tile_prj"].items():
+        out_img_file = os.path.join(
+            out_dir, f"{tile_name}_{year}_mng_cls_count_{out_mdl_name}.tif"
+        )
+        if os.path.exists(out_img_file):
+            continue
+        mdls_avail = all(
+            os.path.exists(gmw_local_mdls.get_mdl_file(mdls_dir, prj_name, mdl_n))
+            for mdl_n in mdl_ns
+        )
+        if not mdls_avail:
+            continue
+        scene_files = sorted(
+            glob.glob(os.path.join(ls_scenes_dir, f"{year}", tile_name, "*.tif"))
+        )
+        if len(scene_files) == 0:
+            continue
+        msk_img_file = None
+        if hab_msk_dir is not None:
+            msk_img_file = os.path.join(hab_msk_dir, f"{tile_name}_hab_msk.tif")
+            if not os.path.exists(msk_img_file):
+                continue
+        tile_jobs.append(
+            {
+                "tile_name": tile_name,
+                "prj_name": prj_name,
+                "scene_files": scene_files,
+                "out_img_file": out_img_file,
+                "msk_img_file": msk_img_file,
+            }
+        )
+    print(f"Classifying {len(tile_jobs)} tiles.")
+
+    tiles_errs = gmw_local_cls.run_classify_tiles(
+        tile_jobs,
+        n_workers=args.workers,
+        mdls_dir=mdls_dir,
+        mdl_ns=mdl_ns,
+        blk_size=blk_size,
+        out_votes=len(mdl_ns) > 1,
+    )
+    if len(tiles_errs) > 0:
+        print(f"Failed to classify {len(tiles_errs)} tiles:")
+        for tile_name in sorted(tiles_errs):
+            print(f"\t{tile_name}")
@@ -0,0 +1,82 @@
+import os
+import argparse
+
+import rasterio
+
+import gmw_tile_cat
+import gmw_tile_tools
+
+# Splits the project mosaics exported by 06_apply_gmw_prj_mdls.py with
+# prj_export_mode = "mosaic" (once downloaded from Google Drive) into the
+# same mangrove count and valid count tiles as the per tile exports.
+
+year = 2002
+
+mosaics_dir = f"gmw_{year}_mng_count_tiles"
+out_dir = f"gmw_{year}_mng_count_tiles_split"
+blk_size = 512
+
+prj_rgns_vec_file = "gmw_tiles_prj_def_hab_intersect.geojson"
+prj_rgns_vec_lyr = "gmw_tiles_prj_def_hab_intersect"
+prjs_col_name = "gmw_prj"
+tiles_col_name = "gmw_tile_name"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="The number of processes used to cut the tiles.",
+    )
+    args = parser.parse_args()
+
+    if not os.path.exists(out_dir):
+        os.mkdir(out_dir)
+
+    tile_cat = gmw_tile_cat.read_tile_cat(
+        prj_rgns_vec_file, prj_rgns_vec_lyr, prjs_col_name, tiles_col_name
+    )
+    prj_mosaic_files = gmw_tile_tools.get_prj_mosaic_files(mosaics_dir, year)
+
+    tile_jobs = list()
+    for (prj_name, mdl_name), mosaic_files in sorted(prj_mosaic_files.items()):
+        if prj_name not in tile_cat["prj_tiles"]:
+            continue
+        mosaic_bboxes = list()
+        for mosaic_file in mosaic_files:
+            with rasterio.open(mosaic_file) as mosaic_ds:
+                mosaic_bboxes.append(tuple(mosaic_ds.bounds))
+        for tile_name in tile_cat["prj_tiles"][prj_name]:
+            out_img_file = os.path.join(
+                out_dir, f"{tile_name}_{year}_mng_cls_count_{mdl_name}.tif"
+            )
+            if os.path.exists(out_img_file):
+                continue
+            # Only the tiles within the mosaic (i.e., which were pending).
+            tile_bbox = tile_cat["tile_bbox"][tile_name]
+            if not any(
+                (tile_bbox[0] < mosaic_bbox[2])
+                and (tile_bbox[2] > mosaic_bbox[0])
+                and (tile_bbox[1] < mosaic_bbox[3])
+                and (tile_bbox[3] > mosaic_bbox[1])
+                for mosaic_bbox in mosaic_bboxes
+            ):
+                continue
+            tile_jobs.append(
+                {
+                    "tile_name": tile_name,
+                    "mosaic_files": mosaic_files,
+                    "tile_bbox": tile_bbox,
+                    "out_img_file": out_img_file,
+                }
+            )
+    print(f"Cutting {len(tile_jobs)} tiles from {len(prj_mosaic_files)} mosaics.")
+
+    tiles_errs = gmw_tile_tools.run_cut_mosaic_tiles(
+        tile_jobs, n_workers=args.workers, blk_size=blk_size
+    )
+    if len(tiles_errs) > 0:
+        print(f"Failed to cut {len(tiles_errs)} tiles:")
+        for tile_name in sorted(tiles_errs):
+            print(f"\t{tile_name}")
@@ -1,41 +1,71 @@
-import glob
 import os
+import argparse
 
-import rsgislib
-import rsgislib.imagecalc
-import rsgislib.imageutils
-import rsgislib.tools.filetools
+import gmw_prop_tools
 
-rsgislib.imageutils.set_env_vars_lzw_gtiff_outs()
-
-years = ["2000"]
+# The years to be processed, if None all the year directories within the
+# base directory are processed.
+years = None
 base_dir = "/Users/pfb/Temp/gmw_v4_gee_cls_rslts/"
+# Index of the count images which the proportion images were calculated from
+# (path, size and modification time) so only new or changed images are
+# calculated when re-run.
+prop_index_file = os.path.join(base_dir, "gmw_prop_index.csv")
+# The number of threads used by GDAL to compress each output.
+n_gdal_threads = 1
+# The output no data value (pixels with no valid observations). A proportion
+# of 0 is a valid value (i.e., not mangroves) so this is outside of 0-100.
+# Proportion images calculated before this was 255 used a no data value of 0
+# and should be recalculated (i.e., deleted) before building the cubes.
+out_no_data_val = 255
 
-for year in years:
-    imgs_dir = os.path.join(base_dir, year, "counts")
-    out_dir = os.path.join(base_dir, year, "prop")
-
-    imgs = glob.glob(os.path.join(imgs_dir, "*.tif"))
-    for img in imgs:
-        basename = rsgislib.tools.filetools.get_file_basename(img)
-        out_img_file = os.path.join(out_dir, f"{basename}_prop.tif")
-        if not os.path.exists(out_img_file):
-            band_defs = list()
-            band_defs.append(
-                rsgislib.imagecalc.BandDefn(band_name="mng", input_img=img, img_band=1)
-            )
-            band_defs.append(
-                rsgislib.imagecalc.BandDefn(band_name="vld", input_img=img, img_band=2)
-            )
-            exp = "(mng/vld)*100"
-            rsgislib.imagecalc.band_math(
-                out_img_file,
-                exp=exp,
-                gdalformat="GTIFF",
-                datatype=rsgislib.TYPE_8UINT,
-                band_defs=band_defs,
-            )
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="The number of processes used to calculate the images.",
+    )
+    args = parser.parse_args()
 
-            rsgislib.imageutils.pop_img_stats(
-                out_img_file, use_no_data=True, no_data_val=0, calc_pyramids=True
+    if years is None:
+        years = gmw_prop_tools.get_year_dirs(base_dir)
+    print(f"Years: {', '.join(years)}")
+
+    count_imgs = gmw_prop_tools.scan_count_imgs(base_dir, years)
+    prop_index = gmw_prop_tools.read_prop_index(prop_index_file)
+    pending_imgs = gmw_prop_tools.get_pending_prop_imgs(count_imgs, prop_index)
+    print(f"{len(pending_imgs)} of {len(count_imgs)} images to be calculated.")
+
+    for out_dir in set(
+        os.path.dirname(count_img["out_img_file"]) for count_img in pending_imgs
+    ):
+        if not os.path.exists(out_dir):
+            os.mkdir(out_dir)
+
+    # A single pool for the images of all the years.
+    imgs_errs = gmw_prop_tools.run_calc_prop_imgs(
+        [
+            {
+                "in_img_file": count_img["in_img_file"],
+                "out_img_file": count_img["out_img_file"],
+            }
+            for count_img in pending_imgs
+        ],
+        n_workers=args.workers,
+        no_data_val=out_no_data_val,
+        n_threads=n_gdal_threads,
+    )
+    for count_img in pending_imgs:
+        if count_img["in_img_file"] not in imgs_errs:
+            prop_index[count_img["in_img_file"]] = (
+                count_img["in_size"],
+                count_img["in_mtime"],
             )
+    gmw_prop_tools.write_prop_index(prop_index_file, prop_index)
+
+    if len(imgs_errs) > 0:
+        print(f"Failed to calculate {len(imgs_errs)} images:")
+        for img in sorted(imgs_errs):
+            print(f"\t{img}")
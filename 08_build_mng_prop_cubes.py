@@ -0,0 +1,66 @@
+import os
+import argparse
+
+import gmw_cube_tools
+import gmw_prop_tools
+
+# Builds, for each tile and model, a multi-year cube of the proportion images
+# from 07_calc_mng_cls_prop.py (a band for each year) and the change metrics
+# (first year of loss and gain and the trend of the proportion).
+
+# The years to be used, if None all the year directories within the base
+# directory are used.
+years = None
+base_dir = "/Users/pfb/Temp/gmw_v4_gee_cls_rslts/"
+out_dir = os.path.join(base_dir, "cubes")
+# The proportion (%) threshold for a pixel to be mangroves.
+mng_thres = 50
+chunk_size = 256
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="The number of processes used to build the cubes.",
+    )
+    args = parser.parse_args()
+
+    if years is None:
+        years = gmw_prop_tools.get_year_dirs(base_dir)
+    print(f"Years: {', '.join(years)}")
+
+    if not os.path.exists(out_dir):
+        os.mkdir(out_dir)
+
+    tile_imgs = gmw_cube_tools.get_tile_prop_imgs(base_dir, years)
+    tile_jobs = list()
+    for (tile_name, mdl_name), year_imgs in sorted(tile_imgs.items()):
+        out_name = f"{tile_name}_{mdl_name}"
+        out_cube_file = os.path.join(out_dir, f"{out_name}_mng_prop_cube.tif")
+        out_metrics_file = os.path.join(out_dir, f"{out_name}_mng_chng_metrics.tif")
+        # Rebuild if an input is newer than the outputs.
+        if os.path.exists(out_cube_file) and os.path.exists(out_metrics_file):
+            out_mtime = min(
+                os.path.getmtime(out_cube_file), os.path.getmtime(out_metrics_file)
+            )
+            if all(os.path.getmtime(img) <= out_mtime for img in year_imgs.values()):
+                continue
+        tile_jobs.append(
+            {
+                "tile_name": out_name,
+                "year_imgs": year_imgs,
+                "out_cube_file": out_cube_file,
+                "out_metrics_file": out_metrics_file,
+            }
+        )
+    print(f"{len(tile_jobs)} of {len(tile_imgs)} tiles to be built.")
+
+    tiles_errs = gmw_cube_tools.run_build_tile_cubes(
+        tile_jobs, n_workers=args.workers, chunk_size=chunk_size, mng_thres=mng_thres
+    )
+    if len(tiles_errs) > 0:
+        print(f"Failed to build the cubes for {len(tiles_errs)} tiles:")
+        for tile_name in sorted(tiles_errs):
+            print(f"\t{tile_name}")
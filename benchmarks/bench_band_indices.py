@@ -0,0 +1,80 @@
+"""
+Micro-benchmark of the local band index calculation (gmw_indices) for a
+3600 x 3600 pixel tile, comparing a direct numpy translation of the GEE
+expressions (a temporary array for each operation) with the numpy (chunked,
+in place) and numexpr implementations of calc_band_indices_arr. Also checks
+the outputs are the same.
+"""
+import os
+import sys
+import time
+
+import numpy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import gmw_indices  # noqa: E402
+
+tile_size = 3600
+n_repeats = 3
+
+rng = numpy.random.default_rng(42)
+refl_arr = rng.integers(-100, 6000, (6, tile_size, tile_size)).astype(numpy.int16)
+
+
+def calc_indices_direct(refl_arr):
+    img = refl_arr.astype(numpy.float32) * numpy.float32(0.0001)
+    blue, green, red, nir, swir1, swir2 = img
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        ndvi = (nir - red) / (nir + red)
+        ndvi[(nir < 0) | (red < 0)] = numpy.nan
+        ndwi = (nir - swir1) / (nir + swir1)
+        ndwi[(nir < 0) | (swir1 < 0)] = numpy.nan
+        nbr = (nir - swir2) / (nir + swir2)
+        nbr[(nir < 0) | (swir2 < 0)] = numpy.nan
+        evi = 2.5 * ((nir - red) / (nir + 6 * red - 7.5 * blue + 1))
+        mvi = (nir - green) / (swir1 - green)
+    return numpy.concatenate(
+        [img, numpy.stack([ndvi, ndwi, nbr, evi, mvi]).astype(numpy.float32)]
+    )
+
+
+out_arr = numpy.empty((len(gmw_indices.bands), tile_size, tile_size), numpy.float32)
+bench_funcs = [
+    ("direct numpy", lambda: calc_indices_direct(refl_arr)),
+    (
+        "calc_band_indices_arr (numpy)",
+        lambda: gmw_indices.calc_band_indices_arr(
+            refl_arr, out_arr=out_arr, use_numexpr=False
+        ),
+    ),
+]
+try:
+    import numexpr
+
+    bench_funcs.append(
+        (
+            f"calc_band_indices_arr (numexpr, {numexpr.get_num_threads()} threads)",
+            lambda: gmw_indices.calc_band_indices_arr(
+                refl_arr, out_arr=out_arr, use_numexpr=True
+            ),
+        )
+    )
+except ImportError:
+    print("numexpr is not installed.")
+
+ref_arr = None
+for name, func in bench_funcs:
+    times = list()
+    for _ in range(n_repeats):
+        s_time = time.perf_counter()
+        c_arr = func()
+        times.append(time.perf_counter() - s_time)
+    if ref_arr is None:
+        ref_arr = c_arr.copy()
+        diff_str = ""
+    else:
+        n_diff = numpy.count_nonzero(
+            ~numpy.isclose(c_arr, ref_arr, rtol=1e-3, atol=1e-5, equal_nan=True)
+        )
+        diff_str = f" ({n_diff} values differ)"
+    print(f"{name}: {min(times):.3f} s (min of {n_repeats}){diff_str}")
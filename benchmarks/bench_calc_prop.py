@@ -0,0 +1,101 @@
+"""
+Benchmark of the stage 07 proportion calculation on synthetic count tiles,
+comparing the previous approach (the whole image calculated and written to
+a GeoTIFF, which is then read again to calculate the statistics and build
+the overviews, one tile at a time) with gmw_prop_tools.run_calc_prop_imgs
+(a single blocked pass writing a COG, with a pool of processes).
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy
+import rasterio
+import rasterio.transform
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import gmw_prop_tools  # noqa: E402
+
+n_tiles = 8
+tile_size = 3600
+n_workers = os.cpu_count()
+
+
+def calc_prop_two_pass(in_img_file, out_img_file):
+    with rasterio.open(in_img_file) as in_ds:
+        in_arr = in_ds.read().astype(numpy.float64)
+        profile = in_ds.profile
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        prop_arr = (in_arr[0] / in_arr[1]) * 100
+    prop_arr[~numpy.isfinite(prop_arr)] = 255
+    profile.update(count=1, dtype="uint8", compress="LZW", nodata=255)
+    with rasterio.open(out_img_file, "w", **profile) as out_ds:
+        out_ds.write(prop_arr.astype(numpy.uint8), 1)
+    with rasterio.open(out_img_file, "r+") as out_ds:
+        out_arr = out_ds.read(1)
+        vld_arr = out_arr[out_arr != 255]
+        out_ds.update_tags(
+            1,
+            STATISTICS_MINIMUM=int(vld_arr.min()),
+            STATISTICS_MAXIMUM=int(vld_arr.max()),
+            STATISTICS_MEAN=float(vld_arr.mean()),
+            STATISTICS_STDDEV=float(vld_arr.std()),
+        )
+        out_ds.build_overviews([2, 4, 8, 16], rasterio.enums.Resampling.average)
+
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    rng = numpy.random.default_rng(42)
+    in_img_files = list()
+    for i in range(n_tiles):
+        vld_arr = rng.integers(0, 40, (tile_size, tile_size)).astype(numpy.int32)
+        mng_arr = (vld_arr * rng.random((tile_size, tile_size))).astype(numpy.int32)
+        in_img_file = os.path.join(tmp_dir, f"tile_{i}_counts.tif")
+        with rasterio.open(
+            in_img_file,
+            "w",
+            driver="GTiff",
+            width=tile_size,
+            height=tile_size,
+            count=2,
+            dtype="int32",
+            crs="EPSG:4326",
+            transform=rasterio.transform.from_origin(i, 1, 1 / tile_size, 1 / tile_size),
+            nodata=0,
+            tiled=True,
+            compress="LZW",
+        ) as out_ds:
+            out_ds.write(numpy.stack([mng_arr, vld_arr]))
+        in_img_files.append(in_img_file)
+
+    s_time = time.perf_counter()
+    for in_img_file in in_img_files:
+        calc_prop_two_pass(in_img_file, in_img_file.replace(".tif", "_prop_2p.tif"))
+    two_pass_time = time.perf_counter() - s_time
+    print(f"Two pass, serial: {two_pass_time:.2f} s")
+
+    for c_n_workers in sorted(set([1, n_workers])):
+        s_time = time.perf_counter()
+        gmw_prop_tools.run_calc_prop_imgs(
+            [
+                {
+                    "in_img_file": in_img_file,
+                    "out_img_file": in_img_file.replace(".tif", "_prop.tif"),
+                }
+                for in_img_file in in_img_files
+            ],
+            n_workers=c_n_workers,
+        )
+        c_time = time.perf_counter() - s_time
+        print(
+            f"run_calc_prop_imgs ({c_n_workers} workers): {c_time:.2f} s "
+            f"({two_pass_time / c_time:.1f}x)"
+        )
+
+    n_diff = 0
+    for in_img_file in in_img_files:
+        with rasterio.open(in_img_file.replace(".tif", "_prop_2p.tif")) as ref_ds:
+            with rasterio.open(in_img_file.replace(".tif", "_prop.tif")) as out_ds:
+                n_diff += numpy.count_nonzero(ref_ds.read(1) != out_ds.read(1))
+    print(f"{n_diff} pixels differ")
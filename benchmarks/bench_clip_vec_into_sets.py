@@ -0,0 +1,86 @@
+"""
+Benchmark comparing the 'clip' and 'single_pass' partition modes of
+clip_vec_into_sets on a synthetic global set of points and a synthetic
+1 degree tile grid of projects. Also checks the output files are identical.
+"""
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+import numpy
+import geopandas
+import shapely
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gmw_vec_tools import clip_vec_into_sets  # noqa: E402
+
+n_pts = 1000000
+n_prjs = 200
+rng = numpy.random.default_rng(42)
+
+# 1 degree tiles between +/- 40 deg latitude assigned to projects in blocks.
+min_xs, min_ys = numpy.meshgrid(
+    numpy.arange(-180, 180, dtype=float), numpy.arange(-40, 40, dtype=float)
+)
+min_xs = min_xs.ravel()
+min_ys = min_ys.ravel()
+tile_prjs = [
+    f"GMW-{int(prj):03d}"
+    for prj in ((min_xs + 180) // 18 * 10 + (min_ys + 40) // 8) % n_prjs
+]
+tiles_gdf = geopandas.GeoDataFrame(
+    {"gmw_prj": tile_prjs},
+    geometry=shapely.box(min_xs, min_ys, min_xs + 1, min_ys + 1),
+    crs="EPSG:4326",
+)
+
+# Random points, some of which are snapped to the tile edges.
+pt_xs = rng.uniform(-180, 180, n_pts)
+pt_ys = rng.uniform(-40, 40, n_pts)
+edge_pts = rng.random(n_pts) < 0.01
+pt_xs[edge_pts] = numpy.round(pt_xs[edge_pts])
+pts_gdf = geopandas.GeoDataFrame(
+    {"ref_cls": rng.integers(1, 4, n_pts)},
+    geometry=geopandas.points_from_xy(pt_xs, pt_ys),
+    crs="EPSG:4326",
+)
+
+
+def _hash_dir(dir_path):
+    out_hashes = dict()
+    for file_name in sorted(os.listdir(dir_path)):
+        with open(os.path.join(dir_path, file_name), "rb") as f:
+            out_hashes[file_name] = hashlib.sha256(f.read()).hexdigest()
+    return out_hashes
+
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    tiles_file = os.path.join(tmp_dir, "tiles.parquet")
+    pts_file = os.path.join(tmp_dir, "pts.parquet")
+    tiles_gdf.to_parquet(tiles_file)
+    pts_gdf.to_parquet(pts_file)
+
+    out_hashes = dict()
+    for partition_mode in ["clip", "single_pass"]:
+        out_dir = os.path.join(tmp_dir, partition_mode)
+        start_time = time.perf_counter()
+        clip_vec_into_sets(
+            pts_file,
+            None,
+            tiles_file,
+            None,
+            "gmw_prj",
+            out_vec_dir=out_dir,
+            out_vec_base_pre="",
+            out_vec_base_post="refs_smps",
+            out_vec_ext="parquet.sz",
+            out_format="PARQUET",
+            out_name_lower=True,
+            partition_mode=partition_mode,
+        )
+        print(f"{partition_mode}: {time.perf_counter() - start_time:.2f} seconds")
+        out_hashes[partition_mode] = _hash_dir(out_dir)
+
+    print(f"Outputs identical: {out_hashes['clip'] == out_hashes['single_pass']}")
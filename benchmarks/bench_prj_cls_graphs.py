@@ -0,0 +1,135 @@
+"""
+Benchmark comparing the construction of the stage 06 classification graphs
+and export tasks for each tile (the previous approach) and once for each
+project (gmw_gee_cls with prj_export_mode "tiles" or "mosaic") for all the
+tiles in the tile catalogue, and for an ensemble of n_mdls models. A local
+stub stands in for the ee and pb_gee_tools modules so GEE is not required;
+the stub counts the ee objects (i.e., graph nodes) created, the Landsat
+collection requests and the export tasks. The times are client side only, so do not include the time taken by
+GEE to run the graph, but the number of nodes and tasks are those sent.
+"""
+import os
+import sys
+import time
+import types
+import datetime
+
+n_repeats = 3
+n_mdls = 10
+
+stub_counts = {"nodes": 0, "ls_cols": 0, "tasks": 0}
+
+
+class StubNode:
+    def __init__(self, *args, **kwargs):
+        stub_counts["nodes"] += 1
+        # As ee does, map functions are called once to build their graph.
+        for arg in list(args) + list(kwargs.values()):
+            if callable(arg) and not isinstance(arg, StubNode):
+                arg(StubNode())
+
+    def __getattr__(self, name):
+        return StubNode
+
+    def __call__(self, *args, **kwargs):
+        return StubNode(*args, **kwargs)
+
+
+def stub_export(**kwargs):
+    stub_counts["tasks"] += 1
+    return StubNode()
+
+
+def stub_ls_col(**kwargs):
+    stub_counts["ls_cols"] += 1
+    return StubNode()
+
+
+ee_stub = types.ModuleType("ee")
+ee_stub.Image = type("StubImage", (StubNode,), {"cat": StubNode})
+ee_stub.ImageCollection = StubNode
+ee_stub.Geometry = StubNode()
+ee_stub.Reducer = StubNode()
+ee_stub.batch = types.SimpleNamespace(
+    Export=types.SimpleNamespace(image=types.SimpleNamespace(toDrive=stub_export))
+)
+sys.modules["ee"] = ee_stub
+ee = ee_stub
+pb_gee_tools_stub = types.ModuleType("pb_gee_tools")
+pb_gee_tools_stub.datasets = types.ModuleType("pb_gee_tools.datasets")
+pb_gee_tools_stub.datasets.get_sr_landsat_collection = stub_ls_col
+sys.modules["pb_gee_tools"] = pb_gee_tools_stub
+sys.modules["pb_gee_tools.datasets"] = pb_gee_tools_stub.datasets
+
+pkg_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, pkg_dir)
+import gmw_gee_cls  # noqa: E402
+import gmw_tile_cat  # noqa: E402
+
+start_date = datetime.datetime(year=2002, month=1, day=1)
+end_date = datetime.datetime(year=2002, month=12, day=31)
+msk_img = ee.Image("gmw_v23_hab_msk")
+trained_cls = StubNode()
+
+tile_cat = gmw_tile_cat.read_tile_cat(
+    os.path.join(pkg_dir, "gmw_tiles_prj_def_hab_intersect.geojson"),
+    "gmw_tiles_prj_def_hab_intersect",
+    use_cache=False,
+)
+
+
+def export(out_img, out_aoi):
+    ee.batch.Export.image.toDrive(image=out_img, region=out_aoi)
+
+
+def per_tile():
+    for prj_name in tile_cat["prjs"]:
+        for tile_name in tile_cat["prj_tiles"][prj_name]:
+            tile_aoi = ee.Geometry.BBox(*tile_cat["tile_bbox"][tile_name])
+            ls_img_col = gmw_gee_cls.get_ls_img_col(
+                tile_aoi, start_date, end_date, msk_img=msk_img
+            )
+            export(gmw_gee_cls.get_cls_count_img(ls_img_col, trained_cls), tile_aoi)
+
+
+def per_prj(prj_export_mode, cls_ensemble=False):
+    for prj_name in tile_cat["prjs"]:
+        tile_bboxes = [
+            tile_cat["tile_bbox"][tile_name]
+            for tile_name in tile_cat["prj_tiles"][prj_name]
+        ]
+        ls_img_col = gmw_gee_cls.get_ls_img_col(
+            gmw_gee_cls.get_tiles_aoi(tile_bboxes), start_date, end_date, msk_img=msk_img
+        )
+        if cls_ensemble:
+            out_img = gmw_gee_cls.get_ens_cls_count_img(
+                ls_img_col, [StubNode() for _ in range(n_mdls)]
+            )
+        else:
+            out_img = gmw_gee_cls.get_cls_count_img(ls_img_col, trained_cls)
+        if prj_export_mode == "mosaic":
+            export(out_img, ee.Geometry.BBox(*gmw_gee_cls.get_tiles_bbox(tile_bboxes)))
+        else:
+            for tile_bbox in tile_bboxes:
+                export(out_img, ee.Geometry.BBox(*tile_bbox))
+
+
+print(f"{len(tile_cat['prjs'])} projects, {len(tile_cat['tile_prj'])} tiles")
+for name, func in [
+    ("per tile", per_tile),
+    ("per project (tiles)", lambda: per_prj("tiles")),
+    ("per project (mosaic)", lambda: per_prj("mosaic")),
+    (f"per project (tiles, {n_mdls} model ensemble)", lambda: per_prj("tiles", True)),
+]:
+    times = list()
+    for _ in range(n_repeats):
+        for key in stub_counts:
+            stub_counts[key] = 0
+        s_time = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - s_time)
+    print(
+        f"{name}: {min(times):.3f} s (min of {n_repeats}); "
+        f"{stub_counts['ls_cols']} graphs, {stub_counts['nodes']} ee objects, "
+        f"{stub_counts['tasks']} tasks"
+    )
@@ -0,0 +1,255 @@
+def get_tile_prop_imgs(base_dir: str, years: list) -> dict:
+    """
+    A function which finds the per-year proportion images (i.e., the output
+    of 07_calc_mng_cls_prop.py:
+    {base_dir}/{year}/prop/{tile}_{year}_mng_cls_count_{mdl}_prop.tif) and
+    groups them by tile and model (e.g., 1 or ens10), so the time series of
+    each model are kept separate.
+
+    :param base_dir: the base directory.
+    :param years: list of the years.
+    :return: dict of (tile name, model name) to a dict of year to image file
+             (sorted by year)
+
+    """
+    import os
+    import re
+
+    tile_imgs = dict()
+    for year in sorted(years):
+        prop_dir = os.path.join(base_dir, year, "prop")
+        if not os.path.isdir(prop_dir):
+            continue
+        img_re = re.compile(
+            rf"^(?P<tile>.+)_{year}_(mng_cls_count_)?(?P<mdl>.+)_prop\.tif$"
+        )
+        for entry in os.scandir(prop_dir):
+            img_match = img_re.match(entry.name)
+            if entry.is_file() and (img_match is not None):
+                tile_key = (img_match.group("tile"), img_match.group("mdl"))
+                year_imgs = tile_imgs.setdefault(tile_key, dict())
+                if year in year_imgs:
+                    raise Exception(
+                        f"There is more than one {year} image for {tile_key}: "
+                        f"'{year_imgs[year]}' and '{entry.path}'"
+                    )
+                year_imgs[year] = entry.path
+    return tile_imgs
+
+
+def calc_chng_metrics(prop_arr, years, mng_thres: int = 50, no_data_val: int = 255):
+    """
+    A function which calculates change metrics for a block of the per-year
+    proportion time series. A pixel is mangrove in a year where its
+    proportion is >= mng_thres. A proportion of 0 is a valid value (i.e.,
+    valid observations none of which are mangroves) while years where a
+    pixel is no data (no valid observations) are ignored, so a change is
+    between consecutive years with data and the trend is fitted to the years
+    with data.
+
+    :param prop_arr: numpy array (n_years, rows, cols) of the proportions.
+    :param years: list of the years (as ints) of prop_arr.
+    :param mng_thres: the proportion (%) threshold for mangroves.
+    :param no_data_val: the no data value of prop_arr.
+    :return: float32 numpy array (3, rows, cols) of the first year of loss
+             (mangroves to not mangroves), the first year of gain (not
+             mangroves to mangroves), 0 if there was no change, and the trend
+             (least squares slope) of the proportion (% per year), 0 where
+             there are less than two years with data.
+
+    """
+    import numpy
+
+    years = numpy.asarray(years, dtype=numpy.float32)
+    out_arr = numpy.zeros((3,) + prop_arr.shape[1:], dtype=numpy.float32)
+    if len(years) > 1:
+        vld_msk = prop_arr != no_data_val
+        mng_msk = prop_arr >= mng_thres
+        # The mangrove state of the last year with data.
+        prev_vld = numpy.zeros(prop_arr.shape[1:], dtype=bool)
+        prev_mng = numpy.zeros(prop_arr.shape[1:], dtype=bool)
+        for year, yr_vld, yr_mng in zip(years, vld_msk, mng_msk):
+            yr_chng = prev_vld & yr_vld & (prev_mng != yr_mng)
+            out_arr[0][yr_chng & prev_mng & (out_arr[0] == 0)] = year
+            out_arr[1][yr_chng & yr_mng & (out_arr[1] == 0)] = year
+            prev_mng = numpy.where(yr_vld, yr_mng, prev_mng)
+            prev_vld |= yr_vld
+
+        # The least squares slope of the years with data; the no data values
+        # are set to 0 and excluded from the counts so they do not add to
+        # the sums.
+        yrs_diff = years - years.mean()
+        vld_arr = vld_msk.astype(numpy.float32)
+        prop_vld_arr = numpy.where(vld_msk, prop_arr, 0).astype(numpy.float32)
+        n_vld = vld_arr.sum(axis=0)
+        sum_x = numpy.tensordot(yrs_diff, vld_arr, axes=(0, 0))
+        sum_xx = numpy.tensordot(yrs_diff**2, vld_arr, axes=(0, 0))
+        sum_y = prop_vld_arr.sum(axis=0)
+        sum_xy = numpy.tensordot(yrs_diff, prop_vld_arr, axes=(0, 0))
+        slope_den = n_vld * sum_xx - sum_x**2
+        fit_msk = (n_vld > 1) & (slope_den > 0)
+        slope_num = n_vld * sum_xy - sum_x * sum_y
+        out_arr[2][fit_msk] = slope_num[fit_msk] / slope_den[fit_msk]
+    return out_arr
+
+
+def build_tile_cube(
+    year_imgs: dict,
+    out_cube_file: str,
+    out_metrics_file: str,
+    chunk_size: int = 256,
+    mng_thres: int = 50,
+    no_data_val: int = 255,
+):
+    """
+    A function which builds a multi-year cube for a tile from the per-year
+    proportion images, with a band for each year, and calculates the change
+    metrics (see calc_chng_metrics). The images are processed a chunk column
+    (all the years for chunk_size x chunk_size pixels) at a time so the
+    memory used does not depend on the size of the tile. The cube is a COG
+    with the years pixel interleaved in chunk_size tiles so the time series
+    of a pixel is read from a single block. The outputs are written to
+    temporary files and renamed when complete. The no data value of each
+    proportion image is read from the image, so images with a different no
+    data value (e.g., 0 for those calculated before 255 was used) are
+    converted to no_data_val.
+
+    :param year_imgs: dict of year to proportion image file.
+    :param out_cube_file: the output cube COG file.
+    :param out_metrics_file: the output change metrics COG file.
+    :param chunk_size: the size (pixels) of the chunks.
+    :param mng_thres: the proportion (%) threshold for mangroves.
+    :param no_data_val: the no data value of the cube (outside of 0-100).
+
+    """
+    import os
+    import contextlib
+
+    import numpy
+    import rasterio
+    import rasterio.shutil
+    import rasterio.windows
+
+    years = sorted(year_imgs)
+    with contextlib.ExitStack() as ctx_stack:
+        year_dss = [
+            ctx_stack.enter_context(rasterio.open(year_imgs[year])) for year in years
+        ]
+        ref_ds = year_dss[0]
+        for year, year_ds in zip(years, year_dss):
+            if (year_ds.shape != ref_ds.shape) or (
+                year_ds.transform != ref_ds.transform
+            ):
+                raise Exception(
+                    f"The {year} image is not on the same grid as the {years[0]} image."
+                )
+
+        base_profile = {
+            "driver": "GTiff",
+            "width": ref_ds.width,
+            "height": ref_ds.height,
+            "crs": ref_ds.crs,
+            "transform": ref_ds.transform,
+            "tiled": True,
+            "blockxsize": chunk_size,
+            "blockysize": chunk_size,
+        }
+        out_files = [
+            (
+                out_cube_file,
+                dict(base_profile, count=len(years), dtype="uint8", nodata=no_data_val, interleave="pixel"),
+                [f"{year}" for year in years],
+            ),
+            (
+                out_metrics_file,
+                dict(base_profile, count=3, dtype="float32"),
+                ["FIRST_LOSS_YEAR", "FIRST_GAIN_YEAR", "TREND_SLOPE"],
+            ),
+        ]
+        tmp_files = [
+            os.path.join(os.path.dirname(out_file), f".tmp_{os.path.basename(out_file)}")
+            for out_file, _, _ in out_files
+        ]
+        tmp_cog_files = [
+            os.path.join(os.path.dirname(out_file), f".tmp_cog_{os.path.basename(out_file)}")
+            for out_file, _, _ in out_files
+        ]
+        try:
+            out_dss = list()
+            for tmp_file, (_, out_profile, band_names) in zip(tmp_files, out_files):
+                out_ds = ctx_stack.enter_context(
+                    rasterio.open(tmp_file, "w", **out_profile)
+                )
+                for band_idx, band_name in enumerate(band_names):
+                    out_ds.set_band_description(band_idx + 1, band_name)
+                out_dss.append(out_ds)
+            cube_ds, metrics_ds = out_dss
+
+            chunk_arr = numpy.zeros((len(years), chunk_size, chunk_size), numpy.uint8)
+            for row_off in range(0, ref_ds.height, chunk_size):
+                for col_off in range(0, ref_ds.width, chunk_size):
+                    chunk_win = rasterio.windows.Window(
+                        col_off,
+                        row_off,
+                        min(chunk_size, ref_ds.width - col_off),
+                        min(chunk_size, ref_ds.height - row_off),
+                    )
+                    c_arr = chunk_arr[:, : chunk_win.height, : chunk_win.width]
+                    for year_idx, year_ds in enumerate(year_dss):
+                        year_ds.read(1, window=chunk_win, out=c_arr[year_idx])
+                        if year_ds.nodata not in [None, no_data_val]:
+                            c_arr[year_idx][c_arr[year_idx] == year_ds.nodata] = no_data_val
+                    cube_ds.write(c_arr, window=chunk_win)
+                    metrics_ds.write(
+                        calc_chng_metrics(
+                            c_arr, [int(year) for year in years], mng_thres, no_data_val
+                        ),
+                        window=chunk_win,
+                    )
+            for out_ds in out_dss:
+                out_ds.close()
+
+            # Copy to COGs (with overviews), which GDAL does block by block,
+            # renamed when complete so an interrupted copy is not used.
+            for tmp_file, tmp_cog_file, (out_file, out_profile, _) in zip(
+                tmp_files, tmp_cog_files, out_files
+            ):
+                rasterio.shutil.copy(
+                    tmp_file,
+                    tmp_cog_file,
+                    driver="COG",
+                    COMPRESS="LZW",
+                    BLOCKSIZE=chunk_size,
+                    INTERLEAVE="PIXEL",
+                    OVERVIEWS="AUTO",
+                    OVERVIEW_RESAMPLING="NEAREST",
+                )
+                os.replace(tmp_cog_file, out_file)
+        finally:
+            for tmp_file in tmp_files + tmp_cog_files:
+                if os.path.exists(tmp_file):
+                    os.remove(tmp_file)
+
+
+def run_build_tile_cubes(tile_jobs: list, n_workers: int = 1, **kwargs) -> dict:
+    """
+    A function which runs build_tile_cube for a set of tiles using a pool of
+    n_workers processes (see gmw_pool_tools.run_pool_jobs). A tile which
+    fails is reported and does not stop the other tiles.
+
+    :param tile_jobs: list of dicts with the tile_name, year_imgs,
+                      out_cube_file and out_metrics_file of each tile.
+    :param n_workers: the number of processes.
+    :param kwargs: other build_tile_cube arguments common to all the tiles.
+    :return: dict of tile name to error message for the tiles which failed.
+
+    """
+    import gmw_pool_tools
+
+    _, tiles_errs = gmw_pool_tools.run_pool_jobs(
+        build_tile_cube,
+        gmw_pool_tools.get_pool_jobs(tile_jobs, "tile_name", kwargs),
+        n_workers=n_workers,
+        fail_label="build the cube for",
+    )
+    return tiles_errs
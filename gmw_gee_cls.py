@@ -0,0 +1,208 @@
+def get_tiles_bbox(tile_bboxes: list) -> tuple:
+    """
+    Get the bbox of a set of tiles.
+
+    :param tile_bboxes: list of the tile bboxes (min_x, min_y, max_x, max_y)
+    :return: tuple of (min_x, min_y, max_x, max_y)
+
+    """
+    return (
+        min(tile_bbox[0] for tile_bbox in tile_bboxes),
+        min(tile_bbox[1] for tile_bbox in tile_bboxes),
+        max(tile_bbox[2] for tile_bbox in tile_bboxes),
+        max(tile_bbox[3] for tile_bbox in tile_bboxes),
+    )
+
+
+def get_tiles_aoi(tile_bboxes: list):
+    """
+    A function which creates the GEE geometry of the union of a set of tiles
+    (i.e., a MultiPolygon of the tile rectangles, so scenes which only
+    intersect the bbox of the tiles are not included).
+
+    :param tile_bboxes: list of the tile bboxes (min_x, min_y, max_x, max_y)
+    :return: ee.Geometry
+
+    """
+    import ee
+
+    return ee.Geometry.MultiPolygon(
+        [
+            [
+                [
+                    [min_x, min_y],
+                    [max_x, min_y],
+                    [max_x, max_y],
+                    [min_x, max_y],
+                    [min_x, min_y],
+                ]
+            ]
+            for min_x, min_y, max_x, max_y in tile_bboxes
+        ],
+        None,
+        False,
+    )
+
+
+_loaded_clss = dict()
+
+
+def load_classifier(cls_asset_id: str):
+    """
+    Load a classifier asset (ee.Classifier.load), once per asset, so it is
+    only requested when it is used.
+
+    :param cls_asset_id: the classifier asset id.
+    :return: ee.Classifier
+
+    """
+    import ee
+
+    if cls_asset_id not in _loaded_clss:
+        _loaded_clss[cls_asset_id] = ee.Classifier.load(cls_asset_id)
+    return _loaded_clss[cls_asset_id]
+
+
+def calc_vld_msk(img):
+    return img.select("NIR").gt(0).rename("VLD_MSK")
+
+
+def get_ls_img_col(aoi, start_date, end_date, msk_img=None):
+    """
+    A function which gets the Landsat surface reflectance collection
+    (Blue, Green, Red, NIR, SWIR1 and SWIR2) for an area and period, masked
+    with msk_img (e.g., the GMW habitat mask).
+
+    :param aoi: ee.Geometry of the area.
+    :param start_date: the start date (datetime)
+    :param end_date: the end date (datetime)
+    :param msk_img: optional ee.Image mask.
+    :return: ee.ImageCollection
+
+    """
+    import pb_gee_tools.datasets
+
+    import gmw_indices
+
+    ls_img_col = pb_gee_tools.datasets.get_sr_landsat_collection(
+        aoi=aoi,
+        start_date=start_date,
+        end_date=end_date,
+        cloud_thres=70,
+        ignore_ls7=False,
+        out_lstm_bands=True,
+    ).select(gmw_indices.ls_bands)
+
+    if msk_img is not None:
+        ls_img_col = ls_img_col.map(lambda img: img.updateMask(msk_img))
+    return ls_img_col
+
+
+def get_cls_count_img(ls_img_col, trained_cls, mng_cls: int = 1):
+    """
+    A function which creates the image of the number of observations
+    classified as mangroves and the number of valid observations (i.e., the
+    two bands used by 07_calc_mng_cls_prop.py) from a Landsat collection.
+
+    :param ls_img_col: ee.ImageCollection (see get_ls_img_col)
+    :param trained_cls: the ee.Classifier.
+    :param mng_cls: the mangrove class value.
+    :return: ee.Image (integer)
+
+    """
+    import ee
+
+    import gmw_indices
+
+    ls_indices_img_col = ls_img_col.map(gmw_indices.calc_band_indices)
+    ls_vld_msk_img_col = ls_img_col.map(calc_vld_msk)
+
+    def apply_cls(img):
+        out_cls = img.classify(trained_cls)
+        mng_msk_img = out_cls.eq(mng_cls).mask(out_cls.eq(mng_cls)).rename("Mangroves")
+        return mng_msk_img
+
+    cls_mng_imgs = ls_indices_img_col.map(apply_cls)
+
+    cls_mng_img = cls_mng_imgs.reduce(ee.Reducer.sum())
+    vld_msk_img = ls_vld_msk_img_col.reduce(ee.Reducer.sum())
+    return ee.ImageCollection([cls_mng_img, vld_msk_img]).toBands().toInt()
+
+
+def get_ens_cls_count_img(
+    ls_img_col, trained_clss: list, mng_cls: int = 1, cls_vals: list = None
+):
+    """
+    A function which applies an ensemble of classifiers to a Landsat
+    collection within a single graph, the band indices of each scene being
+    calculated once and shared by all the classifiers. The class of a scene
+    is the majority vote of the classifiers, as with the local ensemble
+    (gmw_local_cls.classify_scenes_block), where ties are given to the
+    class first in cls_vals (i.e., the mangroves). The output has the bands:
+
+     - Mangroves: the number of scenes classified as mangroves.
+     - VLD_MSK: the number of valid scenes.
+     - MNG_VOTES: the total number of classifier votes for mangroves.
+     - AGREE: the number of scenes for which all the classifiers agree
+       (i.e., mangroves or not mangroves).
+
+    The first two bands are the same as get_cls_count_img so the outputs can
+    be used by 07_calc_mng_cls_prop.py.
+
+    :param ls_img_col: ee.ImageCollection (see get_ls_img_col)
+    :param trained_clss: list of ee.Classifier.
+    :param mng_cls: the mangrove class value.
+    :param cls_vals: list of the class values (Default: [1, 2, 3])
+    :return: ee.Image (integer)
+
+    """
+    import ee
+
+    import gmw_indices
+
+    if cls_vals is None:
+        cls_vals = [1, 2, 3]
+    n_clss = len(trained_clss)
+
+    ls_indices_img_col = ls_img_col.map(gmw_indices.calc_band_indices)
+    ls_vld_msk_img_col = ls_img_col.map(calc_vld_msk)
+
+    def apply_ens_cls(img):
+        out_clss = [img.classify(trained_cls) for trained_cls in trained_clss]
+        cls_votes = dict()
+        for cls_val in cls_vals:
+            cls_votes[cls_val] = out_clss[0].eq(cls_val)
+            for out_cls in out_clss[1:]:
+                cls_votes[cls_val] = cls_votes[cls_val].add(out_cls.eq(cls_val))
+        mng_votes = cls_votes[mng_cls]
+        is_mng = None
+        for cls_idx, cls_val in enumerate(cls_vals):
+            if cls_val == mng_cls:
+                continue
+            if cls_vals.index(mng_cls) < cls_idx:
+                cls_is_mng = mng_votes.gte(cls_votes[cls_val])
+            else:
+                cls_is_mng = mng_votes.gt(cls_votes[cls_val])
+            is_mng = cls_is_mng if is_mng is None else is_mng.And(cls_is_mng)
+        mng_msk_img = is_mng.mask(is_mng).rename("Mangroves")
+        agree_img = mng_votes.eq(0).Or(mng_votes.eq(n_clss)).rename("AGREE")
+        return ee.Image.cat(
+            [mng_msk_img, mng_votes.rename("MNG_VOTES"), agree_img]
+        )
+
+    cls_ens_imgs = ls_indices_img_col.map(apply_ens_cls)
+
+    cls_ens_img = cls_ens_imgs.reduce(ee.Reducer.sum())
+    vld_msk_img = ls_vld_msk_img_col.reduce(ee.Reducer.sum())
+    return (
+        ee.Image.cat(
+            [
+                cls_ens_img.select([0]),
+                vld_msk_img,
+                cls_ens_img.select([1]),
+                cls_ens_img.select([2]),
+            ]
+        )
+        .rename(["Mangroves", "VLD_MSK", "MNG_VOTES", "AGREE"])
+        .toInt()
+    )
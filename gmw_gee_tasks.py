@@ -0,0 +1,289 @@
+import time
+
+import gmw_job_db
+
+GEE_SUBMITTED_STATES = ["UNSUBMITTED", "READY"]
+GEE_RUNNING_STATES = ["RUNNING", "CANCEL_REQUESTED", "CANCELLING"]
+# GEE returns UNKNOWN for task ids which it does not recognise (e.g., purged).
+GEE_FAILED_STATES = ["FAILED", "CANCELLED", "UNKNOWN"]
+GEE_COMPLETED_STATE = "COMPLETED"
+
+
+def get_job_state_for_gee_state(gee_state: str) -> str:
+    """
+    Get the job state (see gmw_job_db) for a GEE task state.
+
+    :param gee_state: the GEE task state (e.g., READY, RUNNING, COMPLETED)
+    :return: the job state
+
+    """
+    if gee_state in GEE_SUBMITTED_STATES:
+        return gmw_job_db.JOB_SUBMITTED
+    elif gee_state in GEE_RUNNING_STATES:
+        return gmw_job_db.JOB_RUNNING
+    elif gee_state == GEE_COMPLETED_STATE:
+        return gmw_job_db.JOB_SUCCEEDED
+    elif gee_state in GEE_FAILED_STATES:
+        return gmw_job_db.JOB_FAILED
+    raise Exception(f"Unknown GEE task state: '{gee_state}'")
+
+
+def is_gee_quota_error(err: Exception) -> bool:
+    """
+    Check whether an error returned by GEE is a rate limit or quota error
+    (e.g., HTTP 429 or too many concurrent tasks) which should be retried.
+
+    :param err: the exception
+    :return: boolean
+
+    """
+    err_msg = str(err).lower()
+    for quota_msg in [
+        "429",
+        "too many",
+        "quota",
+        "rate limit",
+        "resource_exhausted",
+        "resource exhausted",
+    ]:
+        if quota_msg in err_msg:
+            return True
+    return False
+
+
+def call_with_backoff(
+    func, max_retries: int = 8, backoff: float = 2.0, max_backoff: float = 300
+):
+    """
+    Call a function, retrying with an exponential backoff if a GEE rate limit
+    or quota error is raised. Other errors are raised straight away.
+
+    :param func: function with no arguments to be called.
+    :param max_retries: the maximum number of times the call is retried.
+    :param backoff: the initial wait (seconds) which is doubled for each retry.
+    :param max_backoff: the maximum wait (seconds) between retries.
+    :return: the return value of func.
+
+    """
+    n_retries = 0
+    while True:
+        try:
+            return func()
+        except Exception as err:
+            if (n_retries >= max_retries) or (not is_gee_quota_error(err)):
+                raise
+            wait_time = min(backoff * (2**n_retries), max_backoff)
+            print(f"GEE quota error, retrying in {wait_time} seconds: {err}")
+            time.sleep(wait_time)
+            n_retries += 1
+
+
+def start_gee_task(create_task) -> str:
+    """
+    Create and start a GEE task, retrying on rate limit and quota errors.
+
+    :param create_task: function with no arguments which returns a new
+                        (unstarted) ee.batch.Task, e.g., a functools.partial
+                        of ee.batch.Export.image.toDrive.
+    :return: the task id.
+
+    """
+
+    def _start_task():
+        task = create_task()
+        task.start()
+        return task.id
+
+    return call_with_backoff(_start_task)
+
+
+def get_gee_tasks_status(task_ids: list, ee_module, batch_size: int = 100) -> dict:
+    """
+    Get the status of a set of GEE tasks, requesting the status of batch_size
+    tasks in each request.
+
+    :param task_ids: list of task ids.
+    :param ee_module: the ee module (or a replacement with the same interface
+                      for testing without GEE).
+    :param batch_size: the number of tasks for which the status is requested
+                       in a single request.
+    :return: dict of task id to the status dict (i.e., with state and
+             error_message keys).
+
+    """
+    out_status = dict()
+    for s_idx in range(0, len(task_ids), batch_size):
+        batch_ids = task_ids[s_idx : s_idx + batch_size]
+        batch_status = call_with_backoff(
+            lambda: ee_module.data.getTaskStatus(batch_ids)
+        )
+        for task_status in batch_status:
+            out_status[task_status["id"]] = task_status
+    return out_status
+
+
+def run_gee_tasks(
+    gee_tasks: list,
+    job_db_file: str,
+    stage: str,
+    max_running: int = 10,
+    n_threads: int = 4,
+    poll_interval: float = 30,
+    max_attempts: int = 3,
+    max_missing_polls: int = 5,
+    ee_module=None,
+) -> dict:
+    """
+    A function which runs a set of GEE tasks keeping at most max_running
+    tasks submitted and not finished. Tasks are started using a pool of
+    threads and the status of the running tasks is requested in batches every
+    poll_interval seconds. Rate limit and quota errors are retried with an
+    exponential backoff and tasks which fail are resubmitted up to
+    max_attempts times. Tasks which GEE does not recognise (state UNKNOWN),
+    or which are missing from the status returned for max_missing_polls
+    polls in a row, are treated as failed, as are tasks which cannot be
+    submitted (other than rate limit and quota errors) so they do not stop
+    the other tasks. The state of the tasks is recorded in the job
+    database (see gmw_job_db) as it changes so if the function is run again it
+    resumes: succeeded tasks are not resubmitted and the tasks of the stage
+    still running are polled rather than submitted again.
+
+    :param gee_tasks: list of tuples of (unique task name, function with no
+                      arguments returning a new unstarted ee.batch.Task).
+    :param job_db_file: the job database file path.
+    :param stage: the name of the processing stage the tasks are part of.
+    :param max_running: the maximum number of tasks submitted and not finished.
+    :param n_threads: the number of threads used to start the tasks.
+    :param poll_interval: the time (seconds) between requesting the task status.
+    :param max_attempts: the number of times a task is submitted before it is
+                         left as failed.
+    :param max_missing_polls: the number of polls in a row a task can be
+                              missing from the status returned by GEE before
+                              it is treated as failed.
+    :param ee_module: the ee module, if None (default) ee is imported. Can be
+                      used to provide a replacement for testing without GEE.
+    :return: dict of task name to job state for all the tasks of the stage.
+
+    """
+    import collections
+    import concurrent.futures
+
+    if ee_module is None:
+        import ee as ee_module
+
+    db_conn = gmw_job_db.open_job_db(job_db_file)
+    stage_jobs = gmw_job_db.get_jobs(db_conn, stage)
+    job_states = {job_name: job["state"] for job_name, job in stage_jobs.items()}
+    job_task_ids = {job_name: job["task_id"] for job_name, job in stage_jobs.items()}
+    job_attempts = {job_name: job["n_attempts"] for job_name, job in stage_jobs.items()}
+    running = set(
+        job_name
+        for job_name, job_state in job_states.items()
+        if job_state in gmw_job_db.JOB_ACTIVE_STATES
+    )
+    n_missing_polls = dict()
+
+    create_task_funcs = dict()
+    to_submit = collections.deque()
+    for task_name, create_task in gee_tasks:
+        create_task_funcs[task_name] = create_task
+        job_state = job_states.get(task_name, None)
+        if job_state is None:
+            to_submit.append(task_name)
+        elif job_state == gmw_job_db.JOB_FAILED:
+            if job_attempts[task_name] < max_attempts:
+                to_submit.append(task_name)
+            else:
+                print(f"GEE task {task_name} has failed {max_attempts} times.")
+
+    print(
+        f"GEE tasks: {len(to_submit)} to submit and {len(running)} already running."
+    )
+    with concurrent.futures.ThreadPoolExecutor(max_workers=n_threads) as pool:
+        while (len(to_submit) > 0) or (len(running) > 0):
+            submit_futures = dict()
+            while (len(running) + len(submit_futures) < max_running) and (
+                len(to_submit) > 0
+            ):
+                task_name = to_submit.popleft()
+                submit_future = pool.submit(
+                    start_gee_task, create_task_funcs[task_name]
+                )
+                submit_futures[submit_future] = task_name
+
+            for submit_future in concurrent.futures.as_completed(submit_futures):
+                task_name = submit_futures[submit_future]
+                try:
+                    task_id = submit_future.result()
+                except Exception as err:
+                    # Recorded as a failed attempt so the other tasks are
+                    # still submitted and the task is retried.
+                    error_message = f"Failed to submit the task: {err}"
+                    print(f"GEE task {task_name} failed: {error_message}")
+                    gmw_job_db.update_job(
+                        db_conn,
+                        stage,
+                        task_name,
+                        gmw_job_db.JOB_FAILED,
+                        error_message=error_message,
+                        new_attempt=True,
+                    )
+                    job_states[task_name] = gmw_job_db.JOB_FAILED
+                    job_attempts[task_name] = job_attempts.get(task_name, 0) + 1
+                    if job_attempts[task_name] < max_attempts:
+                        to_submit.append(task_name)
+                    continue
+                gmw_job_db.update_job(
+                    db_conn,
+                    stage,
+                    task_name,
+                    gmw_job_db.JOB_SUBMITTED,
+                    task_id=task_id,
+                    new_attempt=True,
+                )
+                job_states[task_name] = gmw_job_db.JOB_SUBMITTED
+                job_task_ids[task_name] = task_id
+                job_attempts[task_name] = job_attempts.get(task_name, 0) + 1
+                running.add(task_name)
+
+            if len(running) == 0:
+                continue
+            time.sleep(poll_interval)
+
+            running_ids = [job_task_ids[task_name] for task_name in running]
+            tasks_status = get_gee_tasks_status(running_ids, ee_module)
+            for task_name in list(running):
+                task_status = tasks_status.get(job_task_ids[task_name], None)
+                if task_status is None:
+                    n_missing_polls[task_name] = n_missing_polls.get(task_name, 0) + 1
+                    if n_missing_polls[task_name] < max_missing_polls:
+                        continue
+                    task_status = {
+                        "state": "UNKNOWN",
+                        "error_message": f"The task was not returned by GEE for {max_missing_polls} polls.",
+                    }
+                n_missing_polls.pop(task_name, None)
+                job_state = get_job_state_for_gee_state(task_status["state"])
+                if job_state == job_states[task_name]:
+                    continue
+                error_message = None
+                if job_state == gmw_job_db.JOB_FAILED:
+                    error_message = task_status.get("error_message", "")
+                    if not error_message:
+                        error_message = f"GEE task state: {task_status['state']}"
+                    print(f"GEE task {task_name} failed: {error_message}")
+                gmw_job_db.update_job(
+                    db_conn, stage, task_name, job_state, error_message=error_message
+                )
+                job_states[task_name] = job_state
+                if job_state == gmw_job_db.JOB_SUCCEEDED:
+                    running.remove(task_name)
+                elif job_state == gmw_job_db.JOB_FAILED:
+                    running.remove(task_name)
+                    if (task_name in create_task_funcs) and (
+                        job_attempts[task_name] < max_attempts
+                    ):
+                        to_submit.append(task_name)
+    db_conn.close()
+
+    return job_states
@@ -0,0 +1,138 @@
+def get_cls_pts_geojson(
+    cls_pts: list, cls_col: str = "class", max_n_pts: int = 100000
+) -> list:
+    """
+    A function which converts sets of points for a number of classes into
+    GeoJSON FeatureCollection(s), where each class is a MultiPoint feature
+    with a class property. Classes with no points are skipped. To keep the
+    size of the requests to GEE below its limits the points are split into
+    FeatureCollections with at most max_n_pts points (a class may be split
+    over more than one feature).
+
+    :param cls_pts: list of tuples of (class id, geopandas.GeoDataFrame) of points
+    :param cls_col: the name of the class property (Default: class)
+    :param max_n_pts: the maximum number of points within each FeatureCollection.
+    :return: list of GeoJSON FeatureCollection dicts (empty if there are no points)
+
+    """
+    import numpy
+
+    out_fcs = list()
+    c_features = list()
+    c_n_pts = 0
+    for cls_id, pts_gdf in cls_pts:
+        if len(pts_gdf) == 0:
+            continue
+        pts_coords = numpy.column_stack(
+            [pts_gdf.geometry.x.to_numpy(), pts_gdf.geometry.y.to_numpy()]
+        )
+        s_idx = 0
+        while s_idx < len(pts_coords):
+            if c_n_pts == max_n_pts:
+                out_fcs.append({"type": "FeatureCollection", "features": c_features})
+                c_features = list()
+                c_n_pts = 0
+            e_idx = min(s_idx + (max_n_pts - c_n_pts), len(pts_coords))
+            c_features.append(
+                {
+                    "type": "Feature",
+                    "geometry": {
+                        "type": "MultiPoint",
+                        "coordinates": pts_coords[s_idx:e_idx].tolist(),
+                    },
+                    "properties": {cls_col: int(cls_id)},
+                }
+            )
+            c_n_pts += e_idx - s_idx
+            s_idx = e_idx
+    if len(c_features) > 0:
+        out_fcs.append({"type": "FeatureCollection", "features": c_features})
+    return out_fcs
+
+
+def get_gee_cls_pts_fcs(
+    cls_pts: list, cls_col: str = "class", max_n_pts: int = 100000
+) -> list:
+    """
+    A function which creates an ee.FeatureCollection for each of the GeoJSON
+    payloads of the sets of points for a number of classes (see
+    get_cls_pts_geojson). The FeatureCollections are not merged as the graph
+    of the merged collection would include all the payloads, so each should
+    be used in a separate request (e.g., export task) to keep the size of
+    the requests below the GEE limits.
+
+    :param cls_pts: list of tuples of (class id, geopandas.GeoDataFrame) of points
+    :param cls_col: the name of the class property (Default: class)
+    :param max_n_pts: the maximum number of points within each payload.
+    :return: list of ee.FeatureCollection (empty if there are no points)
+
+    """
+    import ee
+
+    return [
+        ee.FeatureCollection(fc_geojson)
+        for fc_geojson in get_cls_pts_geojson(cls_pts, cls_col, max_n_pts)
+    ]
+
+
+def get_df_geojson_fc(data_df, columns: list = None, row_idxs=None) -> dict:
+    """
+    A function which converts a pandas DataFrame (e.g., of training samples)
+    into a GeoJSON FeatureCollection dict where each row is a feature, with
+    no geometry, and the columns are the feature properties. The values are
+    converted column by column to python types (rather than row by row) so
+    integer columns stay as integers and NaN values are converted to None
+    (i.e., null).
+
+    :param data_df: the pandas.DataFrame
+    :param columns: optional list of the columns to be used as properties. If
+                    None then all the columns other than latitude, longitude
+                    and .geo are used.
+    :param row_idxs: optional array of the positional indices of the rows to
+                     be used (i.e., a subset) so the DataFrame is not copied.
+    :return: GeoJSON FeatureCollection dict.
+
+    """
+    import numpy
+    import pandas
+
+    if columns is None:
+        columns = [
+            col for col in data_df.columns if col not in ["latitude", "longitude", ".geo"]
+        ]
+
+    col_vals = list()
+    for col in columns:
+        col_arr = data_df[col].to_numpy()
+        if row_idxs is not None:
+            col_arr = col_arr[row_idxs]
+        c_vals = col_arr.tolist()
+        if numpy.issubdtype(col_arr.dtype, numpy.floating):
+            for nan_idx in numpy.flatnonzero(numpy.isnan(col_arr)):
+                c_vals[nan_idx] = None
+        elif col_arr.dtype == object:
+            for nan_idx in numpy.flatnonzero(pandas.isna(col_arr)):
+                c_vals[nan_idx] = None
+        col_vals.append(c_vals)
+
+    features = [
+        {"type": "Feature", "geometry": None, "properties": dict(zip(columns, row))}
+        for row in zip(*col_vals)
+    ]
+    return {"type": "FeatureCollection", "features": features}
+
+
+def get_gee_df_fc(data_df, columns: list = None, row_idxs=None):
+    """
+    A function which creates an ee.FeatureCollection from a pandas DataFrame
+    (see get_df_geojson_fc) using a single GeoJSON payload.
+
+    :param data_df: the pandas.DataFrame
+    :param columns: optional list of the columns to be used as properties.
+    :param row_idxs: optional array of the positional indices of the rows.
+    :return: ee.FeatureCollection
+
+    """
+    import ee
+
+    return ee.FeatureCollection(get_df_geojson_fc(data_df, columns, row_idxs))
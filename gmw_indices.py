@@ -0,0 +1,184 @@
+# The features (surface reflectance bands and spectral indices) used to train
+# and apply the classifiers, defined once for both the GEE (ee.Image) and the
+# local (numpy/numexpr) processing so the features are consistent.
+
+# The Landsat surface reflectance bands (scaled by 10000).
+ls_bands = ["Blue", "Green", "Red", "NIR", "SWIR1", "SWIR2"]
+# The normalised difference indices as (name, first band, second band).
+nd_indices = [("NDVI", "NIR", "Red"), ("NDWI", "NIR", "SWIR1"), ("NBR", "NIR", "SWIR2")]
+# The other indices as (name, expression) with the band names as variables.
+expr_indices = [
+    ("EVI", "2.5 * ((NIR - Red) / (NIR + 6 * Red - 7.5 * Blue + 1))"),
+    ("MVI", "((NIR - Green) / (SWIR1 - Green))"),
+]
+indices = [idx[0] for idx in nd_indices] + [idx[0] for idx in expr_indices]
+# The features used by the classifiers, in order.
+bands = ls_bands + indices
+
+
+def calc_band_indices(img):
+    """
+    A function which scales the reflectance of a GEE Landsat image to 0-1
+    and adds the spectral indices as bands (i.e., to be mapped over an
+    ee.ImageCollection).
+
+    :param img: ee.Image with the ls_bands.
+    :return: ee.Image with the bands.
+
+    """
+    img = img.multiply(0.0001).float()
+    idx_imgs = list()
+    for idx_name, band_a, band_b in nd_indices:
+        idx_imgs.append(img.normalizedDifference([band_a, band_b]).rename(idx_name))
+    for idx_name, idx_exp in expr_indices:
+        idx_imgs.append(
+            img.expression(
+                idx_exp, {band: img.select(band) for band in ls_bands}
+            ).rename([idx_name])
+        )
+    return img.addBands(idx_imgs)
+
+
+def _calc_band_indices_numexpr(out_arr):
+    """
+    Calculate the indices with numexpr, which evaluates each expression in
+    cache sized blocks (using multiple threads) writing straight to the
+    output array so no temporary arrays are created.
+
+    """
+    import numpy
+    import numexpr
+
+    band_arrs = {band: out_arr[i] for i, band in enumerate(ls_bands)}
+    band_arrs["nan"] = numpy.float32(numpy.nan)
+    band_arrs["inf"] = numpy.float32(numpy.inf)
+    for i, (idx_name, band_a, band_b) in enumerate(nd_indices):
+        # GEE masks normalisedDifference where either band is negative and
+        # returns 0 for a division by zero.
+        numexpr.evaluate(
+            f"where(({band_a} < 0) | ({band_b} < 0), nan, "
+            f"where(({band_a} + {band_b}) == 0, 0, "
+            f"({band_a} - {band_b}) / ({band_a} + {band_b})))",
+            local_dict=band_arrs,
+            out=out_arr[len(ls_bands) + i],
+            casting="unsafe",
+        )
+    for i, (idx_name, idx_exp) in enumerate(expr_indices):
+        idx_arr = out_arr[len(ls_bands) + len(nd_indices) + i]
+        numexpr.evaluate(
+            idx_exp, local_dict=band_arrs, out=idx_arr, casting="unsafe"
+        )
+        # The inputs are finite so only a division by zero gives inf or NaN,
+        # which GEE (ee.Image.divide) returns as 0.
+        numexpr.evaluate(
+            "where(abs(idx_arr) < inf, idx_arr, 0)",
+            local_dict={"idx_arr": idx_arr, "inf": band_arrs["inf"]},
+            out=idx_arr,
+            casting="unsafe",
+        )
+
+
+def _calc_band_indices_numpy(out_arr, chunk_size: int):
+    """
+    Calculate the indices with numpy, a chunk of chunk_size pixels at a time
+    so all the indices are calculated while the chunk is in the cache and
+    only a chunk sized scratch array is needed.
+
+    """
+    import numpy
+
+    n_bands = len(ls_bands)
+    blue, green, red, nir, swir1, swir2 = range(n_bands)
+    b_idx = {band: i for i, band in enumerate(ls_bands)}
+    scratch = numpy.empty(min(chunk_size, out_arr.shape[1]), dtype=numpy.float32)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        for s_idx in range(0, out_arr.shape[1], chunk_size):
+            c_arr = out_arr[:, s_idx : s_idx + chunk_size]
+            c_tmp = scratch[: c_arr.shape[1]]
+            for i, (idx_name, band_a, band_b) in enumerate(nd_indices):
+                arr_a = c_arr[b_idx[band_a]]
+                arr_b = c_arr[b_idx[band_b]]
+                c_out = c_arr[n_bands + i]
+                numpy.subtract(arr_a, arr_b, out=c_out)
+                numpy.add(arr_a, arr_b, out=c_tmp)
+                numpy.divide(c_out, c_tmp, out=c_out)
+                # GEE returns 0 for a division by zero and masks
+                # normalisedDifference where either band is negative.
+                c_out[c_tmp == 0] = 0
+                numpy.minimum(arr_a, arr_b, out=c_tmp)
+                c_out[c_tmp < 0] = numpy.nan
+
+            # EVI: 2.5 * ((NIR - Red) / (NIR + 6 * Red - 7.5 * Blue + 1))
+            c_out = c_arr[n_bands + len(nd_indices)]
+            numpy.multiply(c_arr[red], numpy.float32(6), out=c_tmp)
+            c_tmp += c_arr[nir]
+            c_tmp -= numpy.float32(7.5) * c_arr[blue]
+            c_tmp += numpy.float32(1)
+            numpy.subtract(c_arr[nir], c_arr[red], out=c_out)
+            c_out /= c_tmp
+            c_out *= numpy.float32(2.5)
+            c_out[c_tmp == 0] = 0
+
+            # MVI: ((NIR - Green) / (SWIR1 - Green))
+            c_out = c_arr[n_bands + len(nd_indices) + 1]
+            numpy.subtract(c_arr[swir1], c_arr[green], out=c_tmp)
+            numpy.subtract(c_arr[nir], c_arr[green], out=c_out)
+            c_out /= c_tmp
+            c_out[c_tmp == 0] = 0
+
+
+def calc_band_indices_arr(
+    refl_arr, out_arr=None, use_numexpr: bool = None, chunk_size: int = 16384
+):
+    """
+    A function which calculates the features (see bands) for a block of
+    Landsat surface reflectance pixels, matching calc_band_indices. The
+    output is float32 and the indices are written straight into the output
+    array, with numexpr or with numpy in chunks of pixels, so no full size
+    temporary arrays are created for each index.
+    As on GEE, where an index divides by zero the value is 0 (see
+    ee.Image.divide) and where a normalised difference index is masked
+    (i.e., either band is negative) the value is NaN.
+
+    :param refl_arr: numpy array (6, ...) of the ls_bands (scaled by 10000),
+                     e.g., (6, n_pxls) or (6, rows, cols). This can be a view
+                     of out_arr[0:6] (i.e., read straight into the output
+                     array) in which case it is scaled in place.
+    :param out_arr: optional float32 numpy array (11, ...) for the output
+                    (i.e., to be reused for each block).
+    :param use_numexpr: if True numexpr is used, if False numpy is used and if
+                        None (default) numexpr is used if it is installed and
+                        can use more than one thread.
+    :param chunk_size: the number of pixels processed at a time with numpy.
+    :return: float32 numpy array (11, ...) of the bands.
+
+    """
+    import numpy
+
+    blk_shape = refl_arr.shape[1:]
+    if out_arr is None:
+        out_arr = numpy.empty((len(bands),) + blk_shape, dtype=numpy.float32)
+    elif (out_arr.dtype != numpy.float32) or (not out_arr.flags.c_contiguous):
+        raise Exception("out_arr must be a C contiguous float32 array.")
+    out_arr_2d = out_arr.reshape(len(bands), -1)
+    numpy.multiply(
+        refl_arr.reshape(len(ls_bands), -1),
+        numpy.float32(0.0001),
+        out=out_arr_2d[0 : len(ls_bands)],
+        casting="unsafe",
+    )
+
+    if use_numexpr is None:
+        # numexpr is only faster than the chunked numpy when using threads.
+        try:
+            import numexpr
+
+            use_numexpr = numexpr.get_num_threads() > 1
+        except ImportError:
+            use_numexpr = False
+
+    if use_numexpr:
+        _calc_band_indices_numexpr(out_arr_2d)
+    else:
+        _calc_band_indices_numpy(out_arr_2d, chunk_size)
+    return out_arr
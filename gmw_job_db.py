@@ -0,0 +1,166 @@
+import sqlite3
+import time
+
+JOB_SUBMITTED = "submitted"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_ACTIVE_STATES = [JOB_SUBMITTED, JOB_RUNNING]
+
+
+def open_job_db(db_file: str) -> sqlite3.Connection:
+    """
+    Open (creating if needed) the SQLite database used to record the state of
+    the jobs (i.e., GEE export tasks) run by each stage of the processing.
+    Jobs are identified by the stage and job name.
+
+    :param db_file: the SQLite database file path.
+    :return: sqlite3.Connection
+
+    """
+    db_conn = sqlite3.connect(db_file)
+    db_conn.row_factory = sqlite3.Row
+    with db_conn:
+        db_conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                stage TEXT NOT NULL,
+                job_name TEXT NOT NULL,
+                task_id TEXT,
+                state TEXT NOT NULL,
+                n_attempts INTEGER NOT NULL DEFAULT 0,
+                error_message TEXT,
+                created REAL NOT NULL,
+                updated REAL NOT NULL,
+                PRIMARY KEY (stage, job_name)
+            )"""
+        )
+        db_conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_stage_state ON jobs (stage, state)"
+        )
+    return db_conn
+
+
+def get_jobs(db_conn: sqlite3.Connection, stage: str, states: list = None) -> dict:
+    """
+    Get the jobs for a stage, optionally only those with one of the states
+    specified.
+
+    :param db_conn: the job database connection (see open_job_db)
+    :param stage: the name of the processing stage.
+    :param states: optional list of job states to select.
+    :return: dict of job name to a dict of the job columns.
+
+    """
+    sql = "SELECT * FROM jobs WHERE stage = ?"
+    sql_params = [stage]
+    if states is not None:
+        sql += f" AND state IN ({', '.join('?' * len(states))})"
+        sql_params += list(states)
+    out_jobs = dict()
+    for job_row in db_conn.execute(sql, sql_params):
+        out_jobs[job_row["job_name"]] = dict(job_row)
+    return out_jobs
+
+
+def get_job_state(db_conn: sqlite3.Connection, stage: str, job_name: str) -> str:
+    """
+    Get the state of a single job.
+
+    :param db_conn: the job database connection (see open_job_db)
+    :param stage: the name of the processing stage.
+    :param job_name: the name of the job.
+    :return: the state of the job or None if the job is not in the database.
+
+    """
+    job_row = db_conn.execute(
+        "SELECT state FROM jobs WHERE stage = ? AND job_name = ?", (stage, job_name)
+    ).fetchone()
+    if job_row is None:
+        return None
+    return job_row["state"]
+
+
+def update_job(
+    db_conn: sqlite3.Connection,
+    stage: str,
+    job_name: str,
+    state: str,
+    task_id: str = None,
+    error_message: str = None,
+    new_attempt: bool = False,
+):
+    """
+    Add or update the state of a job within a single transaction.
+
+    :param db_conn: the job database connection (see open_job_db)
+    :param stage: the name of the processing stage.
+    :param job_name: the name of the job.
+    :param state: the new state of the job.
+    :param task_id: the task id, if None the existing task id is kept.
+    :param error_message: optional error message (e.g., for failed jobs)
+    :param new_attempt: if True the number of attempts for the job is increased
+                        (i.e., when the job has been submitted).
+
+    """
+    c_time = time.time()
+    with db_conn:
+        db_conn.execute(
+            """INSERT INTO jobs (stage, job_name, task_id, state, n_attempts,
+                                 error_message, created, updated)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (stage, job_name) DO UPDATE SET
+                   task_id = COALESCE(excluded.task_id, jobs.task_id),
+                   state = excluded.state,
+                   n_attempts = jobs.n_attempts + excluded.n_attempts,
+                   error_message = excluded.error_message,
+                   updated = excluded.updated""",
+            (
+                stage,
+                job_name,
+                task_id,
+                state,
+                int(new_attempt),
+                error_message,
+                c_time,
+                c_time,
+            ),
+        )
+
+
+def import_lut_files(db_conn: sqlite3.Connection, lut_dir: str, get_job) -> dict:
+    """
+    A function which adds the jobs recorded by the touch (LUT) files used
+    before the job database to the database as succeeded jobs, as they were
+    treated as done. Jobs already in the database are not changed so the
+    import can be run more than once.
+
+    :param db_conn: the job database connection (see open_job_db)
+    :param lut_dir: the directory of the LUT (*.txt) files.
+    :param get_job: function which returns a tuple of (stage, job name) for
+                    the name of a LUT file (without the extension) or None if
+                    the file is not a job LUT file.
+    :return: dict of stage to the number of jobs added.
+
+    """
+    import os
+
+    n_stage_jobs = dict()
+    if not os.path.isdir(lut_dir):
+        return n_stage_jobs
+    c_time = time.time()
+    with db_conn:
+        for entry in os.scandir(lut_dir):
+            if (not entry.is_file()) or (not entry.name.endswith(".txt")):
+                continue
+            lut_job = get_job(os.path.splitext(entry.name)[0])
+            if lut_job is None:
+                continue
+            stage, job_name = lut_job
+            db_cursor = db_conn.execute(
+                """INSERT OR IGNORE INTO jobs (stage, job_name, task_id, state,
+                       n_attempts, error_message, created, updated)
+                   VALUES (?, ?, NULL, ?, 1, NULL, ?, ?)""",
+                (stage, job_name, JOB_SUCCEEDED, c_time, c_time),
+            )
+            n_stage_jobs[stage] = n_stage_jobs.get(stage, 0) + db_cursor.rowcount
+    return n_stage_jobs
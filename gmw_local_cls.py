@@ -0,0 +1,282 @@
+def classify_scene_block(scn_refl, mdls, out_arr, mng_cls: int = 1, msk_arr=None):
+    """
+    A function which classifies a block of pixels of a scene and adds the
+    scene to the counts, for each pixel, of the number of valid scenes
+    (NIR > 0) and the number of scenes classified as mangroves (i.e., the
+    scenes of a block are accumulated one at a time so only one scene is
+    in memory). Where more than one model is provided the class is the
+    majority vote of the models. Pixels where one of the band indices is not
+    finite are not classified (as they would be masked on GEE) but are
+    counted as valid. The band indices are calculated once and shared by
+    all the models.
+
+    :param scn_refl: numpy array (6, rows, cols) of the scene surface
+                     reflectance (see gmw_indices.calc_band_indices_arr)
+    :param mdls: list of trained models (e.g., see gmw_local_mdls)
+    :param out_arr: uint16 numpy array (2, rows, cols), or (4, rows, cols) for
+                    the ensemble vote bands, of the counts which are updated
+                    (see classify_scenes_block).
+    :param mng_cls: the mangrove class value.
+    :param msk_arr: optional boolean numpy array (rows, cols) where only pixels
+                    which are True are classified (i.e., the habitat mask).
+
+    """
+    import numpy
+
+    import gmw_indices
+    import gmw_local_mdls
+
+    mng_count = out_arr[0].reshape(-1)
+    vld_count = out_arr[1].reshape(-1)
+    scn_refl = scn_refl.reshape(scn_refl.shape[0], -1)
+    vld_msk = scn_refl[3] > 0
+    if msk_arr is not None:
+        vld_msk &= msk_arr.reshape(-1)
+    vld_idxs = numpy.flatnonzero(vld_msk)
+    if len(vld_idxs) == 0:
+        return
+    vld_count[vld_idxs] += 1
+
+    feat_arr = gmw_indices.calc_band_indices_arr(scn_refl[:, vld_idxs])
+    fin_msk = numpy.isfinite(feat_arr).all(axis=0)
+    cls_idxs = vld_idxs[fin_msk]
+    if len(cls_idxs) == 0:
+        return
+    classes, votes = gmw_local_mdls.predict_ensemble_votes(
+        mdls, feat_arr[:, fin_msk].T
+    )
+    if mng_cls in classes:
+        mng_idx = classes.index(mng_cls)
+        mng_votes = votes[mng_idx]
+        is_mng = numpy.argmax(votes, axis=0) == mng_idx
+        mng_count[cls_idxs[is_mng]] += 1
+    else:
+        # The models cannot predict mangroves so all vote not mangroves.
+        mng_votes = numpy.zeros(len(cls_idxs), dtype=votes.dtype)
+    if out_arr.shape[0] > 2:
+        votes_count = out_arr[2].reshape(-1)
+        agree_count = out_arr[3].reshape(-1)
+        votes_count[cls_idxs] += mng_votes
+        is_agree = (mng_votes == 0) | (mng_votes == len(mdls))
+        agree_count[cls_idxs[is_agree]] += 1
+
+
+def classify_scenes_block(
+    scenes_refl, mdls, mng_cls: int = 1, msk_arr=None, out_votes: bool = False
+):
+    """
+    A function which classifies a block of pixels for a stack of scenes and
+    counts, for each pixel, the number of valid scenes (NIR > 0) and the
+    number of scenes classified as mangroves (see classify_scene_block).
+
+    :param scenes_refl: list of numpy arrays (6, rows, cols) of the scenes
+                        surface reflectance (see gmw_indices.calc_band_indices_arr)
+    :param mdls: list of trained models (e.g., see gmw_local_mdls)
+    :param mng_cls: the mangrove class value.
+    :param msk_arr: optional boolean numpy array (rows, cols) where only pixels
+                    which are True are classified (i.e., the habitat mask).
+    :param out_votes: if True the ensemble vote bands (see
+                      gmw_gee_cls.get_ens_cls_count_img) are also returned.
+    :return: uint16 numpy array (2, rows, cols) of the mangrove count and the
+             valid count, or (4, rows, cols) with the number of model votes
+             for mangroves and the number of scenes for which all the models
+             agree (mangroves or not) if out_votes is True.
+
+    """
+    import numpy
+
+    blk_shape = scenes_refl[0].shape[1:]
+    n_out_bands = 4 if out_votes else 2
+    out_arr = numpy.zeros((n_out_bands,) + blk_shape, dtype=numpy.uint16)
+    for scn_refl in scenes_refl:
+        classify_scene_block(scn_refl, mdls, out_arr, mng_cls=mng_cls, msk_arr=msk_arr)
+    return out_arr
+
+
+def classify_tile_scenes(
+    scene_files: list,
+    mdls: list,
+    out_img_file: str,
+    msk_img_file: str = None,
+    blk_size: int = 512,
+    mng_cls: int = 1,
+    out_votes: bool = False,
+):
+    """
+    A function which applies a set of models to a stack of scenes (e.g.,
+    for a year) of a tile, producing the same two band image as on GEE
+    (06_apply_gmw_prj_mdls.py): the number of scenes classified as mangroves
+    and the number of valid scenes (NIR > 0) for each pixel. The scenes are
+    read and classified in blocks of blk_size x blk_size pixels, one scene at
+    a time, so the memory used is bounded by the block size, rather than the
+    size of the tile or the number of scenes. The output is a tiled GeoTIFF
+    with a no data value of 0, written to a temporary file and renamed when
+    complete.
+
+    :param scene_files: list of GeoTIFF files (one per scene) with the Blue,
+                        Green, Red, NIR, SWIR1 and SWIR2 bands (scaled by
+                        10000), all on the same pixel grid.
+    :param mdls: list of trained models (e.g., see gmw_local_mdls)
+    :param out_img_file: the output GeoTIFF file.
+    :param msk_img_file: optional mask image (on the same grid) where only
+                         pixels with a value > 0 are classified.
+    :param blk_size: the size (pixels) of the blocks.
+    :param mng_cls: the mangrove class value.
+    :param out_votes: if True the ensemble vote bands are also written (see
+                      classify_scenes_block).
+
+    """
+    import os
+    import contextlib
+
+    import numpy
+    import rasterio
+    import rasterio.windows
+
+    import gmw_indices
+
+    with contextlib.ExitStack() as ctx_stack:
+        scene_dss = [
+            ctx_stack.enter_context(rasterio.open(scene_file))
+            for scene_file in scene_files
+        ]
+        ref_ds = scene_dss[0]
+        for scene_ds, scene_file in zip(scene_dss, scene_files):
+            if (scene_ds.shape != ref_ds.shape) or (
+                scene_ds.transform != ref_ds.transform
+            ):
+                raise Exception(
+                    f"The scene '{scene_file}' is not on the same grid as '{scene_files[0]}'"
+                )
+            if scene_ds.count < len(gmw_indices.ls_bands):
+                raise Exception(
+                    f"The scene '{scene_file}' has {scene_ds.count} bands, {len(gmw_indices.ls_bands)} are required."
+                )
+        msk_ds = None
+        if msk_img_file is not None:
+            msk_ds = ctx_stack.enter_context(rasterio.open(msk_img_file))
+
+        out_profile = {
+            "driver": "GTiff",
+            "width": ref_ds.width,
+            "height": ref_ds.height,
+            "count": 4 if out_votes else 2,
+            "dtype": "uint16",
+            "crs": ref_ds.crs,
+            "transform": ref_ds.transform,
+            "nodata": 0,
+            "tiled": True,
+            "blockxsize": 256,
+            "blockysize": 256,
+            "compress": "LZW",
+        }
+        tmp_img_file = os.path.join(
+            os.path.dirname(out_img_file), f".tmp_{os.path.basename(out_img_file)}"
+        )
+        try:
+            with rasterio.open(tmp_img_file, "w", **out_profile) as out_ds:
+                out_ds.set_band_description(1, "Mangroves")
+                out_ds.set_band_description(2, "VLD_MSK")
+                if out_votes:
+                    out_ds.set_band_description(3, "MNG_VOTES")
+                    out_ds.set_band_description(4, "AGREE")
+                for row_off in range(0, ref_ds.height, blk_size):
+                    for col_off in range(0, ref_ds.width, blk_size):
+                        blk_win = rasterio.windows.Window(
+                            col_off,
+                            row_off,
+                            min(blk_size, ref_ds.width - col_off),
+                            min(blk_size, ref_ds.height - row_off),
+                        )
+                        msk_arr = None
+                        if msk_ds is not None:
+                            msk_arr = msk_ds.read(1, window=blk_win) > 0
+                            if not msk_arr.any():
+                                continue
+                        out_arr = numpy.zeros(
+                            (out_profile["count"], blk_win.height, blk_win.width),
+                            dtype=numpy.uint16,
+                        )
+                        # Each scene is read into the same array and added
+                        # to the counts before the next scene is read.
+                        scn_refl = numpy.empty(
+                            (len(gmw_indices.ls_bands), blk_win.height, blk_win.width),
+                            dtype=numpy.float32,
+                        )
+                        for scene_ds in scene_dss:
+                            scene_ds.read(
+                                list(range(1, len(gmw_indices.ls_bands) + 1)),
+                                window=blk_win,
+                                out=scn_refl,
+                            )
+                            classify_scene_block(
+                                scn_refl,
+                                mdls,
+                                out_arr,
+                                mng_cls=mng_cls,
+                                msk_arr=msk_arr,
+                            )
+                        out_ds.write(out_arr, window=blk_win)
+            os.replace(tmp_img_file, out_img_file)
+        finally:
+            if os.path.exists(tmp_img_file):
+                os.remove(tmp_img_file)
+
+
+_loaded_mdls = dict()
+
+
+def _get_local_ensemble(mdls_dir: str, prj_name: str, mdl_ns: list) -> list:
+    """
+    Load (once per process) the models of a project ensemble with a single
+    thread per model, as the tiles are run in parallel.
+
+    """
+    import gmw_local_mdls
+
+    mdls_key = (mdls_dir, prj_name, tuple(mdl_ns))
+    if mdls_key not in _loaded_mdls:
+        _loaded_mdls[mdls_key] = gmw_local_mdls.load_local_ensemble(
+            mdls_dir, prj_name, mdl_ns, n_jobs=1
+        )
+    return _loaded_mdls[mdls_key]
+
+
+def _classify_tile(prj_name: str, mdls_dir: str, mdl_ns: list, **kwargs):
+    """
+    Run classify_tile_scenes for a tile with the models of its project
+    ensemble (loaded once per process).
+
+    """
+    mdls = _get_local_ensemble(mdls_dir, prj_name, mdl_ns)
+    classify_tile_scenes(mdls=mdls, **kwargs)
+
+
+def run_classify_tiles(tile_jobs: list, n_workers: int = 1, **kwargs) -> dict:
+    """
+    A function which runs classify_tile_scenes for a set of tiles using a
+    pool of n_workers processes (see gmw_pool_tools.run_pool_jobs), tiles
+    with the most scenes first. The models are loaded once by each process.
+    A tile which fails is reported and does not stop the other tiles.
+
+    :param tile_jobs: list of dicts with the tile_name, prj_name, scene_files
+                      and out_img_file of each tile.
+    :param n_workers: the number of processes.
+    :param kwargs: other arguments common to all the tiles: mdls_dir, mdl_ns
+                   (the model numbers used) and the classify_tile_scenes
+                   arguments (e.g., msk_img_file, blk_size).
+    :return: dict of tile name to error message for the tiles which failed.
+
+    """
+    import gmw_pool_tools
+
+    tile_jobs = sorted(
+        tile_jobs, key=lambda tile_job: len(tile_job["scene_files"]), reverse=True
+    )
+    _, tiles_errs = gmw_pool_tools.run_pool_jobs(
+        _classify_tile,
+        gmw_pool_tools.get_pool_jobs(tile_jobs, "tile_name", kwargs),
+        n_workers=n_workers,
+        fail_label="classify",
+    )
+    return tiles_errs
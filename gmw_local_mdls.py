@@ -0,0 +1,280 @@
+def get_local_rf_mdl(n_trees: int = 100, seed: int = 0, n_jobs: int = 1):
+    """
+    A function which creates a scikit-learn random forest with the parameters
+    matching the GEE ee.Classifier.smileRandomForest defaults (i.e., the
+    square root of the number of variables per split, a minimum leaf
+    population of 1, a bag fraction of 0.5 and no limit on the number of
+    nodes).
+
+    :param n_trees: the number of trees (numberOfTrees).
+    :param seed: the random seed.
+    :param n_jobs: the number of threads used to train and apply the trees.
+    :return: sklearn.ensemble.RandomForestClassifier
+
+    """
+    from sklearn.ensemble import RandomForestClassifier
+
+    return RandomForestClassifier(
+        n_estimators=n_trees,
+        max_features="sqrt",
+        min_samples_leaf=1,
+        bootstrap=True,
+        max_samples=0.5,
+        random_state=seed,
+        n_jobs=n_jobs,
+    )
+
+
+def get_mdl_file(mdls_dir: str, prj_name: str, mdl_n: int) -> str:
+    """
+    Get the file path for a locally trained model, using the same name as
+    the GEE model asset (i.e., {prj_name}_rf_cls_{mdl_n}).
+
+    :param mdls_dir: the directory of the models.
+    :param prj_name: the project name.
+    :param mdl_n: the model number (starting at 1)
+    :return: file path
+
+    """
+    import os
+
+    return os.path.join(mdls_dir, f"{prj_name}_rf_cls_{mdl_n}.joblib")
+
+
+def load_local_ensemble(
+    mdls_dir: str, prj_name: str, mdl_ns: list, n_jobs: int = None
+) -> list:
+    """
+    A function which loads the locally trained models of a project ensemble.
+
+    :param mdls_dir: the directory of the models.
+    :param prj_name: the project name.
+    :param mdl_ns: list of the model numbers (starting at 1) to be loaded.
+    :param n_jobs: optional number of threads used by each model to apply
+                   the trees (e.g., 1 where the models are used by parallel
+                   processes), if None the value the model was saved with.
+    :return: list of the models.
+
+    """
+    import joblib
+
+    mdls = list()
+    for mdl_n in mdl_ns:
+        mdl = joblib.load(get_mdl_file(mdls_dir, prj_name, mdl_n))
+        if n_jobs is not None:
+            mdl.n_jobs = n_jobs
+        mdls.append(mdl)
+    return mdls
+
+
+def predict_ensemble_votes(mdls: list, data, classes: list = None):
+    """
+    A function which applies each model of an ensemble to a set of samples
+    and counts the number of models predicting each class.
+
+    :param mdls: list of trained models.
+    :param data: numpy array (n_samples, n_features) of the samples.
+    :param classes: optional list of the classes (Default: the classes of the
+                    first model).
+    :return: tuple of (list of classes, numpy array (n_classes, n_samples) of
+             the number of votes)
+
+    """
+    import numpy
+
+    if classes is None:
+        classes = mdls[0].classes_.tolist()
+    votes = numpy.zeros((len(classes), len(data)), dtype=numpy.uint8)
+    for mdl in mdls:
+        mdl_pred = mdl.predict(data)
+        for cls_idx, cls_val in enumerate(classes):
+            votes[cls_idx] += mdl_pred == cls_val
+    return classes, votes
+
+
+def calc_cls_accuracy(ref_cls, pred_cls, classes: list) -> dict:
+    """
+    Calculate the overall accuracy and the accuracy of each class (i.e., the
+    proportion of the reference samples of the class correctly predicted).
+
+    :param ref_cls: numpy array of the reference classes.
+    :param pred_cls: numpy array of the predicted classes.
+    :param classes: list of the classes.
+    :return: dict with the overall (acc) and class (cls_{val}_acc) accuracies.
+
+    """
+    import numpy
+
+    out_acc = {"acc": float(numpy.mean(ref_cls == pred_cls))}
+    for cls_val in classes:
+        cls_msk = ref_cls == cls_val
+        cls_acc = numpy.nan
+        if cls_msk.any():
+            cls_acc = float(numpy.mean(pred_cls[cls_msk] == cls_val))
+        out_acc[f"cls_{cls_val}_acc"] = cls_acc
+    return out_acc
+
+
+def train_local_ensemble(
+    data_df,
+    bands: list,
+    cls_col: str = "class",
+    n_mdls: int = 10,
+    n_trees: int = 100,
+    max_n_smpls: int = 20000,
+    test_frac: float = 0.2,
+    seed: int = 42,
+    n_jobs: int = 1,
+):
+    """
+    A function which trains an ensemble of random forests locally in the
+    same way as 05_train_gmw_prj_mdls.py trains them on GEE: each model is
+    trained with a class balanced sample of max_n_smpls (or half the samples
+    if there are max_n_smpls or fewer, see gmw_smpl_tools.get_mdl_n_smpls),
+    drawn with a different child of a single seed
+    sequence. A class balanced set of test_frac of the samples is held back
+    before the training samples are drawn and used to calculate the accuracy
+    of each model and of the ensemble (majority vote).
+
+    :param data_df: pandas.DataFrame of the samples.
+    :param bands: list of the columns used as the features.
+    :param cls_col: the column with the class.
+    :param n_mdls: the number of models within the ensemble.
+    :param n_trees: the number of trees within each model.
+    :param max_n_smpls: the maximum number of samples used to train each model.
+    :param test_frac: the fraction of the samples held back for testing.
+    :param seed: the seed for the random number generators.
+    :param n_jobs: the number of threads used by each random forest.
+    :return: tuple of (list of models, list of dicts of the accuracy of each
+             model, dict of the accuracy of the ensemble)
+
+    """
+    import numpy
+
+    import gmw_smpl_tools
+
+    data_arr = data_df[bands].to_numpy(dtype=numpy.float32)
+    data_cls = data_df[cls_col].to_numpy()
+
+    seed_seq = numpy.random.SeedSequence(seed)
+    test_seed, mdls_seed = seed_seq.spawn(2)
+    test_idxs = gmw_smpl_tools.stratified_sample_idxs(
+        data_cls, int(len(data_cls) * test_frac), seed=test_seed
+    )
+    train_msk = numpy.ones(len(data_cls), dtype=bool)
+    train_msk[test_idxs] = False
+    train_idxs = numpy.flatnonzero(train_msk)
+
+    n_mdl_smpls = gmw_smpl_tools.get_mdl_n_smpls(len(train_idxs), max_n_smpls)
+    mdls = list()
+    mdls_acc = list()
+    for i, mdl_seed in enumerate(mdls_seed.spawn(n_mdls)):
+        mdl_smpl_idxs = train_idxs[
+            gmw_smpl_tools.stratified_sample_idxs(
+                data_cls[train_idxs], n_mdl_smpls, seed=mdl_seed
+            )
+        ]
+        mdl = get_local_rf_mdl(
+            n_trees=n_trees, seed=int(mdl_seed.generate_state(1)[0]), n_jobs=n_jobs
+        )
+        mdl.fit(data_arr[mdl_smpl_idxs], data_cls[mdl_smpl_idxs])
+        mdls.append(mdl)
+
+        mdl_acc = calc_cls_accuracy(
+            data_cls[test_idxs], mdl.predict(data_arr[test_idxs]), mdl.classes_
+        )
+        mdl_acc["mdl_n"] = i + 1
+        mdls_acc.append(mdl_acc)
+
+    classes, votes = predict_ensemble_votes(mdls, data_arr[test_idxs])
+    ens_pred = numpy.asarray(classes)[numpy.argmax(votes, axis=0)]
+    ens_acc = calc_cls_accuracy(data_cls[test_idxs], ens_pred, classes)
+    ens_acc["n_train"] = n_mdl_smpls
+    ens_acc["n_test"] = len(test_idxs)
+    return mdls, mdls_acc, ens_acc
+
+
+def train_local_prj_ensemble(
+    prj_name: str,
+    prj_smpls_file: str,
+    bands: list,
+    out_mdls_dir: str = None,
+    **kwargs,
+) -> dict:
+    """
+    A function which trains the local ensemble for a project (see
+    train_local_ensemble) from the project samples parquet file (i.e.,
+    written by 04_merge_smpls_for_prjs.py), optionally saving the models.
+
+    :param prj_name: the project name.
+    :param prj_smpls_file: the parquet file of the project samples.
+    :param bands: list of the columns used as the features.
+    :param out_mdls_dir: optional directory where the models are saved (see
+                         get_mdl_file).
+    :param kwargs: other train_local_ensemble arguments.
+    :return: dict of the ensemble accuracy, the mean model accuracy (mdl_acc)
+             and the training time (seconds).
+
+    """
+    import time
+
+    import joblib
+    import numpy
+    import pandas
+
+    s_time = time.perf_counter()
+    data_df = pandas.read_parquet(prj_smpls_file, columns=bands + ["class"])
+    mdls, mdls_acc, ens_acc = train_local_ensemble(data_df, bands, **kwargs)
+    train_time = time.perf_counter() - s_time
+
+    if out_mdls_dir is not None:
+        for i, mdl in enumerate(mdls):
+            joblib.dump(mdl, get_mdl_file(out_mdls_dir, prj_name, i + 1))
+
+    out_info = {"prj_name": prj_name}
+    out_info.update(ens_acc)
+    out_info["mdl_acc"] = float(numpy.mean([mdl_acc["acc"] for mdl_acc in mdls_acc]))
+    out_info["train_time"] = train_time
+    return out_info
+
+
+def run_local_prj_ensembles(
+    prj_smpls_files: dict, n_workers: int = 1, **kwargs
+):
+    """
+    A function which trains the local ensembles for a set of projects using
+    a pool of n_workers processes (see gmw_pool_tools.run_pool_jobs), largest
+    file first. A project which fails is reported and does not stop the
+    other projects.
+
+    :param prj_smpls_files: dict of project name to samples parquet file.
+    :param n_workers: the number of processes.
+    :param kwargs: the train_local_prj_ensemble arguments common to all projects.
+    :return: tuple of (list of dicts of the results for each project, dict of
+             project name to error message for the projects which failed)
+
+    """
+    import os
+
+    import gmw_pool_tools
+
+    prj_names = sorted(
+        prj_smpls_files,
+        key=lambda prj_name: os.path.getsize(prj_smpls_files[prj_name]),
+        reverse=True,
+    )
+    prjs_info, prjs_errs = gmw_pool_tools.run_pool_jobs(
+        train_local_prj_ensemble,
+        gmw_pool_tools.get_pool_jobs(
+            [
+                {"prj_name": prj_name, "prj_smpls_file": prj_smpls_files[prj_name]}
+                for prj_name in prj_names
+            ],
+            "prj_name",
+            kwargs,
+            key_arg=True,
+        ),
+        n_workers=n_workers,
+        fail_label="train the models for",
+    )
+    return list(prjs_info.values()), prjs_errs
@@ -0,0 +1,113 @@
+def _run_pool_job(job_func, job_key, job_kwargs: dict):
+    """
+    Run a job returning any error as a message so one job failing does not
+    stop the others.
+
+    :return: tuple of (job key, job return value or None, error message or None)
+
+    """
+    import traceback
+
+    try:
+        return job_key, job_func(**job_kwargs), None
+    except Exception as err:
+        return job_key, None, f"{err}\n{traceback.format_exc()}"
+
+
+def run_pool_jobs(
+    job_func,
+    jobs: list,
+    n_workers: int = 1,
+    fail_label: str = "run",
+    job_sizes: dict = None,
+    **tqdm_kwargs,
+):
+    """
+    A function which runs a function for a set of jobs (e.g., tiles or
+    projects) using a pool of n_workers processes, or in sequence if
+    n_workers is 1, reporting the progress with a tqdm progress bar. A job
+    which fails (including the worker process being killed) is reported and
+    does not stop the other jobs.
+
+    :param job_func: the function run for each job, which must be defined at
+                     the top level of a module so it can be used by the pool.
+    :param jobs: list of tuples of (job key, dict of the job_func arguments),
+                 which are submitted in order (e.g., largest first).
+    :param n_workers: the number of processes.
+    :param fail_label: the action reported when a job fails (i.e.,
+                       'Failed to {fail_label} {job key}').
+    :param job_sizes: optional dict of job key to the size of the job (e.g.,
+                      bytes) by which the progress is reported, rather than
+                      the number of jobs.
+    :param tqdm_kwargs: other tqdm arguments (e.g., unit).
+    :return: tuple of (dict of job key to the job_func return value for the
+             jobs which succeeded, dict of job key to error message for the
+             jobs which failed)
+
+    """
+    import concurrent.futures
+
+    import tqdm
+
+    if job_sizes is None:
+        job_sizes = {job_key: 1 for job_key, _ in jobs}
+
+    jobs_out = dict()
+    jobs_errs = dict()
+    with tqdm.tqdm(
+        total=sum(job_sizes[job_key] for job_key, _ in jobs), **tqdm_kwargs
+    ) as prog_bar:
+
+        def _finish_job(job_key, job_out, err_msg):
+            if err_msg is None:
+                jobs_out[job_key] = job_out
+            else:
+                jobs_errs[job_key] = err_msg
+                prog_bar.write(f"Failed to {fail_label} {job_key}: {err_msg}")
+            prog_bar.update(job_sizes[job_key])
+            prog_bar.set_postfix(failed=len(jobs_errs), refresh=False)
+
+        if n_workers > 1:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=n_workers) as pool:
+                job_futures = {
+                    pool.submit(_run_pool_job, job_func, job_key, job_kwargs): job_key
+                    for job_key, job_kwargs in jobs
+                }
+                for job_future in concurrent.futures.as_completed(job_futures):
+                    try:
+                        _finish_job(*job_future.result())
+                    except Exception as err:
+                        # e.g., the worker process was killed.
+                        _finish_job(job_futures[job_future], None, str(err))
+        else:
+            for job_key, job_kwargs in jobs:
+                _finish_job(*_run_pool_job(job_func, job_key, job_kwargs))
+
+    return jobs_out, jobs_errs
+
+
+def get_pool_jobs(
+    jobs: list, key_name: str, common_kwargs: dict, key_arg: bool = False
+) -> list:
+    """
+    Get the (job key, arguments) tuples used by run_pool_jobs from a list of
+    dicts of the arguments of each job, merged with the arguments common to
+    all the jobs.
+
+    :param jobs: list of dicts of the arguments of each job.
+    :param key_name: the name of the item in each dict with the job key.
+    :param common_kwargs: dict of the arguments common to all the jobs, which
+                          are overridden by those of a job.
+    :param key_arg: if True the key is also passed as an argument (i.e., is a
+                    job_func argument), otherwise it is removed.
+    :return: list of tuples of (job key, dict of arguments)
+
+    """
+    pool_jobs = list()
+    for job in jobs:
+        job_kwargs = dict(common_kwargs)
+        job_kwargs.update(job)
+        if not key_arg:
+            del job_kwargs[key_name]
+        pool_jobs.append((job[key_name], job_kwargs))
+    return pool_jobs
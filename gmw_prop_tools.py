@@ -0,0 +1,305 @@
+def calc_prop_block(mng_arr, vld_arr, no_data_val: int = 255):
+    """
+    A function which calculates the proportion (%) of the valid observations
+    classified as mangroves, i.e., (mng/vld)*100, for a block of pixels.
+    Pixels with no valid observations, or which are no data within the input,
+    are given the no data value. As with the previous band_math calculation
+    the proportion is truncated to an integer. A proportion of 0 (i.e., valid
+    observations none of which are mangroves) is a valid value so the no
+    data value must be outside of 0-100.
+
+    :param mng_arr: numpy array of the mangrove count.
+    :param vld_arr: numpy array of the valid count.
+    :param no_data_val: the output no data value.
+    :return: uint8 numpy array of the proportion.
+
+    """
+    import numpy
+
+    vld_msk = vld_arr > 0
+    out_arr = numpy.full(mng_arr.shape, no_data_val, dtype=numpy.uint8)
+    prop_arr = (
+        mng_arr[vld_msk].astype(numpy.float32)
+        / vld_arr[vld_msk].astype(numpy.float32)
+        * numpy.float32(100)
+    )
+    out_arr[vld_msk] = numpy.clip(prop_arr, 0, 100).astype(numpy.uint8)
+    return out_arr
+
+
+def get_hist_stats(hist, no_data_val: int = 255) -> dict:
+    """
+    A function which calculates the statistics of an image band from its
+    histogram (i.e., for the uint8 values 0-255) ignoring the no data value.
+
+    :param hist: numpy array of the number of pixels with each value.
+    :param no_data_val: the no data value (ignored) or None.
+    :return: dict of the STATISTICS_* GDAL metadata items.
+
+    """
+    import numpy
+
+    hist = numpy.array(hist, dtype=numpy.int64)
+    n_all_pxls = int(hist.sum())
+    if no_data_val is not None:
+        hist[no_data_val] = 0
+    n_pxls = int(hist.sum())
+    out_stats = dict()
+    if n_pxls > 0:
+        vals = numpy.arange(len(hist), dtype=numpy.float64)
+        vld_vals = numpy.flatnonzero(hist)
+        mean_val = float((hist * vals).sum() / n_pxls)
+        std_val = float(numpy.sqrt((hist * (vals - mean_val) ** 2).sum() / n_pxls))
+        out_stats = {
+            "STATISTICS_MINIMUM": int(vld_vals[0]),
+            "STATISTICS_MAXIMUM": int(vld_vals[-1]),
+            "STATISTICS_MEAN": mean_val,
+            "STATISTICS_STDDEV": std_val,
+            "STATISTICS_VALID_PERCENT": n_pxls / n_all_pxls * 100,
+        }
+    out_stats["STATISTICS_HISTOMIN"] = 0
+    out_stats["STATISTICS_HISTOMAX"] = len(hist) - 1
+    out_stats["STATISTICS_HISTONUMBINS"] = len(hist)
+    out_stats["STATISTICS_HISTOBINVALUES"] = "|".join(str(int(val)) for val in hist)
+    return out_stats
+
+
+def calc_prop_img(
+    in_img_file: str,
+    out_img_file: str,
+    no_data_val: int = 255,
+    ovr_resampling: str = "average",
+    n_threads: int = 1,
+) -> dict:
+    """
+    A function which calculates the mangrove proportion image (see
+    calc_prop_block) from a two band mangrove count and valid count image
+    (i.e., the output of 06_apply_gmw_prj_mdls.py). The input is read block by
+    block and the histogram and statistics are accumulated as the blocks are
+    calculated, so the output does not need to be read again. The output is
+    then written once as a Cloud Optimised GeoTIFF (COG) with overviews and
+    the statistics, via a temporary file.
+
+    :param in_img_file: the input count image.
+    :param out_img_file: the output COG file.
+    :param no_data_val: the output no data value (outside of 0-100).
+    :param ovr_resampling: the resampling used for the overviews.
+    :param n_threads: the number of threads used by GDAL to compress the output.
+    :return: dict of the statistics (see get_hist_stats)
+
+    """
+    import os
+
+    import numpy
+    import rasterio
+    import rasterio.io
+    import rasterio.shutil
+
+    with rasterio.open(in_img_file) as in_ds:
+        mem_profile = {
+            "driver": "GTiff",
+            "width": in_ds.width,
+            "height": in_ds.height,
+            "count": 1,
+            "dtype": "uint8",
+            "crs": in_ds.crs,
+            "transform": in_ds.transform,
+            "nodata": no_data_val,
+            "tiled": True,
+            "blockxsize": 512,
+            "blockysize": 512,
+        }
+        hist = numpy.zeros(256, dtype=numpy.int64)
+        with rasterio.io.MemoryFile() as mem_file:
+            with mem_file.open(**mem_profile) as mem_ds:
+                for _, blk_win in in_ds.block_windows(1):
+                    in_arr = in_ds.read([1, 2], window=blk_win)
+                    out_arr = calc_prop_block(in_arr[0], in_arr[1], no_data_val)
+                    hist += numpy.bincount(out_arr.ravel(), minlength=256)
+                    mem_ds.write(out_arr, 1, window=blk_win)
+
+                out_stats = get_hist_stats(hist, no_data_val)
+                mem_ds.update_tags(1, **out_stats)
+
+                tmp_img_file = os.path.join(
+                    os.path.dirname(out_img_file),
+                    f".tmp_{os.path.basename(out_img_file)}",
+                )
+                try:
+                    rasterio.shutil.copy(
+                        mem_ds,
+                        tmp_img_file,
+                        driver="COG",
+                        COMPRESS="LZW",
+                        OVERVIEWS="AUTO",
+                        OVERVIEW_RESAMPLING=ovr_resampling.upper(),
+                        NUM_THREADS=n_threads,
+                    )
+                    os.replace(tmp_img_file, out_img_file)
+                finally:
+                    if os.path.exists(tmp_img_file):
+                        os.remove(tmp_img_file)
+    return out_stats
+
+
+def get_year_dirs(base_dir: str) -> list:
+    """
+    Get the year directories (i.e., with names which are a year) within the
+    base directory.
+
+    :param base_dir: the base directory.
+    :return: sorted list of the years.
+
+    """
+    import os
+
+    return sorted(
+        entry.name
+        for entry in os.scandir(base_dir)
+        if entry.is_dir() and entry.name.isdigit()
+    )
+
+
+def scan_count_imgs(base_dir: str, years: list) -> list:
+    """
+    A function which lists the count images ({base_dir}/{year}/counts/*.tif)
+    for a set of years with their size and modification time, and the
+    corresponding proportion image ({base_dir}/{year}/prop/{name}_prop.tif).
+    Each directory is listed once (with os.scandir) rather than checking
+    each file.
+
+    :param base_dir: the base directory.
+    :param years: list of the years.
+    :return: list of dicts with the year, in_img_file, in_size, in_mtime,
+             out_img_file and out_mtime (None if the output does not exist).
+
+    """
+    import os
+
+    out_imgs = list()
+    for year in years:
+        imgs_dir = os.path.join(base_dir, year, "counts")
+        out_dir = os.path.join(base_dir, year, "prop")
+        if not os.path.isdir(imgs_dir):
+            continue
+        out_mtimes = dict()
+        if os.path.isdir(out_dir):
+            for entry in os.scandir(out_dir):
+                if entry.is_file() and entry.name.endswith("_prop.tif"):
+                    out_mtimes[entry.name] = entry.stat().st_mtime_ns
+        for entry in os.scandir(imgs_dir):
+            if (not entry.is_file()) or (not entry.name.endswith(".tif")):
+                continue
+            in_stat = entry.stat()
+            out_name = f"{os.path.splitext(entry.name)[0]}_prop.tif"
+            out_imgs.append(
+                {
+                    "year": year,
+                    "in_img_file": entry.path,
+                    "in_size": in_stat.st_size,
+                    "in_mtime": in_stat.st_mtime_ns,
+                    "out_img_file": os.path.join(out_dir, out_name),
+                    "out_mtime": out_mtimes.get(out_name, None),
+                }
+            )
+    return out_imgs
+
+
+def read_prop_index(index_file: str) -> dict:
+    """
+    Read the index of the count images (and their size and modification
+    time) which the proportion images were calculated from.
+
+    :param index_file: the index CSV file.
+    :return: dict of the input image file to a tuple of (size, mtime)
+
+    """
+    import csv
+    import os
+
+    prop_index = dict()
+    if os.path.exists(index_file):
+        with open(index_file, newline="") as index_f:
+            for row in csv.DictReader(index_f):
+                prop_index[row["in_img_file"]] = (
+                    int(row["in_size"]),
+                    int(row["in_mtime"]),
+                )
+    return prop_index
+
+
+def write_prop_index(index_file: str, prop_index: dict):
+    """
+    Write the index of the count images which the proportion images were
+    calculated from (see read_prop_index), via a temporary file.
+
+    :param index_file: the index CSV file.
+    :param prop_index: dict of the input image file to a tuple of (size, mtime)
+
+    """
+    import csv
+    import os
+
+    tmp_index_file = f"{index_file}.tmp"
+    with open(tmp_index_file, "w", newline="") as index_f:
+        index_writer = csv.writer(index_f)
+        index_writer.writerow(["in_img_file", "in_size", "in_mtime"])
+        for in_img_file in sorted(prop_index):
+            index_writer.writerow([in_img_file, *prop_index[in_img_file]])
+    os.replace(tmp_index_file, index_file)
+
+
+def get_pending_prop_imgs(count_imgs: list, prop_index: dict) -> list:
+    """
+    A function which selects the count images (see scan_count_imgs) for which
+    the proportion image needs to be calculated: where the output does not
+    exist or the input has changed (size or modification time) since the
+    output was calculated. Outputs which exist for inputs not within the index
+    (e.g., calculated before the index was used) are up to date if they are
+    newer than the input, in which case the input is added to the index.
+
+    :param count_imgs: list of dicts of the count images (see scan_count_imgs)
+    :param prop_index: dict of the input image file to a tuple of (size, mtime),
+                       which is updated for the existing outputs.
+    :return: list of dicts of the count images to be calculated.
+
+    """
+    pending_imgs = list()
+    for count_img in count_imgs:
+        in_img_file = count_img["in_img_file"]
+        in_stat = (count_img["in_size"], count_img["in_mtime"])
+        if count_img["out_mtime"] is None:
+            pending_imgs.append(count_img)
+        elif in_img_file in prop_index:
+            if prop_index[in_img_file] != in_stat:
+                pending_imgs.append(count_img)
+        elif count_img["out_mtime"] >= count_img["in_mtime"]:
+            prop_index[in_img_file] = in_stat
+        else:
+            pending_imgs.append(count_img)
+    return pending_imgs
+
+
+def run_calc_prop_imgs(img_jobs: list, n_workers: int = 1, **kwargs) -> dict:
+    """
+    A function which runs calc_prop_img for a set of images using a pool of
+    n_workers processes (see gmw_pool_tools.run_pool_jobs). An image which
+    fails is reported and does not stop the other images.
+
+    :param img_jobs: list of dicts with the in_img_file and out_img_file of
+                     each image.
+    :param n_workers: the number of processes.
+    :param kwargs: other calc_prop_img arguments common to all the images.
+    :return: dict of input image file to error message for the images which
+             failed.
+
+    """
+    import gmw_pool_tools
+
+    _, imgs_errs = gmw_pool_tools.run_pool_jobs(
+        calc_prop_img,
+        gmw_pool_tools.get_pool_jobs(img_jobs, "in_img_file", kwargs, key_arg=True),
+        n_workers=n_workers,
+        fail_label="calculate",
+    )
+    return imgs_errs
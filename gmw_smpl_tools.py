@@ -0,0 +1,484 @@
+def get_equal_alloc(n_avail, n_smpls: int):
+    """
+    Allocate n_smpls samples as equally as possible between a set of groups
+    where each group has a limited number of samples available. Samples which
+    cannot be taken from smaller groups are allocated to the other groups. If
+    the samples cannot be divided equally the extra samples are allocated to
+    the first groups.
+
+    :param n_avail: array-like of the number of samples available in each group.
+    :param n_smpls: the total number of samples to be allocated.
+    :return: numpy array of the number of samples allocated to each group.
+
+    """
+    import numpy
+
+    n_avail = numpy.asarray(n_avail, dtype=numpy.int64)
+    n_alloc = numpy.zeros_like(n_avail)
+    n_remain = min(int(n_smpls), int(n_avail.sum()))
+    active = n_avail > 0
+    while (n_remain > 0) and active.any():
+        n_share = n_remain // int(active.sum())
+        if n_share == 0:
+            n_alloc[numpy.flatnonzero(active)[:n_remain]] += 1
+            break
+        n_add = numpy.minimum(n_avail - n_alloc, n_share) * active
+        n_alloc += n_add
+        n_remain -= int(n_add.sum())
+        active = n_alloc < n_avail
+    return n_alloc
+
+
+def get_strata_n_smpls(strata_counts: dict, n_smpls: int) -> dict:
+    """
+    A function which allocates n_smpls samples between a set of strata
+    defined by tuples of values (e.g., (class, tile)). The samples are
+    allocated hierarchically: first equally between the values of the first
+    element (e.g., class) and then, within each of those, equally between the
+    values of the next element (e.g., tile), and so on. Where a stratum has
+    fewer samples than its share the remainder is allocated to the others.
+
+    :param strata_counts: dict of strata tuple to the number of samples available.
+    :param n_smpls: the total number of samples.
+    :return: dict of strata tuple to the number of samples to be taken.
+
+    """
+    strata_keys = sorted(strata_counts.keys(), key=lambda key: tuple(map(str, key)))
+    out_n_smpls = dict()
+
+    def _alloc_level(level_keys, level_n_smpls, level):
+        if len(level_keys) == 0:
+            return
+        if level >= len(level_keys[0]) - 1:
+            level_alloc = get_equal_alloc(
+                [strata_counts[key] for key in level_keys], level_n_smpls
+            )
+            for key, key_n_smpls in zip(level_keys, level_alloc):
+                out_n_smpls[key] = int(key_n_smpls)
+            return
+        grp_keys = dict()
+        for key in level_keys:
+            grp_keys.setdefault(key[level], list()).append(key)
+        grp_alloc = get_equal_alloc(
+            [sum(strata_counts[key] for key in keys) for keys in grp_keys.values()],
+            level_n_smpls,
+        )
+        for keys, grp_n_smpls in zip(grp_keys.values(), grp_alloc):
+            _alloc_level(keys, int(grp_n_smpls), level + 1)
+
+    _alloc_level(strata_keys, n_smpls, 0)
+    return out_n_smpls
+
+
+def get_mdl_n_smpls(n_avail: int, max_n_smpls: int = 20000) -> int:
+    """
+    Get the number of samples used to train each model of an ensemble (i.e.,
+    by 05_train_gmw_prj_mdls.py and gmw_local_mdls.train_local_ensemble):
+    max_n_smpls unless there are max_n_smpls or fewer samples available, in
+    which case half of the samples are used.
+
+    :param n_avail: the number of samples available.
+    :param max_n_smpls: the maximum number of samples.
+    :return: the number of samples.
+
+    """
+    if n_avail > max_n_smpls:
+        return max_n_smpls
+    return n_avail // 2
+
+
+def get_strata_ids(data, strata_cols: list, strata_ids: dict):
+    """
+    Get an integer id for the stratum of each row of a pyarrow RecordBatch
+    or Table. The stratum of a row is the tuple of its values for strata_cols
+    and the ids are looked up and added to strata_ids, so the same ids are
+    used for every batch. The values are found with pyarrow (one lookup per
+    unique value within the batch) so any column type can be used.
+
+    :param data: pyarrow.RecordBatch or pyarrow.Table
+    :param strata_cols: list of the column names defining the strata. If
+                        empty all the rows are in a single stratum.
+    :param strata_ids: dict of strata tuple to id, which is updated.
+    :return: numpy array of the stratum id of each row.
+
+    """
+    import numpy
+    import pyarrow
+    import pyarrow.compute
+
+    if len(strata_cols) == 0:
+        strata_id = strata_ids.setdefault(tuple(), len(strata_ids))
+        return numpy.full(data.num_rows, strata_id, dtype=numpy.int64)
+
+    col_codes = list()
+    col_vals = list()
+    for strata_col in strata_cols:
+        col_data = data.column(strata_col)
+        if isinstance(col_data, pyarrow.ChunkedArray):
+            col_data = col_data.combine_chunks()
+        col_dict = pyarrow.compute.dictionary_encode(col_data, null_encoding="encode")
+        col_vals.append(col_dict.dictionary.to_pylist())
+        col_codes.append(col_dict.indices.to_numpy(zero_copy_only=False))
+    unq_codes, row_unq_idxs = numpy.unique(
+        numpy.stack(col_codes, axis=1), axis=0, return_inverse=True
+    )
+    unq_ids = numpy.array(
+        [
+            strata_ids.setdefault(
+                tuple(vals[code] for vals, code in zip(col_vals, codes)),
+                len(strata_ids),
+            )
+            for codes in unq_codes
+        ],
+        dtype=numpy.int64,
+    )
+    return unq_ids[row_unq_idxs.ravel()]
+
+
+def get_strata_counts(batches, strata_cols: list) -> dict:
+    """
+    Count the number of rows in each stratum over a stream of pyarrow
+    RecordBatches (only the strata columns are required).
+
+    :param batches: iterable of pyarrow.RecordBatch
+    :param strata_cols: list of the column names defining the strata.
+    :return: dict of strata tuple to number of rows.
+
+    """
+    import numpy
+
+    strata_ids = dict()
+    strata_counts = numpy.zeros(0, dtype=numpy.int64)
+    for batch in batches:
+        batch_ids = get_strata_ids(batch, strata_cols, strata_ids)
+        batch_counts = numpy.bincount(batch_ids, minlength=len(strata_ids))
+        batch_counts[: len(strata_counts)] += strata_counts
+        strata_counts = batch_counts
+    return {key: int(strata_counts[strata_id]) for key, strata_id in strata_ids.items()}
+
+
+def _select_bottom_k(strata, rand_keys, strata_n_smpls):
+    """
+    Select, for each stratum, the rows with the strata_n_smpls[stratum]
+    smallest random keys (i.e., a uniform random sample without replacement).
+
+    :param strata: numpy array of the stratum id of each row.
+    :param rand_keys: numpy array of uniform random keys for each row.
+    :param strata_n_smpls: numpy array of the number of samples for each stratum id.
+    :return: numpy array of the selected row indices sorted by stratum and key.
+
+    """
+    import numpy
+
+    row_order = numpy.lexsort((rand_keys, strata))
+    srtd_strata = strata[row_order]
+    strata_rank = numpy.arange(len(srtd_strata)) - numpy.searchsorted(
+        srtd_strata, srtd_strata, side="left"
+    )
+    return row_order[strata_rank < strata_n_smpls[srtd_strata]]
+
+
+def stratified_sample_idxs(strata, n_smpls: int, seed: int = 42):
+    """
+    A function which takes a stratified random sample of the rows of an
+    in-memory table (e.g., a pandas DataFrame), with n_smpls allocated
+    between the strata using get_strata_n_smpls. The sample is deterministic
+    for a given seed.
+
+    :param strata: list of array-likes of the same length defining the strata
+                   of each row (e.g., [class, tile]). A single array-like can
+                   also be given. If an int is given then it is the number of
+                   rows and a simple random sample is taken.
+    :param n_smpls: the number of samples.
+    :param seed: the seed for the random number generator (or a
+                 numpy.random.SeedSequence).
+    :return: numpy array of the sampled row indices (sorted).
+
+    """
+    import numpy
+    import pyarrow
+
+    if isinstance(strata, (int, numpy.integer)):
+        strata_tbl = pyarrow.table({"row": numpy.zeros(strata, dtype=numpy.int8)})
+        strata_cols = list()
+    else:
+        if not isinstance(strata, (list, tuple)):
+            strata = [strata]
+        strata_cols = [f"strata_{i}" for i in range(len(strata))]
+        strata_tbl = pyarrow.table(
+            {col: numpy.asarray(vals) for col, vals in zip(strata_cols, strata)}
+        )
+
+    strata_ids = dict()
+    row_strata = get_strata_ids(strata_tbl, strata_cols, strata_ids)
+    strata_counts = numpy.bincount(row_strata, minlength=len(strata_ids))
+    strata_n_smpls_dict = get_strata_n_smpls(
+        {key: int(strata_counts[strata_id]) for key, strata_id in strata_ids.items()},
+        n_smpls,
+    )
+    strata_n_smpls = numpy.zeros(len(strata_ids), dtype=numpy.int64)
+    for key, strata_id in strata_ids.items():
+        strata_n_smpls[strata_id] = strata_n_smpls_dict[key]
+
+    rng = numpy.random.default_rng(seed)
+    rand_keys = rng.random(len(row_strata))
+    return numpy.sort(_select_bottom_k(row_strata, rand_keys, strata_n_smpls))
+
+
+def sample_batches(
+    batches,
+    n_smpls: int,
+    seed: int = 42,
+    strata_cols: list = None,
+    strata_n_smpls: dict = None,
+):
+    """
+    A function which takes a random sample of rows from a stream of pyarrow
+    RecordBatches (e.g., from pyarrow.csv.open_csv) without creating a table
+    of all the rows. Each row is given a uniform random key and, for each
+    stratum, the rows with the smallest keys are kept, so no more than
+    n_smpls rows and one batch are held in memory. The sample is deterministic
+    for a given seed and order of the batches.
+
+    :param batches: iterable of pyarrow.RecordBatch, all with the same schema.
+    :param n_smpls: the number of rows to be sampled (only used if strata_cols
+                    is None).
+    :param seed: the seed for the random number generator (or a
+                 numpy.random.SeedSequence).
+    :param strata_cols: optional list of column names defining the strata.
+    :param strata_n_smpls: dict of strata tuple to the number of samples to be
+                           taken (see get_strata_counts and get_strata_n_smpls).
+                           Required if strata_cols is specified.
+    :return: tuple of (pyarrow.Table of the sampled rows, sorted by stratum,
+             or None if there were no rows, the total number of rows read)
+
+    """
+    import numpy
+    import pyarrow
+
+    if strata_cols is None:
+        strata_cols = list()
+        strata_n_smpls = {tuple(): n_smpls}
+
+    rng = numpy.random.default_rng(seed)
+    strata_ids = dict()
+    strata_n_smpls_arr = numpy.zeros(0, dtype=numpy.int64)
+    smpls_tbl = None
+    smpls_strata = numpy.zeros(0, dtype=numpy.int64)
+    smpls_keys = numpy.zeros(0, dtype=numpy.float64)
+    n_seen = 0
+    for batch in batches:
+        if batch.num_rows == 0:
+            continue
+        batch_strata = get_strata_ids(batch, strata_cols, strata_ids)
+        if len(strata_n_smpls_arr) < len(strata_ids):
+            strata_n_smpls_arr = numpy.zeros(len(strata_ids), dtype=numpy.int64)
+            for key, strata_id in strata_ids.items():
+                strata_n_smpls_arr[strata_id] = strata_n_smpls.get(key, 0)
+        batch_keys = rng.random(batch.num_rows)
+        n_seen += batch.num_rows
+
+        batch_tbl = pyarrow.Table.from_batches([batch])
+        if smpls_tbl is not None:
+            batch_tbl = pyarrow.concat_tables([smpls_tbl, batch_tbl])
+            batch_strata = numpy.concatenate([smpls_strata, batch_strata])
+            batch_keys = numpy.concatenate([smpls_keys, batch_keys])
+        keep_idxs = _select_bottom_k(batch_strata, batch_keys, strata_n_smpls_arr)
+        smpls_tbl = batch_tbl.take(keep_idxs)
+        smpls_strata = batch_strata[keep_idxs]
+        smpls_keys = batch_keys[keep_idxs]
+
+    if smpls_tbl is not None:
+        smpls_tbl = smpls_tbl.combine_chunks()
+    return smpls_tbl, n_seen
+
+
+def read_tile_smpls_batches(
+    tile_smpls_files: list,
+    columns: list,
+    tile_col: str,
+    date_col: str = None,
+    col_types: dict = None,
+):
+    """
+    A function which streams the batches of the tile sample CSV files (i.e.,
+    exported from GEE by stage 03), reading only the columns specified and
+    adding a column with the tile name.
+
+    :param tile_smpls_files: list of tuples of (tile name, CSV file path)
+    :param columns: list of the columns to be read.
+    :param tile_col: the name of the output column with the tile name.
+    :param date_col: optional name of an output column with the acquisition
+                     date of the scene (extracted from system:index).
+    :param col_types: optional dict of column name to pyarrow type.
+    :return: generator of pyarrow.RecordBatch
+
+    """
+    import pyarrow
+    import pyarrow.compute
+    import pyarrow.csv
+
+    if col_types is None:
+        col_types = dict()
+    read_cols = list(columns)
+    if date_col is not None:
+        read_cols.append("system:index")
+    convert_opts = pyarrow.csv.ConvertOptions(
+        include_columns=read_cols,
+        column_types={col: col_types[col] for col in read_cols if col in col_types},
+    )
+    for tile_name, tile_smpls_file in tile_smpls_files:
+        with pyarrow.csv.open_csv(
+            tile_smpls_file, convert_options=convert_opts
+        ) as tile_smpls_reader:
+            for batch in tile_smpls_reader:
+                out_arrs = [batch.column(col) for col in columns]
+                out_cols = list(columns)
+                out_arrs.append(pyarrow.array([tile_name] * batch.num_rows))
+                out_cols.append(tile_col)
+                if date_col is not None:
+                    acq_dates = pyarrow.compute.extract_regex(
+                        batch.column("system:index"), r"(?P<date>\d{8})"
+                    )
+                    out_arrs.append(pyarrow.compute.struct_field(acq_dates, [0]))
+                    out_cols.append(date_col)
+                yield pyarrow.RecordBatch.from_arrays(out_arrs, names=out_cols)
+
+
+def merge_prj_tile_smpls(
+    prj_name: str,
+    tile_smpls_files: list,
+    bands: list,
+    out_smpls_file: str = None,
+    out_smpls_store_dir: str = None,
+    prjs_col_name: str = "gmw_prj",
+    tiles_col_name: str = "gmw_tile_name",
+    max_n_smpls: int = 100000,
+    seed: int = 42,
+    strat_by_date: bool = False,
+) -> dict:
+    """
+    A function which merges the tile sample CSV files of a project into a
+    single training set. The samples are stratified by class and then tile
+    (and optionally the scene acquisition date), using a first pass over the
+    files to count the samples within each stratum and a second pass to
+    sample them (see get_strata_n_smpls and sample_batches). The output is
+    written to either a parquet file or a partition of a hive partitioned
+    parquet dataset (see gmw_smpls_store).
+
+    :param prj_name: the name of the project.
+    :param tile_smpls_files: list of tuples of (tile name, CSV file path)
+    :param bands: list of the bands to be read.
+    :param out_smpls_file: the output parquet file (used if out_smpls_store_dir
+                           is None).
+    :param out_smpls_store_dir: optional output parquet dataset directory.
+    :param prjs_col_name: the partition column with the project name.
+    :param tiles_col_name: the name of the column used for the tile name.
+    :param max_n_smpls: the maximum number of samples.
+    :param seed: the seed for the random number generator.
+    :param strat_by_date: if True the samples are also stratified by the
+                          acquisition date.
+    :return: dict of tile name to the number of samples within the tile CSV.
+
+    """
+    import os
+
+    import pyarrow
+    import pyarrow.parquet
+
+    import gmw_smpls_store
+
+    col_types = {band: pyarrow.float32() for band in bands}
+    col_types["class"] = pyarrow.int8()
+    strata_cols = ["class", tiles_col_name]
+    date_col = None
+    if strat_by_date:
+        date_col = "acq_date"
+        strata_cols.append(date_col)
+
+    # First pass: count the samples within each stratum.
+    strata_counts = get_strata_counts(
+        read_tile_smpls_batches(
+            tile_smpls_files, ["class"], tiles_col_name, date_col, col_types
+        ),
+        strata_cols,
+    )
+    tile_counts = dict()
+    for strata_key, strata_count in strata_counts.items():
+        tile_counts[strata_key[1]] = tile_counts.get(strata_key[1], 0) + strata_count
+
+    # Second pass: sample the rows of each stratum.
+    smpls_tbl, n_smpls = sample_batches(
+        read_tile_smpls_batches(
+            tile_smpls_files, bands + ["class"], tiles_col_name, date_col, col_types
+        ),
+        max_n_smpls,
+        seed=seed,
+        strata_cols=strata_cols,
+        strata_n_smpls=get_strata_n_smpls(strata_counts, max_n_smpls),
+    )
+
+    if smpls_tbl is not None:
+        smpls_tbl = smpls_tbl.select(bands + ["class"])
+        if out_smpls_store_dir is not None:
+            gmw_smpls_store.write_partition(
+                smpls_tbl.to_pandas(), out_smpls_store_dir, {prjs_col_name: prj_name}
+            )
+        else:
+            # Write to a temporary file so a failed project does not leave a
+            # partial output which would be skipped when re-run.
+            tmp_smpls_file = os.path.join(
+                os.path.dirname(out_smpls_file), f".tmp_{os.path.basename(out_smpls_file)}"
+            )
+            try:
+                pyarrow.parquet.write_table(
+                    smpls_tbl, tmp_smpls_file, compression="snappy"
+                )
+                os.replace(tmp_smpls_file, out_smpls_file)
+            finally:
+                if os.path.exists(tmp_smpls_file):
+                    os.remove(tmp_smpls_file)
+    return tile_counts
+
+
+def run_merge_prj_tile_smpls(prj_jobs: list, n_workers: int = 1, **kwargs):
+    """
+    A function which runs merge_prj_tile_smpls for a set of projects using a
+    pool of n_workers processes (see gmw_pool_tools.run_pool_jobs). The
+    projects are run largest first (by the size of their CSV files) so a
+    large project is not left running alone at the end, and the progress is
+    reported over all the projects by the number of bytes of CSV processed.
+    A project which fails is reported and does not stop the other projects.
+
+    :param prj_jobs: list of dicts with the merge_prj_tile_smpls arguments for
+                     each project (i.e., prj_name, tile_smpls_files and
+                     out_smpls_file) and a prj_size key with the total size
+                     (bytes) of the tile CSV files.
+    :param n_workers: the number of processes.
+    :param kwargs: the merge_prj_tile_smpls arguments common to all projects.
+    :return: tuple of (dict of project name to dict of tile counts for the
+             projects which succeeded, dict of project name to error message
+             for the projects which failed)
+
+    """
+    import gmw_pool_tools
+
+    prj_jobs = sorted(prj_jobs, key=lambda prj_job: prj_job["prj_size"], reverse=True)
+    prj_sizes = {prj_job["prj_name"]: prj_job["prj_size"] for prj_job in prj_jobs}
+    return gmw_pool_tools.run_pool_jobs(
+        merge_prj_tile_smpls,
+        gmw_pool_tools.get_pool_jobs(
+            [
+                {key: val for key, val in prj_job.items() if key != "prj_size"}
+                for prj_job in prj_jobs
+            ],
+            "prj_name",
+            kwargs,
+            key_arg=True,
+        ),
+        n_workers=n_workers,
+        fail_label="merge the samples for",
+        job_sizes=prj_sizes,
+        unit="B",
+        unit_scale=True,
+    )
@@ -0,0 +1,120 @@
+import os
+
+
+def get_partition_dir(store_dir: str, part_vals: dict) -> str:
+    """
+    Get the directory for a partition within a hive partitioned parquet
+    dataset (e.g., store_dir/gmw_prj=GMW-02-002/ref_cls=1).
+
+    :param store_dir: the root directory of the dataset.
+    :param part_vals: dict of partition column names and values, in the
+                      order of the partition levels.
+    :return: the partition directory path.
+
+    """
+    part_dirs = [f"{part_col}={part_val}" for part_col, part_val in part_vals.items()]
+    return os.path.join(store_dir, *part_dirs)
+
+
+def write_partition(
+    data_df,
+    store_dir: str,
+    part_vals: dict,
+    compression: str = "snappy",
+    row_group_size: int = 100000,
+):
+    """
+    A function which writes a pandas DataFrame or geopandas GeoDataFrame as a
+    partition of a hive partitioned parquet dataset, replacing any existing
+    data for that partition. The partition columns are removed from the data
+    as they are defined by the directory names. The file is written to a
+    temporary file and then moved so partial partitions are never left in the
+    dataset. Row group statistics are written so the dataset can be filtered
+    on the other columns as well as the partitions.
+
+    :param data_df: the pandas.DataFrame or geopandas.GeoDataFrame to write.
+    :param store_dir: the root directory of the dataset.
+    :param part_vals: dict of partition column names and values, in the
+                      order of the partition levels.
+    :param compression: the parquet compression (Default: snappy)
+    :param row_group_size: the maximum number of rows within a row group.
+
+    """
+    part_dir = get_partition_dir(store_dir, part_vals)
+    os.makedirs(part_dir, exist_ok=True)
+
+    drop_cols = [part_col for part_col in part_vals if part_col in data_df.columns]
+    if len(drop_cols) > 0:
+        data_df = data_df.drop(columns=drop_cols)
+
+    out_file = os.path.join(part_dir, "part-0.parquet")
+    tmp_out_file = os.path.join(part_dir, ".part-0.parquet.tmp")
+    try:
+        data_df.to_parquet(
+            tmp_out_file,
+            compression=compression,
+            index=False,
+            row_group_size=row_group_size,
+            write_statistics=True,
+        )
+        os.replace(tmp_out_file, out_file)
+    finally:
+        if os.path.exists(tmp_out_file):
+            os.remove(tmp_out_file)
+
+
+def get_partitions(store_dir: str, part_cols: list) -> set:
+    """
+    A function which lists the partitions within a hive partitioned parquet
+    dataset in a single pass, so the existence of data for a partition can be
+    checked without a glob or stat of each file.
+
+    :param store_dir: the root directory of the dataset.
+    :param part_cols: list of the partition column names.
+    :return: set of tuples of the partition values in the order of part_cols.
+
+    """
+    import pyarrow.dataset
+
+    parts = set()
+    if not os.path.exists(store_dir):
+        return parts
+
+    dataset = pyarrow.dataset.dataset(store_dir, format="parquet", partitioning="hive")
+    for fragment in dataset.get_fragments():
+        part_keys = pyarrow.dataset.get_partition_keys(fragment.partition_expression)
+        parts.add(tuple(part_keys.get(part_col, None) for part_col in part_cols))
+    return parts
+
+
+def read_partition(
+    store_dir: str, part_vals: dict, columns: list = None, geo: bool = False
+):
+    """
+    A function which reads the data for a partition of a hive partitioned
+    parquet dataset. The partition values are used as a filter on the dataset
+    so only the matching partitions are read (i.e., predicate pushdown). The
+    partition columns are not included in the returned data.
+
+    :param store_dir: the root directory of the dataset.
+    :param part_vals: dict of partition column names and values to select.
+    :param columns: optional list of the columns to read (default all).
+    :param geo: If True the data is read as a geopandas.GeoDataFrame otherwise
+                a pandas.DataFrame is returned.
+    :return: pandas.DataFrame or geopandas.GeoDataFrame
+
+    """
+    filters = [(part_col, "==", part_val) for part_col, part_val in part_vals.items()]
+    if geo:
+        import geopandas
+
+        data_df = geopandas.read_parquet(store_dir, columns=columns, filters=filters)
+    else:
+        import pandas
+
+        data_df = pandas.read_parquet(store_dir, columns=columns, filters=filters)
+
+    drop_cols = [part_col for part_col in part_vals if part_col in data_df.columns]
+    if len(drop_cols) > 0:
+        data_df = data_df.drop(columns=drop_cols)
+    return data_df
@@ -0,0 +1,115 @@
+def _get_cat_cache_file(vec_file: str) -> str:
+    """
+    Get the file path of the cache (sidecar) file for a tile catalogue.
+
+    """
+    import os
+
+    return f"{os.path.splitext(vec_file)[0]}_tile_cat.arrow"
+
+
+def read_tile_cat(
+    vec_file: str,
+    vec_lyr: str = None,
+    prjs_col_name: str = "gmw_prj",
+    tiles_col_name: str = "gmw_tile_name",
+    use_cache: bool = True,
+) -> dict:
+    """
+    A function which reads the catalogue of the GMW tiles and projects from
+    the attributes of the tile definitions vector layer (i.e., the tile name,
+    project and the MinX, MaxX, MinY and MaxY of the tile) without the
+    geometries. The catalogue is cached in an Arrow file alongside the vector
+    file ({vec_file base}_tile_cat.arrow), which is used rather than the
+    vector file while its size and modification time are unchanged.
+
+    :param vec_file: the tile definitions vector file.
+    :param vec_lyr: the vector layer name.
+    :param prjs_col_name: the column with the project names.
+    :param tiles_col_name: the column with the tile names.
+    :param use_cache: if True (default) the cache file is used and created.
+    :return: dict with the keys: prjs (list of the projects in the order
+             they are first in the vector layer), prj_tiles (dict of project
+             to list of tile names), tile_prj (dict of tile name to project)
+             and tile_bbox (dict of tile name to (min_x, min_y, max_x, max_y))
+
+    """
+    import os
+
+    import pyarrow
+    import pyarrow.feather
+
+    src_stat = os.stat(vec_file)
+    src_key = f"{vec_lyr}|{prjs_col_name}|{tiles_col_name}|{src_stat.st_size}|{src_stat.st_mtime_ns}"
+    cache_file = _get_cat_cache_file(vec_file)
+
+    cat_tbl = None
+    if use_cache and os.path.exists(cache_file):
+        cat_tbl = pyarrow.feather.read_table(cache_file)
+        cache_meta = cat_tbl.schema.metadata or dict()
+        if cache_meta.get(b"src_key", b"").decode() != src_key:
+            cat_tbl = None
+
+    if cat_tbl is None:
+        import geopandas
+
+        tiles_df = geopandas.read_file(vec_file, layer=vec_lyr, ignore_geometry=True)
+        cat_tbl = pyarrow.table(
+            {
+                "tile": tiles_df[tiles_col_name].astype(str).to_numpy(),
+                "prj": tiles_df[prjs_col_name].astype(str).to_numpy(),
+                "MinX": tiles_df["MinX"].to_numpy(dtype=float),
+                "MaxX": tiles_df["MaxX"].to_numpy(dtype=float),
+                "MinY": tiles_df["MinY"].to_numpy(dtype=float),
+                "MaxY": tiles_df["MaxY"].to_numpy(dtype=float),
+            }
+        ).replace_schema_metadata({"src_key": src_key})
+        if use_cache:
+            tmp_cache_file = f"{cache_file}.tmp"
+            pyarrow.feather.write_feather(cat_tbl, tmp_cache_file)
+            os.replace(tmp_cache_file, cache_file)
+
+    cat_cols = cat_tbl.to_pydict()
+    tile_cat = {"prjs": list(), "prj_tiles": dict(), "tile_prj": dict(), "tile_bbox": dict()}
+    for tile_name, prj_name, min_x, max_x, min_y, max_y in zip(
+        cat_cols["tile"],
+        cat_cols["prj"],
+        cat_cols["MinX"],
+        cat_cols["MaxX"],
+        cat_cols["MinY"],
+        cat_cols["MaxY"],
+    ):
+        if prj_name not in tile_cat["prj_tiles"]:
+            tile_cat["prjs"].append(prj_name)
+            tile_cat["prj_tiles"][prj_name] = list()
+        tile_cat["prj_tiles"][prj_name].append(tile_name)
+        tile_cat["tile_prj"][tile_name] = prj_name
+        tile_cat["tile_bbox"][tile_name] = (min_x, min_y, max_x, max_y)
+    return tile_cat
+
+
+def get_prj_tiles_df(tile_cat: dict, prj_name: str, tiles_col_name: str = "gmw_tile_name"):
+    """
+    A function which creates a DataFrame of the tiles of a project with the
+    tile name and the MinX, MaxX, MinY and MaxY of the tiles (e.g., for
+    gmw_tile_tools.get_tile_pt_idxs).
+
+    :param tile_cat: the tile catalogue (see read_tile_cat)
+    :param prj_name: the project name.
+    :param tiles_col_name: the name of the tile name column.
+    :return: pandas.DataFrame
+
+    """
+    import pandas
+
+    tile_names = tile_cat["prj_tiles"].get(prj_name, list())
+    tile_bboxes = [tile_cat["tile_bbox"][tile_name] for tile_name in tile_names]
+    return pandas.DataFrame(
+        {
+            tiles_col_name: tile_names,
+            "MinX": [bbox[0] for bbox in tile_bboxes],
+            "MaxX": [bbox[2] for bbox in tile_bboxes],
+            "MinY": [bbox[1] for bbox in tile_bboxes],
+            "MaxY": [bbox[3] for bbox in tile_bboxes],
+        }
+    )
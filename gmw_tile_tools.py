@@ -0,0 +1,270 @@
+def get_tile_pt_idxs(
+    pts_gdf,
+    tiles_df,
+    tiles_col_name: str,
+    min_x_col: str = "MinX",
+    min_y_col: str = "MinY",
+    tile_size: float = 1.0,
+) -> dict:
+    """
+    A function which assigns a set of points to the tiles of a regular grid
+    (i.e., the 1 degree GMW tiles) in a single vectorised pass, using the
+    floor of the point coordinates rather than clipping the points with each
+    tile. Tiles are closed (i.e., include their boundary) so, as with
+    GeoDataFrame.clip, points on a tile edge are assigned to all the tiles
+    which share that edge.
+
+    :param pts_gdf: the geopandas.GeoDataFrame of points.
+    :param tiles_df: the (Geo)DataFrame of tiles with the tile name and the
+                     minimum x and y of each tile.
+    :param tiles_col_name: the column in tiles_df with the tile names.
+    :param min_x_col: the column in tiles_df with the minimum x of the tiles.
+    :param min_y_col: the column in tiles_df with the minimum y of the tiles.
+    :param tile_size: the size of the tiles (Default: 1 degree)
+    :return: dict of tile name to a numpy array of the positional indices of
+             the points within the tile (in the order of pts_gdf).
+
+    """
+    import numpy
+
+    tile_xs = numpy.round(tiles_df[min_x_col].to_numpy() / tile_size).astype(numpy.int64)
+    tile_ys = numpy.round(tiles_df[min_y_col].to_numpy() / tile_size).astype(numpy.int64)
+    tile_names = tiles_df[tiles_col_name].to_numpy()
+
+    # Encode the tile (x, y) grid positions as a single sortable key.
+    key_off = 1 << 20
+    tile_keys = (tile_xs + key_off) * (key_off << 1) + (tile_ys + key_off)
+    tile_key_order = numpy.argsort(tile_keys, kind="stable")
+    tile_keys_srtd = tile_keys[tile_key_order]
+
+    out_tile_idxs = dict()
+    for tile_name in tile_names:
+        out_tile_idxs[tile_name] = numpy.zeros(0, dtype=numpy.int64)
+    if (len(pts_gdf) == 0) or (len(tile_keys) == 0):
+        return out_tile_idxs
+
+    pts_xs = pts_gdf.geometry.x.to_numpy() / tile_size
+    pts_ys = pts_gdf.geometry.y.to_numpy() / tile_size
+    vld_pts = numpy.isfinite(pts_xs) & numpy.isfinite(pts_ys)
+    pts_idxs = numpy.flatnonzero(vld_pts)
+    pts_xs = pts_xs[vld_pts]
+    pts_ys = pts_ys[vld_pts]
+    pts_tile_xs = numpy.floor(pts_xs).astype(numpy.int64)
+    pts_tile_ys = numpy.floor(pts_ys).astype(numpy.int64)
+    # Points on a tile edge are also within the tile to the left or below.
+    on_x_edge = pts_xs == pts_tile_xs
+    on_y_edge = pts_ys == pts_tile_ys
+
+    match_tiles = list()
+    match_pts = list()
+    for x_off, x_msk in [(0, None), (1, on_x_edge)]:
+        for y_off, y_msk in [(0, None), (1, on_y_edge)]:
+            cand_msk = numpy.ones(len(pts_idxs), dtype=bool)
+            if x_msk is not None:
+                cand_msk &= x_msk
+            if y_msk is not None:
+                cand_msk &= y_msk
+            cand_keys = (pts_tile_xs[cand_msk] - x_off + key_off) * (key_off << 1) + (
+                pts_tile_ys[cand_msk] - y_off + key_off
+            )
+            key_pos = numpy.searchsorted(tile_keys_srtd, cand_keys)
+            key_pos[key_pos == len(tile_keys_srtd)] = 0
+            key_match = tile_keys_srtd[key_pos] == cand_keys
+            match_tiles.append(tile_key_order[key_pos[key_match]])
+            match_pts.append(pts_idxs[cand_msk][key_match])
+
+    match_tiles = numpy.concatenate(match_tiles)
+    match_pts = numpy.concatenate(match_pts)
+    match_order = numpy.lexsort((match_pts, match_tiles))
+    match_tiles = match_tiles[match_order]
+    match_pts = match_pts[match_order]
+    splits = numpy.searchsorted(match_tiles, numpy.arange(len(tile_names) + 1))
+    for tile_idx, tile_name in enumerate(tile_names):
+        tile_pts = match_pts[splits[tile_idx] : splits[tile_idx + 1]]
+        if len(tile_pts) > 0:
+            out_tile_idxs[tile_name] = tile_pts
+    return out_tile_idxs
+
+
+def get_pt_tile_names(n_pts: int, tile_pt_idxs: dict):
+    """
+    A function which gets the name of the tile of each point from the
+    indices of the points within each tile (see get_tile_pt_idxs), e.g., to
+    be used as the strata when sampling the points. A point on the edge of
+    more than one tile is given the first of the tiles.
+
+    :param n_pts: the number of points.
+    :param tile_pt_idxs: dict of tile name to a numpy array of the positional
+                         indices of the points within the tile.
+    :return: numpy array (object) of the tile name of each point, an empty
+             string where the point is not within a tile.
+
+    """
+    import numpy
+
+    pt_tiles = numpy.full(n_pts, "", dtype=object)
+    for tile_name, pt_idxs in reversed(list(tile_pt_idxs.items())):
+        pt_tiles[pt_idxs] = tile_name
+    return pt_tiles
+
+
+def get_prj_mosaic_files(mosaics_dir: str, year: int) -> dict:
+    """
+    A function which finds the project mosaics exported by
+    06_apply_gmw_prj_mdls.py (prj_export_mode = "mosaic") within a directory,
+    grouping the files GEE splits large exports into
+    ({name}-0000000000-0000000000.tif).
+
+    :param mosaics_dir: the directory of the downloaded mosaics.
+    :param year: the year of the mosaics.
+    :return: dict of (project name, model name) to a sorted list of files.
+
+    """
+    import os
+    import re
+
+    mosaic_re = re.compile(
+        rf"^(?P<prj>.+)_{year}_mng_cls_count_(?P<mdl>[^-]+?)(-\d+-\d+)?\.tif$"
+    )
+    prj_mosaic_files = dict()
+    for entry in os.scandir(mosaics_dir):
+        mosaic_match = mosaic_re.match(entry.name)
+        if entry.is_file() and (mosaic_match is not None):
+            prj_mosaic_files.setdefault(
+                (mosaic_match.group("prj"), mosaic_match.group("mdl")), list()
+            ).append(entry.path)
+    for mosaic_files in prj_mosaic_files.values():
+        mosaic_files.sort()
+    return prj_mosaic_files
+
+
+def cut_mosaic_tile(
+    mosaic_files: list, tile_bbox: tuple, out_img_file: str, blk_size: int = 512
+):
+    """
+    A function which cuts a tile from a mosaic, which can be split across a
+    number of files on the same pixel grid (i.e., as exported by GEE). The
+    tile bbox is snapped to the pixel grid of the mosaic and the intersection
+    with each mosaic file is copied with windowed reads and writes of up to
+    blk_size rows, so the tile is not read into memory at once. Pixels of
+    the tile not within the mosaic are no data (0). The output is a tiled
+    GeoTIFF written to a temporary file and renamed when complete.
+
+    :param mosaic_files: list of the mosaic files.
+    :param tile_bbox: the tile bbox (min_x, min_y, max_x, max_y)
+    :param out_img_file: the output GeoTIFF file.
+    :param blk_size: the number of rows copied at a time.
+
+    """
+    import os
+    import contextlib
+
+    import rasterio
+    import rasterio.windows
+
+    min_x, min_y, max_x, max_y = tile_bbox
+    with contextlib.ExitStack() as ctx_stack:
+        mosaic_dss = [
+            ctx_stack.enter_context(rasterio.open(mosaic_file))
+            for mosaic_file in mosaic_files
+        ]
+        ref_ds = mosaic_dss[0]
+        ref_trans = ref_ds.transform
+        res_x = ref_trans.a
+        res_y = -ref_trans.e
+
+        # The offsets (pixels) of the mosaic files from the first file.
+        mosaic_offs = list()
+        for mosaic_file, mosaic_ds in zip(mosaic_files, mosaic_dss):
+            col_off = (mosaic_ds.transform.c - ref_trans.c) / res_x
+            row_off = (ref_trans.f - mosaic_ds.transform.f) / res_y
+            if (
+                (mosaic_ds.transform.a != res_x)
+                or (-mosaic_ds.transform.e != res_y)
+                or (abs(col_off - round(col_off)) > 1e-6)
+                or (abs(row_off - round(row_off)) > 1e-6)
+            ):
+                raise Exception(
+                    f"{mosaic_file} is not on the same grid as {mosaic_files[0]}."
+                )
+            mosaic_offs.append((round(col_off), round(row_off)))
+
+        tile_col0 = round((min_x - ref_trans.c) / res_x)
+        tile_col1 = round((max_x - ref_trans.c) / res_x)
+        tile_row0 = round((ref_trans.f - max_y) / res_y)
+        tile_row1 = round((ref_trans.f - min_y) / res_y)
+
+        out_profile = {
+            "driver": "GTiff",
+            "width": tile_col1 - tile_col0,
+            "height": tile_row1 - tile_row0,
+            "count": ref_ds.count,
+            "dtype": ref_ds.dtypes[0],
+            "crs": ref_ds.crs,
+            "transform": ref_trans * rasterio.Affine.translation(tile_col0, tile_row0),
+            "nodata": 0,
+            "tiled": True,
+            "blockxsize": 512,
+            "blockysize": 512,
+            "compress": "LZW",
+        }
+        tmp_img_file = os.path.join(
+            os.path.dirname(out_img_file), f".tmp_{os.path.basename(out_img_file)}"
+        )
+        try:
+            n_copied = 0
+            with rasterio.open(tmp_img_file, "w", **out_profile) as out_ds:
+                for band_idx, band_desc in enumerate(ref_ds.descriptions):
+                    if band_desc is not None:
+                        out_ds.set_band_description(band_idx + 1, band_desc)
+                for mosaic_ds, (col_off, row_off) in zip(mosaic_dss, mosaic_offs):
+                    col0 = max(tile_col0, col_off)
+                    col1 = min(tile_col1, col_off + mosaic_ds.width)
+                    row0 = max(tile_row0, row_off)
+                    row1 = min(tile_row1, row_off + mosaic_ds.height)
+                    if (col0 >= col1) or (row0 >= row1):
+                        continue
+                    for blk_row in range(row0, row1, blk_size):
+                        blk_rows = min(blk_size, row1 - blk_row)
+                        blk_arr = mosaic_ds.read(
+                            window=rasterio.windows.Window(
+                                col0 - col_off, blk_row - row_off, col1 - col0, blk_rows
+                            )
+                        )
+                        out_ds.write(
+                            blk_arr,
+                            window=rasterio.windows.Window(
+                                col0 - tile_col0, blk_row - tile_row0, col1 - col0, blk_rows
+                            ),
+                        )
+                    n_copied += 1
+            if n_copied == 0:
+                raise Exception(f"The tile {tile_bbox} is not within the mosaic.")
+            os.replace(tmp_img_file, out_img_file)
+        finally:
+            if os.path.exists(tmp_img_file):
+                os.remove(tmp_img_file)
+
+
+def run_cut_mosaic_tiles(tile_jobs: list, n_workers: int = 1, **kwargs) -> dict:
+    """
+    A function which runs cut_mosaic_tile for a set of tiles using a pool of
+    n_workers processes (see gmw_pool_tools.run_pool_jobs). A tile which
+    fails is reported and does not stop the other tiles.
+
+    :param tile_jobs: list of dicts with the tile_name, mosaic_files,
+                      tile_bbox and out_img_file of each tile.
+    :param n_workers: the number of processes.
+    :param kwargs: other cut_mosaic_tile arguments common to all the tiles.
+    :return: dict of tile name to error message for the tiles which failed.
+
+    """
+    import gmw_pool_tools
+
+    _, tiles_errs = gmw_pool_tools.run_pool_jobs(
+        cut_mosaic_tile,
+        gmw_pool_tools.get_pool_jobs(tile_jobs, "tile_name", kwargs),
+        n_workers=n_workers,
+        fail_label="cut",
+    )
+    return tiles_errs
@@ -0,0 +1,496 @@
+import os
+
+import tqdm
+
+import gmw_smpls_store
+
+
+def read_vec_gdf(vec_file: str, vec_lyr: str = None):
+    """
+    A function which reads a vector layer into a geopandas GeoDataFrame. If the
+    file name contains 'parquet' then it is read as a geoparquet file otherwise
+    it is read using geopandas.read_file.
+
+    :param vec_file: Input vector file
+    :param vec_lyr: Input vector layer (ignored for parquet files)
+    :return: geopandas.GeoDataFrame
+
+    """
+    import geopandas
+
+    if "parquet" in os.path.basename(vec_file):
+        data_gdf = geopandas.read_parquet(vec_file)
+    else:
+        data_gdf = geopandas.read_file(vec_file, layer=vec_lyr)
+    return data_gdf
+
+
+def get_parquet_compression(out_vec_ext: str):
+    """
+    Get the parquet compression from the output file extension
+    (i.e., 'gzip' or 'sz' for snappy).
+
+    :param out_vec_ext: the output file extension (e.g., parquet.sz)
+    :return: compression name or None.
+
+    """
+    out_compress = None
+    if "gzip" in out_vec_ext:
+        out_compress = "gzip"
+    elif "sz" in out_vec_ext:
+        out_compress = "snappy"
+    return out_compress
+
+
+def write_vec_gdf(
+    data_gdf, out_vec_file: str, out_vec_lyr: str, out_vec_ext: str, out_format: str
+):
+    """
+    A function which writes a GeoDataFrame to disk using the output format
+    conventions used through out the pipeline.
+
+    :param data_gdf: the geopandas.GeoDataFrame to be written.
+    :param out_vec_file: Output vector file
+    :param out_vec_lyr: Output vector layer name (used for GPKG outputs)
+    :param out_vec_ext: Output file extension (used to define parquet compression)
+    :param out_format: The output format (e.g., PARQUET, GPKG, ESRI Shapefile).
+
+    """
+    import shutil
+
+    # The output is written within a temporary directory and then moved so a
+    # failed write does not leave a partial output. For formats with more
+    # than one file (e.g., the .shx and .dbf of an ESRI Shapefile) the other
+    # files are moved first so the output file is the last to be replaced.
+    out_vec_dir = os.path.dirname(out_vec_file)
+    out_vec_name = os.path.basename(out_vec_file)
+    tmp_out_dir = os.path.join(out_vec_dir, f".tmp_{out_vec_name}")
+    tmp_out_vec_file = os.path.join(tmp_out_dir, out_vec_name)
+    if os.path.isdir(tmp_out_dir):
+        shutil.rmtree(tmp_out_dir)
+    elif os.path.exists(tmp_out_dir):
+        os.remove(tmp_out_dir)
+    os.mkdir(tmp_out_dir)
+    try:
+        if out_format == "PARQUET":
+            out_compress = get_parquet_compression(out_vec_ext)
+            data_gdf.to_parquet(tmp_out_vec_file, compression=out_compress)
+        elif out_format == "GPKG":
+            data_gdf.to_file(tmp_out_vec_file, layer=out_vec_lyr, driver=out_format)
+        else:
+            data_gdf.to_file(tmp_out_vec_file, driver=out_format)
+        for tmp_file_name in os.listdir(tmp_out_dir):
+            if tmp_file_name != out_vec_name:
+                os.replace(
+                    os.path.join(tmp_out_dir, tmp_file_name),
+                    os.path.join(out_vec_dir, tmp_file_name),
+                )
+        os.replace(tmp_out_vec_file, out_vec_file)
+    finally:
+        shutil.rmtree(tmp_out_dir, ignore_errors=True)
+
+
+def run_write_jobs(write_jobs, n_workers: int = 1, max_pending: int = None):
+    """
+    A function which runs a set of write jobs (e.g., functools.partial of
+    write_vec_gdf) using a pool of threads, so the compression and writing of
+    the outputs is done in parallel with the calculation of the next subset.
+    write_jobs is consumed lazily (i.e., it can be a generator) and no more
+    than max_pending jobs are held at once so memory is bounded. If a job
+    fails no further jobs are submitted and the error is raised once the
+    running jobs have finished.
+
+    :param write_jobs: iterable of functions with no arguments to be called.
+    :param n_workers: the number of threads used to write the outputs. If 1
+                      (default) the jobs are run in sequence.
+    :param max_pending: the maximum number of jobs submitted but not finished.
+                        Default is 2 x n_workers.
+
+    """
+    import concurrent.futures
+
+    if n_workers <= 1:
+        for write_job in write_jobs:
+            write_job()
+        return
+
+    if max_pending is None:
+        max_pending = 2 * n_workers
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=n_workers) as pool:
+        pending = set()
+        try:
+            for write_job in write_jobs:
+                if len(pending) >= max_pending:
+                    done, pending = concurrent.futures.wait(
+                        pending, return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                    for future in done:
+                        future.result()
+                pending.add(pool.submit(write_job))
+            done, pending = concurrent.futures.wait(pending)
+            for future in done:
+                future.result()
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+
+
+def get_out_vec_lyr(val_str: str, out_vec_base_pre: str, out_vec_base_post: str):
+    """
+    Get an output layer name by joining the prefix, value and postfix with
+    underscores, where the prefix or postfix are not empty strings.
+
+    :param val_str: the value for the layer
+    :param out_vec_base_pre: a string which is prepended to the value
+    :param out_vec_base_post: a string which is appended to the value
+    :return: the layer name
+
+    """
+    out_vec_base_pre_tmp = out_vec_base_pre
+    if out_vec_base_pre != "":
+        out_vec_base_pre_tmp = f"{out_vec_base_pre}_"
+    out_vec_base_post_tmp = out_vec_base_post
+    if out_vec_base_post != "":
+        out_vec_base_post_tmp = f"_{out_vec_base_post}"
+    return f"{out_vec_base_pre_tmp}{val_str}{out_vec_base_post_tmp}"
+
+
+def get_roi_out_vec_lyr(
+    roi_val, out_vec_base_pre: str, out_vec_base_post: str, out_name_lower: bool
+):
+    """
+    Get the output layer name used for a roi value (i.e., a project) by
+    clip_vec_into_sets. The name is checked to remove punctuation (other
+    than dashes), spaces and non-ascii characters.
+
+    :param roi_val: the roi value
+    :param out_vec_base_pre: a string which is prepended to the value
+    :param out_vec_base_post: a string which is appended to the value
+    :param out_name_lower: If True the name will be lower case.
+    :return: the layer name
+
+    """
+    import rsgislib.tools.utils
+
+    out_vec_lyr = get_out_vec_lyr(roi_val, out_vec_base_pre, out_vec_base_post)
+    out_vec_lyr = rsgislib.tools.utils.check_str(
+        out_vec_lyr,
+        rm_non_ascii=True,
+        rm_dashs=False,
+        rm_spaces=True,
+        rm_punc=True,
+    )
+    if out_name_lower:
+        out_vec_lyr = out_vec_lyr.lower()
+    return out_vec_lyr
+
+
+def get_split_out_vec_lyr(
+    val, out_vec_base_pre: str, out_vec_base_post: str, chk_lyr_names: bool = True
+):
+    """
+    Get the output layer name used for a split value (i.e., a class) by
+    split_by_attribute. If chk_lyr_names is True then the value is checked
+    to remove punctuation, dashes and non-ascii characters.
+
+    :param val: the split value
+    :param out_vec_base_pre: a string which is prepended to the value
+    :param out_vec_base_post: a string which is appended to the value
+    :param chk_lyr_names: If True (default) the value will be checked.
+    :return: the layer name
+
+    """
+    import rsgislib.tools.utils
+
+    val_str = f"{val}"
+    if chk_lyr_names:
+        val_str = rsgislib.tools.utils.check_str(
+            val_str,
+            rm_non_ascii=True,
+            rm_dashs=True,
+            rm_spaces=False,
+            rm_punc=True,
+        )
+    return get_out_vec_lyr(val_str, out_vec_base_pre, out_vec_base_post)
+
+
+def get_roi_partition_idxs(data_gdf, roi_gdf, roi_att_col: str):
+    """
+    A function which assigns every feature in data_gdf to the roi_att_col
+    value(s) of the roi polygons it intersects using a single bulk query of
+    the STRtree spatial index rather than a clip per roi value.
+
+    The indices for each roi value are returned in the same order as
+    GeoDataFrame.clip would return the features (i.e., the leaf order of the
+    spatial index) so outputs are identical to clipping. If the bbox of the
+    roi does not overlap the data then None is returned for that value, as clip
+    returns gdf.iloc[:0] in that case. Only valid for point data.
+
+    :param data_gdf: the geopandas.GeoDataFrame of points to be partitioned.
+    :param roi_gdf: the geopandas.GeoDataFrame of roi polygons.
+    :param roi_att_col: the column in roi_gdf defining the partitions.
+    :return: dict of roi value to numpy array of positional indices (or None)
+
+    """
+    import numpy
+    import pandas
+    import shapely.geometry
+
+    roi_codes, unq_roi_vals = pandas.factorize(roi_gdf[roi_att_col])
+    roi_bboxs = (
+        roi_gdf.bounds[roi_codes >= 0]
+        .groupby(roi_codes[roi_codes >= 0])
+        .agg({"minx": "min", "miny": "min", "maxx": "max", "maxy": "max"})
+    )
+
+    out_idxs = dict()
+    n_data = len(data_gdf)
+    if n_data == 0:
+        for roi_val in unq_roi_vals:
+            out_idxs[roi_val] = None
+        return out_idxs
+    data_bbox = data_gdf.total_bounds
+
+    # Querying with the data bbox (no predicate) returns every feature in the
+    # leaf order of the tree, which is the order any query of the tree returns.
+    tree_order = data_gdf.sindex.query(shapely.geometry.box(*data_bbox))
+    tree_rank = numpy.zeros(n_data, dtype=numpy.int64)
+    tree_rank[tree_order] = numpy.arange(len(tree_order), dtype=numpy.int64)
+
+    roi_idxs, data_idxs = data_gdf.sindex.query(
+        roi_gdf.geometry.values, predicate="intersects"
+    )
+    smpl_codes = roi_codes[roi_idxs].astype(numpy.int64)
+    vld_smpls = smpl_codes >= 0
+    smpl_codes = smpl_codes[vld_smpls]
+    data_idxs = data_idxs[vld_smpls]
+
+    # Unique (roi code, tree rank) keys sorted by roi and then tree order, this
+    # also removes points intersecting more than one polygon of the same roi.
+    smpl_keys = numpy.unique(smpl_codes * n_data + tree_rank[data_idxs])
+    key_codes = smpl_keys // n_data
+    key_idxs = tree_order[smpl_keys % n_data]
+    splits = numpy.searchsorted(key_codes, numpy.arange(len(unq_roi_vals) + 1))
+
+    for roi_code, roi_val in enumerate(unq_roi_vals):
+        roi_bbox = roi_bboxs.loc[roi_code]
+        if not (
+            (roi_bbox["minx"] <= data_bbox[2])
+            and (data_bbox[0] <= roi_bbox["maxx"])
+            and (roi_bbox["miny"] <= data_bbox[3])
+            and (data_bbox[1] <= roi_bbox["maxy"])
+        ):
+            out_idxs[roi_val] = None
+        else:
+            out_idxs[roi_val] = key_idxs[splits[roi_code] : splits[roi_code + 1]]
+    return out_idxs
+
+
+def clip_vec_into_sets(
+    vec_file,
+    vec_lyr,
+    vec_roi_file,
+    vec_roi_lyr,
+    roi_att_col,
+    out_vec_dir,
+    out_vec_base_pre,
+    out_vec_base_post,
+    out_vec_ext,
+    out_format="GPKG",
+    out_name_lower=False,
+    partition_mode="clip",
+    n_workers=1,
+):
+    """
+    A function which splits a vector layer into a set of output files using
+    the unique values of an attribute on a set of roi polygons.
+
+    :param vec_file: Input vector file
+    :param vec_lyr: Input vector layer
+    :param vec_roi_file: Input roi vector file
+    :param vec_roi_lyr: Input roi vector layer
+    :param roi_att_col: The column in the roi layer defining the output sets.
+    :param out_vec_dir: The output directory
+    :param out_vec_base_pre: a string which is prepended to the output vector file names
+    :param out_vec_base_post: a string which is appended to the output vector file names
+    :param out_vec_ext: Output file extension
+    :param out_format: The output format (e.g., PARQUET, GPKG, ESRI Shapefile).
+    :param out_name_lower: If True the output names will be lower case.
+    :param partition_mode: Either 'clip' (default) where the input is clipped
+                           once for each roi value or 'single_pass' where all
+                           the points are assigned to the roi values with a
+                           single spatial index query. 'single_pass' is only
+                           used for point data and the outputs are identical.
+    :param n_workers: the number of threads used to write the outputs while
+                      the next subset is calculated (Default: 1).
+
+    """
+    import functools
+
+    import rsgislib
+
+    if partition_mode not in ["clip", "single_pass"]:
+        raise rsgislib.RSGISPyException(
+            f"partition_mode must be 'clip' or 'single_pass' not '{partition_mode}'"
+        )
+
+    if not os.path.exists(out_vec_dir):
+        os.mkdir(out_vec_dir)
+
+    print("Reading Data")
+    data_gdf = read_vec_gdf(vec_file, vec_lyr)
+
+    print("Reading ROI Data")
+    roi_gdf = read_vec_gdf(vec_roi_file, vec_roi_lyr)
+
+    unq_roi_vals = roi_gdf[roi_att_col].unique()
+
+    if (partition_mode == "single_pass") and (data_gdf.geom_type != "Point").any():
+        print("Input data is not all points so using 'clip' partition mode.")
+        partition_mode = "clip"
+
+    roi_data_idxs = None
+    if partition_mode == "single_pass":
+        print("Assigning Data to ROIs")
+        roi_data_idxs = get_roi_partition_idxs(data_gdf, roi_gdf, roi_att_col)
+
+    def _get_write_jobs():
+        for roi_val in tqdm.tqdm(unq_roi_vals):
+            if roi_data_idxs is None:
+                roi_sub_gdf = roi_gdf[roi_gdf[roi_att_col] == roi_val]
+                roi_data_gdf = data_gdf.clip(roi_sub_gdf, keep_geom_type=True)
+            elif roi_data_idxs.get(roi_val, None) is None:
+                roi_data_gdf = data_gdf.iloc[:0]
+            else:
+                roi_data_gdf = data_gdf.iloc[roi_data_idxs[roi_val]]
+
+            out_vec_lyr = get_roi_out_vec_lyr(
+                roi_val, out_vec_base_pre, out_vec_base_post, out_name_lower
+            )
+
+            out_vec_file = os.path.join(out_vec_dir, f"{out_vec_lyr}.{out_vec_ext}")
+            yield functools.partial(
+                write_vec_gdf,
+                roi_data_gdf,
+                out_vec_file,
+                out_vec_lyr,
+                out_vec_ext,
+                out_format,
+            )
+
+    print(f"There are {len(unq_roi_vals)} unique roi vals")
+    print("Running Subsetting:")
+    run_write_jobs(_get_write_jobs(), n_workers=n_workers)
+
+
+def split_vec_into_roi_att_sets(
+    vec_file: str,
+    vec_lyr: str,
+    vec_roi_file: str,
+    vec_roi_lyr: str,
+    roi_att_col: str,
+    split_col_name: str,
+    out_vec_dir: str,
+    out_vec_base_post: str,
+    out_vec_ext: str,
+    out_format: str = "PARQUET",
+    out_name_lower: bool = False,
+    chk_lyr_names: bool = True,
+    n_workers: int = 1,
+):
+    """
+    A function which combines clip_vec_into_sets and split_by_attribute into
+    a single pass over the input points. The points are assigned to the roi
+    values (i.e., projects) with a single spatial index query and then each
+    roi subset is grouped by split_col_name (i.e., class) and written directly
+    to files named {roi_val}_{out_vec_base_post}_{split_val}.{out_vec_ext},
+    with the same names and schema as running the two functions in sequence.
+    Only point data is supported.
+
+    :param vec_file: Input vector file
+    :param vec_lyr: Input vector layer
+    :param vec_roi_file: Input roi vector file
+    :param vec_roi_lyr: Input roi vector layer
+    :param roi_att_col: The column in the roi layer defining the output sets.
+    :param split_col_name: The column name by which the roi sets will be split.
+    :param out_vec_dir: The output directory
+    :param out_vec_base_post: a string which is appended to the roi value
+    :param out_vec_ext: Output file extension
+    :param out_format: The output format (e.g., PARQUET, GPKG, ESRI Shapefile).
+                       If PARQUET_DATASET then out_vec_dir is written as a hive
+                       partitioned parquet dataset (roi_att_col=/split_col_name=)
+                       rather than individual files.
+    :param out_name_lower: If True the roi part of the output names will be
+                           lower case.
+    :param chk_lyr_names: If True (default) split values will be checked, which
+                          means punctuation removed and all characters being
+                          ascii characters.
+    :param n_workers: the number of threads used to write the outputs while
+                      the next subset is calculated (Default: 1).
+
+    """
+    import functools
+
+    import rsgislib
+
+    if not os.path.exists(out_vec_dir):
+        os.mkdir(out_vec_dir)
+
+    print("Reading Data")
+    data_gdf = read_vec_gdf(vec_file, vec_lyr)
+
+    print("Reading ROI Data")
+    roi_gdf = read_vec_gdf(vec_roi_file, vec_roi_lyr)
+
+    if (data_gdf.geom_type != "Point").any():
+        raise rsgislib.RSGISPyException("The input data must only contain points.")
+
+    unq_roi_vals = roi_gdf[roi_att_col].unique()
+
+    print("Assigning Data to ROIs")
+    roi_data_idxs = get_roi_partition_idxs(data_gdf, roi_gdf, roi_att_col)
+
+    def _get_write_jobs():
+        for roi_val in tqdm.tqdm(unq_roi_vals):
+            roi_idxs = roi_data_idxs.get(roi_val, None)
+            if (roi_idxs is None) or (len(roi_idxs) == 0):
+                continue
+            roi_data_gdf = data_gdf.iloc[roi_idxs]
+            # Check for empty or NA geometries.
+            roi_data_gdf = roi_data_gdf[
+                ~(roi_data_gdf.is_empty | roi_data_gdf.geometry.isna())
+            ]
+
+            roi_vec_lyr = get_roi_out_vec_lyr(
+                roi_val, "", out_vec_base_post, out_name_lower
+            )
+            for split_val, c_gpdf in roi_data_gdf.groupby(split_col_name, sort=False):
+                if out_format == "PARQUET_DATASET":
+                    yield functools.partial(
+                        gmw_smpls_store.write_partition,
+                        c_gpdf,
+                        out_vec_dir,
+                        {roi_att_col: roi_val, split_col_name: split_val},
+                        compression=get_parquet_compression(out_vec_ext),
+                    )
+                    continue
+                out_vec_lyr = get_split_out_vec_lyr(
+                    split_val, roi_vec_lyr, "", chk_lyr_names
+                )
+                out_vec_file = os.path.join(
+                    out_vec_dir, f"{out_vec_lyr}.{out_vec_ext}"
+                )
+                yield functools.partial(
+                    write_vec_gdf,
+                    c_gpdf,
+                    out_vec_file,
+                    out_vec_lyr,
+                    out_vec_ext,
+                    out_format,
+                )
+
+    print(f"There are {len(unq_roi_vals)} unique roi vals")
+    print("Running Subsetting:")
+    run_write_jobs(_get_write_jobs(), n_workers=n_workers)
@@ -0,0 +1,110 @@
+import numpy
+import pytest
+
+import gmw_cube_tools
+
+
+def test_calc_chng_metrics_no_data():
+    years = [2000, 2001, 2002, 2003, 2004]
+    nd = 255
+    prop_arr = numpy.array(
+        [
+            # Loss in 2002 and gain in 2004.
+            [80, 90, 10, 20, 70],
+            # No data in 2001 and 2002, so the loss is in 2003 (not 2001).
+            [80, nd, nd, 10, 20],
+            # No data between two mangrove years is not a loss and gain.
+            [80, nd, 90, nd, 85],
+            # A single year with data.
+            [nd, nd, 60, nd, nd],
+            # All no data.
+            [nd, nd, nd, nd, nd],
+            # All the mangroves are lost (0 is a valid proportion).
+            [80, 0, 0, 0, 0],
+            # Gain from 0%.
+            [0, 0, 0, 60, 90],
+        ],
+        dtype=numpy.uint8,
+    ).T.reshape(len(years), 1, 7)
+    out_arr = gmw_cube_tools.calc_chng_metrics(prop_arr, years, mng_thres=50)
+    numpy.testing.assert_array_equal(out_arr[0, 0], [2002, 2003, 0, 0, 0, 2001, 0])
+    numpy.testing.assert_array_equal(out_arr[1, 0], [2004, 0, 0, 0, 0, 0, 2003])
+
+    # The trend is fitted to the years with data, including those of 0%.
+    for pxl_idx in [0, 1, 2, 5, 6]:
+        pxl_props = prop_arr[:, 0, pxl_idx]
+        vld_msk = pxl_props != nd
+        ref_slope = numpy.polyfit(
+            numpy.array(years)[vld_msk], pxl_props[vld_msk].astype(float), 1
+        )[0]
+        assert out_arr[2, 0, pxl_idx] == pytest.approx(ref_slope, rel=1e-4)
+    assert out_arr[2, 0, 5] < 0
+    numpy.testing.assert_array_equal(out_arr[2, 0, 3:5], [0, 0])
+
+
+def test_get_tile_prop_imgs(tmp_path):
+    # TILE-1 has the outputs of two models for 2000.
+    for year, tile_mdls in [
+        ("2000", [("TILE-1", "1"), ("TILE-1", "ens10")]),
+        ("2001", [("TILE-1", "1"), ("TILE-2", "1")]),
+    ]:
+        prop_dir = tmp_path / year / "prop"
+        prop_dir.mkdir(parents=True)
+        for tile_name, mdl_name in tile_mdls:
+            (prop_dir / f"{tile_name}_{year}_mng_cls_count_{mdl_name}_prop.tif").touch()
+        (prop_dir / "readme.txt").touch()
+
+    tile_imgs = gmw_cube_tools.get_tile_prop_imgs(str(tmp_path), ["2000", "2001"])
+    assert sorted(tile_imgs) == [("TILE-1", "1"), ("TILE-1", "ens10"), ("TILE-2", "1")]
+    assert list(tile_imgs[("TILE-1", "1")]) == ["2000", "2001"]
+    assert tile_imgs[("TILE-1", "ens10")]["2000"].endswith(
+        "TILE-1_2000_mng_cls_count_ens10_prop.tif"
+    )
+
+
+def test_build_tile_cube(tmp_path):
+    rasterio = pytest.importorskip("rasterio")
+    import rasterio.transform
+
+    years = ["2000", "2001", "2002"]
+    rng = numpy.random.default_rng(42)
+    prop_arr = rng.integers(0, 101, size=(len(years), 40, 50)).astype(numpy.uint8)
+    prop_arr[rng.random(prop_arr.shape) < 0.1] = 255
+    profile = {
+        "driver": "GTiff",
+        "width": 50,
+        "height": 40,
+        "count": 1,
+        "dtype": "uint8",
+        "nodata": 255,
+        "crs": "EPSG:4326",
+        "transform": rasterio.transform.from_origin(100.0, 1.0, 0.00025, 0.00025),
+    }
+    year_imgs = dict()
+    for year, year_arr in zip(years, prop_arr):
+        year_imgs[year] = str(tmp_path / f"TILE-1_{year}_mng_cls_count_1_prop.tif")
+        year_profile = profile
+        if year == "2000":
+            # An image calculated when the no data value was 0.
+            year_profile = dict(profile, nodata=0)
+            year_arr = numpy.where(year_arr == 255, 0, year_arr)
+        with rasterio.open(year_imgs[year], "w", **year_profile) as year_ds:
+            year_ds.write(year_arr, 1)
+    prop_arr[0][prop_arr[0] == 0] = 255
+
+    out_cube_file = str(tmp_path / "TILE-1_1_mng_prop_cube.tif")
+    out_metrics_file = str(tmp_path / "TILE-1_1_mng_chng_metrics.tif")
+    gmw_cube_tools.build_tile_cube(
+        year_imgs, out_cube_file, out_metrics_file, chunk_size=16
+    )
+    with rasterio.open(out_cube_file) as cube_ds:
+        assert cube_ds.nodata == 255
+        numpy.testing.assert_array_equal(cube_ds.read(), prop_arr)
+    with rasterio.open(out_metrics_file) as metrics_ds:
+        numpy.testing.assert_allclose(
+            metrics_ds.read(),
+            gmw_cube_tools.calc_chng_metrics(prop_arr, [int(year) for year in years]),
+            rtol=1e-5,
+            atol=1e-4,
+        )
+    assert not any(p.name.startswith(".tmp_") for p in tmp_path.iterdir())
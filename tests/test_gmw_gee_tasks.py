@@ -0,0 +1,171 @@
+import functools
+import types
+
+import pytest
+
+import gmw_gee_tasks
+import gmw_job_db
+
+
+class FakeTask:
+    def __init__(self, task_id, fake_ee):
+        self.id = task_id
+        self.fake_ee = fake_ee
+
+    def start(self):
+        self.fake_ee.started.append(self.id)
+
+
+class FakeEE:
+    """
+    Replacement for the ee module where the states returned for each task
+    are scripted: task_scripts is a dict of task name to a list (one per
+    attempt) of the states returned by successive polls, None being a poll
+    where the task is missing from the response. The last state is repeated.
+    An attempt of "raise" (rather than a list) raises an error when the task
+    is created.
+    """
+
+    def __init__(self, task_scripts):
+        self.task_scripts = task_scripts
+        self.task_attempts = dict()
+        self.task_polls = dict()
+        self.started = list()
+        self.data = types.SimpleNamespace(getTaskStatus=self.get_task_status)
+
+    def create_task(self, task_name):
+        n_attempt = self.task_attempts.get(task_name, 0)
+        self.task_attempts[task_name] = n_attempt + 1
+        if self.task_scripts[task_name][n_attempt] == "raise":
+            raise Exception(f"Invalid export for {task_name}")
+        task_id = f"{task_name}:{n_attempt}"
+        self.task_polls[task_id] = list(self.task_scripts[task_name][n_attempt])
+        return FakeTask(task_id, self)
+
+    def get_task_status(self, task_ids):
+        out_status = list()
+        for task_id in task_ids:
+            task_polls = self.task_polls[task_id]
+            task_state = task_polls.pop(0) if len(task_polls) > 1 else task_polls[0]
+            if task_state is not None:
+                out_status.append({"id": task_id, "state": task_state})
+        return out_status
+
+
+def run_fake_tasks(tmp_path, fake_ee, task_names, **kwargs):
+    gee_tasks = [
+        (task_name, functools.partial(fake_ee.create_task, task_name))
+        for task_name in task_names
+    ]
+    job_db_file = str(tmp_path / "gmw_jobs.db")
+    job_states = gmw_gee_tasks.run_gee_tasks(
+        gee_tasks,
+        job_db_file,
+        "test_stage",
+        poll_interval=0,
+        ee_module=fake_ee,
+        **kwargs,
+    )
+    db_conn = gmw_job_db.open_job_db(job_db_file)
+    stage_jobs = gmw_job_db.get_jobs(db_conn, "test_stage")
+    db_conn.close()
+    return job_states, stage_jobs
+
+
+@pytest.mark.parametrize(
+    "gee_state, job_state",
+    [
+        ("READY", gmw_job_db.JOB_SUBMITTED),
+        ("RUNNING", gmw_job_db.JOB_RUNNING),
+        ("COMPLETED", gmw_job_db.JOB_SUCCEEDED),
+        ("FAILED", gmw_job_db.JOB_FAILED),
+        ("UNKNOWN", gmw_job_db.JOB_FAILED),
+    ],
+)
+def test_get_job_state_for_gee_state(gee_state, job_state):
+    assert gmw_gee_tasks.get_job_state_for_gee_state(gee_state) == job_state
+
+
+def test_run_gee_tasks_states(tmp_path):
+    fake_ee = FakeEE(
+        {
+            "completed": [["READY", "RUNNING", "COMPLETED"]],
+            "retried": [["READY", "RUNNING", "FAILED"], ["RUNNING", "COMPLETED"]],
+            "unknown": [["READY", "UNKNOWN"], ["COMPLETED"]],
+            "missing": [["RUNNING", None], ["COMPLETED"]],
+            "failed": [["FAILED"], ["RUNNING", "FAILED"]],
+        }
+    )
+    job_states, stage_jobs = run_fake_tasks(
+        tmp_path,
+        fake_ee,
+        ["completed", "retried", "unknown", "missing", "failed"],
+        max_attempts=2,
+        max_missing_polls=3,
+    )
+
+    assert job_states == {
+        "completed": gmw_job_db.JOB_SUCCEEDED,
+        "retried": gmw_job_db.JOB_SUCCEEDED,
+        "unknown": gmw_job_db.JOB_SUCCEEDED,
+        "missing": gmw_job_db.JOB_SUCCEEDED,
+        "failed": gmw_job_db.JOB_FAILED,
+    }
+    assert {name: job["n_attempts"] for name, job in stage_jobs.items()} == {
+        "completed": 1,
+        "retried": 2,
+        "unknown": 2,
+        "missing": 2,
+        "failed": 2,
+    }
+    assert stage_jobs["completed"]["task_id"] == "completed:0"
+    assert stage_jobs["failed"]["error_message"] == "GEE task state: FAILED"
+
+
+def test_run_gee_tasks_resumes(tmp_path):
+    fake_ee = FakeEE({"a": [["COMPLETED"]], "b": [["FAILED"], ["COMPLETED"]]})
+    run_fake_tasks(tmp_path, fake_ee, ["a", "b"], max_attempts=1)
+    assert fake_ee.started == ["a:0", "b:0"]
+
+    # Succeeded tasks are not resubmitted and failed tasks are resubmitted
+    # while they have attempts left.
+    job_states, stage_jobs = run_fake_tasks(
+        tmp_path, fake_ee, ["a", "b"], max_attempts=2
+    )
+    assert fake_ee.started == ["a:0", "b:0", "b:1"]
+    assert job_states == {"a": gmw_job_db.JOB_SUCCEEDED, "b": gmw_job_db.JOB_SUCCEEDED}
+    assert stage_jobs["b"]["n_attempts"] == 2
+
+
+def test_run_gee_tasks_max_running(tmp_path):
+    task_names = [f"task_{i}" for i in range(7)]
+    fake_ee = FakeEE({task_name: [["RUNNING", "COMPLETED"]] for task_name in task_names})
+    job_states, _ = run_fake_tasks(tmp_path, fake_ee, task_names, max_running=3)
+    assert set(job_states.values()) == {gmw_job_db.JOB_SUCCEEDED}
+    assert len(fake_ee.started) == 7
+
+
+def test_run_gee_tasks_submit_error(tmp_path):
+    # A task which cannot be created is recorded as a failed attempt and
+    # retried, without stopping the other tasks.
+    fake_ee = FakeEE(
+        {
+            "task_a": ["raise", ["RUNNING", "COMPLETED"]],
+            "task_b": [["READY", "COMPLETED"]],
+            "task_c": ["raise", "raise"],
+            "task_d": [["COMPLETED"]],
+        }
+    )
+    job_states, stage_jobs = run_fake_tasks(
+        tmp_path, fake_ee, ["task_a", "task_b", "task_c", "task_d"], max_attempts=2
+    )
+    assert job_states == {
+        "task_a": gmw_job_db.JOB_SUCCEEDED,
+        "task_b": gmw_job_db.JOB_SUCCEEDED,
+        "task_c": gmw_job_db.JOB_FAILED,
+        "task_d": gmw_job_db.JOB_SUCCEEDED,
+    }
+    assert stage_jobs["task_a"]["n_attempts"] == 2
+    assert stage_jobs["task_c"]["n_attempts"] == 2
+    assert "Invalid export for task_c" in stage_jobs["task_c"]["error_message"]
+    assert sorted(fake_ee.started) == ["task_a:1", "task_b:0", "task_d:0"]
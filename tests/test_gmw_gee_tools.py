@@ -0,0 +1,126 @@
+import json
+import sys
+import types
+
+import geopandas
+import numpy
+import pandas
+import pytest
+
+import gmw_gee_tools
+
+
+def get_pts_gdf(xs, ys):
+    return geopandas.GeoDataFrame(
+        geometry=geopandas.points_from_xy(xs, ys), crs="EPSG:4326"
+    )
+
+
+@pytest.fixture
+def fake_ee(monkeypatch):
+    """
+    Replacement for the ee module which records the payloads each
+    FeatureCollection is created from.
+    """
+    fake_ee = types.ModuleType("ee")
+    fake_ee.payloads = list()
+
+    def feature_collection(args):
+        fake_ee.payloads.append(args)
+        return args
+
+    fake_ee.FeatureCollection = feature_collection
+    monkeypatch.setitem(sys.modules, "ee", fake_ee)
+    return fake_ee
+
+
+def test_get_cls_pts_geojson_recorded():
+    out_fcs = gmw_gee_tools.get_cls_pts_geojson(
+        [
+            (1, get_pts_gdf([100.0, 100.5], [1.0, 1.5])),
+            (2, get_pts_gdf([], [])),
+            (3, get_pts_gdf([101.25], [2.0])),
+        ],
+        cls_col="class",
+        max_n_pts=2,
+    )
+    assert out_fcs == [
+        {
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "geometry": {
+                        "type": "MultiPoint",
+                        "coordinates": [[100.0, 1.0], [100.5, 1.5]],
+                    },
+                    "properties": {"class": 1},
+                }
+            ],
+        },
+        {
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "geometry": {"type": "MultiPoint", "coordinates": [[101.25, 2.0]]},
+                    "properties": {"class": 3},
+                }
+            ],
+        },
+    ]
+    assert gmw_gee_tools.get_cls_pts_geojson([(1, get_pts_gdf([], []))]) == []
+
+
+def test_get_gee_cls_pts_fcs_payload_size(fake_ee):
+    rng = numpy.random.default_rng(42)
+    n_cls_pts = [120000, 0, 95000]
+    cls_pts = [
+        (
+            cls_id,
+            get_pts_gdf(
+                rng.uniform(100, 101, n_pts), rng.uniform(-1, 0, n_pts)
+            ),
+        )
+        for cls_id, n_pts in zip([1, 2, 3], n_cls_pts)
+    ]
+    out_fcs = gmw_gee_tools.get_gee_cls_pts_fcs(cls_pts, max_n_pts=100000)
+
+    # A FeatureCollection for each payload, none of which are merged.
+    assert len(out_fcs) == 3
+    assert fake_ee.payloads == out_fcs
+    payload_n_pts = [
+        sum(len(ftr["geometry"]["coordinates"]) for ftr in payload["features"])
+        for payload in fake_ee.payloads
+    ]
+    assert payload_n_pts == [100000, 100000, 15000]
+    cls_n_pts = dict()
+    for payload in fake_ee.payloads:
+        for ftr in payload["features"]:
+            cls_id = ftr["properties"]["class"]
+            cls_n_pts[cls_id] = cls_n_pts.get(cls_id, 0) + len(
+                ftr["geometry"]["coordinates"]
+            )
+    assert cls_n_pts == {1: 120000, 3: 95000}
+    # Each request stays well below the GEE request size limit (10 MB).
+    for payload in fake_ee.payloads:
+        assert len(json.dumps(payload)) < 5 * 1024 * 1024
+
+
+def test_get_df_geojson_fc():
+    data_df = pandas.DataFrame(
+        {
+            "NDVI": [0.5, numpy.nan, 0.25],
+            "class": numpy.array([1, 2, 3], dtype=numpy.int8),
+            "latitude": [1.0, 2.0, 3.0],
+        }
+    )
+    out_fc = gmw_gee_tools.get_df_geojson_fc(data_df, row_idxs=numpy.array([1, 2]))
+    assert out_fc == {
+        "type": "FeatureCollection",
+        "features": [
+            {"type": "Feature", "geometry": None, "properties": {"NDVI": None, "class": 2}},
+            {"type": "Feature", "geometry": None, "properties": {"NDVI": 0.25, "class": 3}},
+        ],
+    }
+    assert type(out_fc["features"][0]["properties"]["class"]) is int
@@ -0,0 +1,99 @@
+import numpy
+import pytest
+
+import gmw_indices
+
+
+def get_ref_indices(refl_arr):
+    # A per pixel reference of the GEE semantics: the bands are scaled to
+    # 0-1, a division by zero is 0 (ee.Image.divide) and normalisedDifference
+    # is masked (NaN) where either band is negative.
+    b_idx = {band: i for i, band in enumerate(gmw_indices.ls_bands)}
+    scl_arr = refl_arr.astype(numpy.float64) * 0.0001
+
+    def divide(num, den):
+        return 0.0 if den == 0 else num / den
+
+    out_arr = numpy.zeros((len(gmw_indices.bands), refl_arr.shape[1]))
+    out_arr[0 : len(gmw_indices.ls_bands)] = scl_arr
+    for p in range(refl_arr.shape[1]):
+        vals = {band: scl_arr[i, p] for band, i in b_idx.items()}
+        idx_vals = list()
+        for idx_name, band_a, band_b in gmw_indices.nd_indices:
+            if (vals[band_a] < 0) or (vals[band_b] < 0):
+                idx_vals.append(numpy.nan)
+            else:
+                idx_vals.append(
+                    divide(vals[band_a] - vals[band_b], vals[band_a] + vals[band_b])
+                )
+        idx_vals.append(
+            2.5
+            * divide(
+                vals["NIR"] - vals["Red"],
+                vals["NIR"] + 6 * vals["Red"] - 7.5 * vals["Blue"] + 1,
+            )
+        )
+        idx_vals.append(
+            divide(vals["NIR"] - vals["Green"], vals["SWIR1"] - vals["Green"])
+        )
+        out_arr[len(gmw_indices.ls_bands) :, p] = idx_vals
+    return out_arr
+
+
+def get_test_refl_arr():
+    rng = numpy.random.default_rng(42)
+    refl_arr = rng.integers(-500, 6000, size=(6, 500)).astype(numpy.int16)
+    # Pixels where the indices divide by zero.
+    refl_arr[:, 0] = 0
+    refl_arr[:, 1] = [0, 1000, 0, 1000, 1000, 0]
+    refl_arr[:, 2] = [1000, 500, 1000, 2000, 500, 3000]
+    refl_arr[:, 3] = [-100, 200, 300, 100, 200, 300]
+    # EVI denominator: NIR + 6 * Red - 7.5 * Blue + 1 == 0
+    refl_arr[:, 4] = [0, 400, 0, -10000, 800, 900]
+    # A negative band with a zero sum (masked rather than 0).
+    refl_arr[:, 5] = [100, 200, 300, 300, -300, 500]
+    return refl_arr
+
+
+@pytest.mark.parametrize("use_numexpr", [False, True])
+def test_calc_band_indices_arr_gee_semantics(use_numexpr):
+    if use_numexpr:
+        pytest.importorskip("numexpr")
+    refl_arr = get_test_refl_arr()
+    out_arr = gmw_indices.calc_band_indices_arr(
+        refl_arr, use_numexpr=use_numexpr, chunk_size=64
+    )
+    assert out_arr.dtype == numpy.float32
+    assert out_arr.shape == (len(gmw_indices.bands), refl_arr.shape[1])
+    numpy.testing.assert_allclose(
+        out_arr, get_ref_indices(refl_arr), rtol=1e-3, atol=1e-5, equal_nan=True
+    )
+    # The divisions by zero are 0 rather than NaN or inf.
+    assert numpy.all(out_arr[len(gmw_indices.ls_bands) :, 0] == 0)
+    assert out_arr[gmw_indices.bands.index("MVI"), 2] == 0
+    assert out_arr[gmw_indices.bands.index("EVI"), 4] == 0
+    assert numpy.isnan(out_arr[gmw_indices.bands.index("NDWI"), 5])
+    assert not numpy.any(numpy.isinf(out_arr))
+
+
+def test_calc_band_indices_arr_numpy_numexpr_equal():
+    pytest.importorskip("numexpr")
+    refl_arr = get_test_refl_arr().reshape(6, 20, 25)
+    np_arr = gmw_indices.calc_band_indices_arr(refl_arr, use_numexpr=False)
+    ne_arr = gmw_indices.calc_band_indices_arr(refl_arr, use_numexpr=True)
+    assert np_arr.shape == (len(gmw_indices.bands), 20, 25)
+    numpy.testing.assert_allclose(np_arr, ne_arr, rtol=1e-5, equal_nan=True)
+
+
+def test_calc_band_indices_arr_in_place():
+    refl_arr = get_test_refl_arr()
+    out_arr = numpy.empty((len(gmw_indices.bands), refl_arr.shape[1]), numpy.float32)
+    out_arr[0:6] = refl_arr
+    gmw_indices.calc_band_indices_arr(out_arr[0:6], out_arr=out_arr, use_numexpr=False)
+    numpy.testing.assert_allclose(
+        out_arr, get_ref_indices(refl_arr), rtol=1e-3, atol=1e-5, equal_nan=True
+    )
+    with pytest.raises(Exception):
+        gmw_indices.calc_band_indices_arr(
+            refl_arr, out_arr=numpy.empty(out_arr.shape, numpy.float64)
+        )
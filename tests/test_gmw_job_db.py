@@ -0,0 +1,48 @@
+import gmw_job_db
+
+
+def test_update_job(tmp_path):
+    db_conn = gmw_job_db.open_job_db(str(tmp_path / "gmw_jobs.db"))
+    gmw_job_db.update_job(
+        db_conn, "stage", "job", gmw_job_db.JOB_SUBMITTED, task_id="id1", new_attempt=True
+    )
+    gmw_job_db.update_job(db_conn, "stage", "job", gmw_job_db.JOB_FAILED, error_message="err")
+    gmw_job_db.update_job(
+        db_conn, "stage", "job", gmw_job_db.JOB_SUBMITTED, task_id="id2", new_attempt=True
+    )
+    job = gmw_job_db.get_jobs(db_conn, "stage")["job"]
+    assert job["state"] == gmw_job_db.JOB_SUBMITTED
+    assert job["task_id"] == "id2"
+    assert job["n_attempts"] == 2
+    assert gmw_job_db.get_job_state(db_conn, "stage", "other") is None
+    assert gmw_job_db.get_jobs(db_conn, "stage", states=[gmw_job_db.JOB_FAILED]) == {}
+    db_conn.close()
+
+
+def test_import_lut_files(tmp_path):
+    lut_dir = tmp_path / "luts"
+    lut_dir.mkdir()
+    for lut_name in ["PRJ-1_mdl_1.txt", "PRJ-1_mdl_2.txt", "readme.md", "other.txt"]:
+        (lut_dir / lut_name).touch()
+
+    def get_job(lut_name):
+        if "_mdl_" not in lut_name:
+            return None
+        prj_name, mdl_n = lut_name.split("_mdl_")
+        return "train_mdls", f"{prj_name}_rf_cls_{mdl_n}"
+
+    db_conn = gmw_job_db.open_job_db(str(tmp_path / "gmw_jobs.db"))
+    gmw_job_db.update_job(db_conn, "train_mdls", "PRJ-1_rf_cls_2", gmw_job_db.JOB_RUNNING)
+    assert gmw_job_db.import_lut_files(db_conn, str(lut_dir), get_job) == {
+        "train_mdls": 1
+    }
+    stage_jobs = gmw_job_db.get_jobs(db_conn, "train_mdls")
+    assert stage_jobs["PRJ-1_rf_cls_1"]["state"] == gmw_job_db.JOB_SUCCEEDED
+    # Jobs already within the database are not changed.
+    assert stage_jobs["PRJ-1_rf_cls_2"]["state"] == gmw_job_db.JOB_RUNNING
+    # Importing again does not add any jobs.
+    assert gmw_job_db.import_lut_files(db_conn, str(lut_dir), get_job) == {
+        "train_mdls": 0
+    }
+    assert gmw_job_db.import_lut_files(db_conn, str(tmp_path / "none"), get_job) == {}
+    db_conn.close()
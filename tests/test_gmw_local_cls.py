@@ -0,0 +1,106 @@
+import numpy
+import pytest
+
+import gmw_indices
+import gmw_local_cls
+
+
+class ThresModel:
+    # A model predicting mangroves (1) where the NDVI is above a threshold
+    # and otherwise class 2.
+    def __init__(self, ndvi_thres, classes=(1, 2, 3)):
+        self.ndvi_thres = ndvi_thres
+        self.classes_ = numpy.array(classes)
+
+    def predict(self, data):
+        ndvi = data[:, gmw_indices.bands.index("NDVI")]
+        return numpy.where(ndvi > self.ndvi_thres, 1, 2)
+
+
+def get_test_scenes(n_scenes=4, shape=(37, 45)):
+    rng = numpy.random.default_rng(42)
+    scenes_refl = list()
+    for _ in range(n_scenes):
+        scn_refl = rng.integers(0, 5000, size=(6,) + shape).astype(numpy.float32)
+        # Some invalid (NIR <= 0) pixels.
+        scn_refl[3][rng.random(shape) < 0.1] = 0
+        scenes_refl.append(scn_refl)
+    return scenes_refl
+
+
+def get_ref_counts(scenes_refl, mdls, msk_arr):
+    shape = scenes_refl[0].shape[1:]
+    mng_count = numpy.zeros(shape, dtype=int)
+    vld_count = numpy.zeros(shape, dtype=int)
+    for scn_refl in scenes_refl:
+        feat_arr = gmw_indices.calc_band_indices_arr(scn_refl)
+        vld_msk = (scn_refl[3] > 0) & msk_arr
+        vld_count += vld_msk
+        votes = sum(mdl.predict(feat_arr.reshape(len(feat_arr), -1).T) == 1 for mdl in mdls)
+        is_mng = votes.reshape(shape) >= (len(mdls) - votes.reshape(shape))
+        mng_count += vld_msk & is_mng
+    return mng_count, vld_count
+
+
+def test_classify_scenes_block():
+    scenes_refl = get_test_scenes()
+    mdls = [ThresModel(0.0), ThresModel(0.2), ThresModel(0.4)]
+    msk_arr = numpy.ones(scenes_refl[0].shape[1:], dtype=bool)
+    msk_arr[:5] = False
+    out_arr = gmw_local_cls.classify_scenes_block(
+        scenes_refl, mdls, msk_arr=msk_arr, out_votes=True
+    )
+    mng_count, vld_count = get_ref_counts(scenes_refl, mdls, msk_arr)
+    assert out_arr.dtype == numpy.uint16
+    numpy.testing.assert_array_equal(out_arr[0], mng_count)
+    numpy.testing.assert_array_equal(out_arr[1], vld_count)
+    assert numpy.all(out_arr[0][:5] == 0) and numpy.all(out_arr[1][:5] == 0)
+    assert numpy.all(out_arr[2] <= out_arr[1] * len(mdls))
+    assert numpy.all(out_arr[3] <= out_arr[1])
+
+
+def test_classify_tile_scenes(tmp_path):
+    rasterio = pytest.importorskip("rasterio")
+    import rasterio.transform
+
+    scenes_refl = get_test_scenes()
+    mdls = [ThresModel(0.0), ThresModel(0.2), ThresModel(0.4)]
+    profile = {
+        "driver": "GTiff",
+        "width": scenes_refl[0].shape[2],
+        "height": scenes_refl[0].shape[1],
+        "count": 6,
+        "dtype": "int16",
+        "crs": "EPSG:4326",
+        "transform": rasterio.transform.from_origin(100.0, 1.0, 0.00025, 0.00025),
+    }
+    scene_files = list()
+    for i, scn_refl in enumerate(scenes_refl):
+        scene_file = str(tmp_path / f"scene_{i}.tif")
+        with rasterio.open(scene_file, "w", **profile) as scene_ds:
+            scene_ds.write(scn_refl.astype(numpy.int16))
+        scene_files.append(scene_file)
+
+    out_img_file = str(tmp_path / "tile_mng_cls_count.tif")
+    # A block size which does not divide the tile so the edge blocks differ.
+    gmw_local_cls.classify_tile_scenes(
+        scene_files, mdls, out_img_file, blk_size=16, out_votes=True
+    )
+    with rasterio.open(out_img_file) as out_ds:
+        out_arr = out_ds.read()
+    numpy.testing.assert_array_equal(
+        out_arr, gmw_local_cls.classify_scenes_block(scenes_refl, mdls, out_votes=True)
+    )
+    assert not any(p.name.startswith(".tmp_") for p in tmp_path.iterdir())
+
+
+def test_classify_scenes_block_no_mng_cls():
+    # Models trained without mangrove samples all vote not mangroves, so
+    # every classified scene is counted as agreed.
+    scenes_refl = get_test_scenes()
+    mdls = [ThresModel(2.0, classes=(2, 3)), ThresModel(2.0, classes=(2, 3))]
+    out_arr = gmw_local_cls.classify_scenes_block(scenes_refl, mdls, out_votes=True)
+    assert out_arr[1].max() > 0
+    assert numpy.all(out_arr[0] == 0)
+    assert numpy.all(out_arr[2] == 0)
+    numpy.testing.assert_array_equal(out_arr[3], out_arr[1])
@@ -0,0 +1,36 @@
+import pytest
+
+import gmw_pool_tools
+
+
+def div_job(num, den=1):
+    return num / den
+
+
+@pytest.mark.parametrize("n_workers", [1, 2])
+def test_run_pool_jobs(n_workers):
+    jobs = gmw_pool_tools.get_pool_jobs(
+        [
+            {"name": "a", "num": 4},
+            {"name": "b", "num": 3, "den": 0},
+            {"name": "c", "num": 9},
+        ],
+        "name",
+        {"den": 2},
+    )
+    assert jobs[1] == ("b", {"num": 3, "den": 0})
+    jobs_out, jobs_errs = gmw_pool_tools.run_pool_jobs(
+        div_job,
+        jobs,
+        n_workers=n_workers,
+        job_sizes={"a": 10, "b": 5, "c": 1},
+    )
+    # The job which fails does not stop the others.
+    assert jobs_out == {"a": 2, "c": 4.5}
+    assert list(jobs_errs) == ["b"]
+    assert "ZeroDivisionError" in jobs_errs["b"]
+
+
+def test_get_pool_jobs_key_arg():
+    jobs = gmw_pool_tools.get_pool_jobs([{"num": 4}], "num", {"den": 2}, key_arg=True)
+    assert jobs == [(4, {"num": 4, "den": 2})]
@@ -0,0 +1,20 @@
+import numpy
+
+import gmw_prop_tools
+
+
+def test_calc_prop_block():
+    mng_arr = numpy.array([[0, 0, 5, 3, 0]], dtype=numpy.int32)
+    vld_arr = numpy.array([[0, 10, 10, 3, 7]], dtype=numpy.int32)
+    out_arr = gmw_prop_tools.calc_prop_block(mng_arr, vld_arr)
+    # 0% (valid observations, none mangroves) is distinct from no data.
+    numpy.testing.assert_array_equal(out_arr, [[255, 0, 50, 100, 0]])
+
+
+def test_get_hist_stats():
+    out_arr = numpy.array([255, 255, 0, 50, 100], dtype=numpy.uint8)
+    out_stats = gmw_prop_tools.get_hist_stats(numpy.bincount(out_arr, minlength=256))
+    assert out_stats["STATISTICS_MINIMUM"] == 0
+    assert out_stats["STATISTICS_MAXIMUM"] == 100
+    assert out_stats["STATISTICS_MEAN"] == 50
+    assert out_stats["STATISTICS_VALID_PERCENT"] == 60
@@ -0,0 +1,58 @@
+import numpy
+import pytest
+
+import gmw_smpl_tools
+
+
+def test_get_equal_alloc():
+    numpy.testing.assert_array_equal(
+        gmw_smpl_tools.get_equal_alloc([100, 5, 100], 90), [43, 5, 42]
+    )
+    numpy.testing.assert_array_equal(
+        gmw_smpl_tools.get_equal_alloc([10, 5, 0], 100), [10, 5, 0]
+    )
+
+
+def test_get_strata_n_smpls():
+    strata_n_smpls = gmw_smpl_tools.get_strata_n_smpls(
+        {(1, "a"): 1000, (1, "b"): 10, (2, "a"): 1000, (2, "b"): 1000}, 200
+    )
+    # Equally between the classes, then between the tiles of each class.
+    assert strata_n_smpls == {(1, "a"): 90, (1, "b"): 10, (2, "a"): 50, (2, "b"): 50}
+
+
+@pytest.mark.parametrize(
+    "n_avail, n_smpls", [(10, 5), (20000, 10000), (20001, 20000), (500000, 20000)]
+)
+def test_get_mdl_n_smpls(n_avail, n_smpls):
+    assert gmw_smpl_tools.get_mdl_n_smpls(n_avail) == n_smpls
+
+
+def test_stratified_sample_idxs():
+    rng = numpy.random.default_rng(0)
+    data_cls = rng.choice([1, 2, 3], size=5000, p=[0.7, 0.2, 0.1])
+    data_tiles = rng.choice(["t1", "t2"], size=5000)
+    smpl_idxs = gmw_smpl_tools.stratified_sample_idxs(
+        [data_cls, data_tiles], 600, seed=42
+    )
+    assert len(smpl_idxs) == 600
+    assert numpy.all(numpy.diff(smpl_idxs) > 0)
+    # Balanced between the classes and then the tiles.
+    for cls_val in [1, 2, 3]:
+        cls_msk = data_cls[smpl_idxs] == cls_val
+        assert cls_msk.sum() == 200
+        assert (data_tiles[smpl_idxs][cls_msk] == "t1").sum() == 100
+    # Reproducible for a seed.
+    numpy.testing.assert_array_equal(
+        smpl_idxs,
+        gmw_smpl_tools.stratified_sample_idxs([data_cls, data_tiles], 600, seed=42),
+    )
+    assert not numpy.array_equal(
+        smpl_idxs,
+        gmw_smpl_tools.stratified_sample_idxs([data_cls, data_tiles], 600, seed=1),
+    )
+    # A simple random sample of a number of rows.
+    smpl_idxs = gmw_smpl_tools.stratified_sample_idxs(100, 10, seed=42)
+    assert len(numpy.unique(smpl_idxs)) == 10
+    assert smpl_idxs.max() < 100
+    assert len(gmw_smpl_tools.stratified_sample_idxs(5, 10)) == 5
@@ -0,0 +1,39 @@
+import numpy
+import pandas
+import pytest
+
+import gmw_smpl_tools
+import gmw_tile_tools
+
+
+def test_get_pt_tile_names():
+    geopandas = pytest.importorskip("geopandas")
+    tiles_df = pandas.DataFrame(
+        {"gmw_tile_name": ["T1", "T2"], "MinX": [100.0, 101.0], "MinY": [1.0, 1.0]}
+    )
+    rng = numpy.random.default_rng(42)
+    # 900 points in T1, 100 in T2, one on the shared edge and one outside.
+    pts_xs = numpy.concatenate(
+        [rng.uniform(100.1, 100.9, 900), rng.uniform(101.1, 101.9, 100), [101.0, 105.5]]
+    )
+    pts_ys = numpy.concatenate([rng.uniform(1.1, 1.9, 1000), [1.5, 1.5]])
+    pts_gdf = geopandas.GeoDataFrame(
+        geometry=geopandas.points_from_xy(pts_xs, pts_ys), crs="EPSG:4326"
+    )
+
+    tile_pt_idxs = gmw_tile_tools.get_tile_pt_idxs(pts_gdf, tiles_df, "gmw_tile_name")
+    assert len(tile_pt_idxs["T1"]) == 901
+    assert len(tile_pt_idxs["T2"]) == 101
+    pt_tiles = gmw_tile_tools.get_pt_tile_names(len(pts_gdf), tile_pt_idxs)
+    assert (pt_tiles == "T1").sum() == 901
+    assert (pt_tiles == "T2").sum() == 100
+    assert pt_tiles[-1] == ""
+
+    # Stratified by tile the sample is spread equally between the tiles.
+    in_tile_msk = pt_tiles != ""
+    smpl_idxs = gmw_smpl_tools.stratified_sample_idxs(
+        [pt_tiles[in_tile_msk]], 200, seed=42
+    )
+    smpl_tiles = pt_tiles[in_tile_msk][smpl_idxs]
+    assert (smpl_tiles == "T1").sum() == 100
+    assert (smpl_tiles == "T2").sum() == 100
@@ -0,0 +1,86 @@
+import numpy
+import pytest
+
+geopandas = pytest.importorskip("geopandas")
+shapely_geometry = pytest.importorskip("shapely.geometry")
+
+import gmw_vec_tools  # noqa: E402
+
+
+def get_test_pts_gdf(n_pts=2000):
+    rng = numpy.random.default_rng(42)
+    return geopandas.GeoDataFrame(
+        {"pt_id": numpy.arange(n_pts), "ref_cls": rng.integers(1, 4, n_pts)},
+        geometry=geopandas.points_from_xy(
+            rng.uniform(100.0, 103.0, n_pts), rng.uniform(0.0, 2.0, n_pts)
+        ),
+        crs="EPSG:4326",
+    )
+
+
+def get_test_roi_gdf():
+    return geopandas.GeoDataFrame(
+        {"gmw_prj": ["P1", "P1", "P2", "P3", "P4"]},
+        geometry=[
+            shapely_geometry.box(100.0, 0.0, 101.0, 1.0),
+            shapely_geometry.box(100.5, 0.5, 101.5, 2.0),
+            shapely_geometry.box(101.0, 0.0, 103.0, 1.0),
+            shapely_geometry.box(102.5, 1.5, 103.5, 2.5),
+            # Outside the points.
+            shapely_geometry.box(110.0, 0.0, 111.0, 1.0),
+        ],
+        crs="EPSG:4326",
+    )
+
+
+def test_get_roi_partition_idxs():
+    pts_gdf = get_test_pts_gdf()
+    roi_gdf = get_test_roi_gdf()
+    roi_idxs = gmw_vec_tools.get_roi_partition_idxs(pts_gdf, roi_gdf, "gmw_prj")
+    assert sorted(roi_idxs) == ["P1", "P2", "P3", "P4"]
+    assert roi_idxs["P4"] is None
+    for roi_val in ["P1", "P2", "P3"]:
+        # The same features, in the same order, as clipping.
+        clip_gdf = pts_gdf.clip(roi_gdf[roi_gdf["gmw_prj"] == roi_val])
+        numpy.testing.assert_array_equal(
+            pts_gdf["pt_id"].to_numpy()[roi_idxs[roi_val]],
+            clip_gdf["pt_id"].to_numpy(),
+        )
+    # Points in both the P1 polygons are only included once.
+    assert len(numpy.unique(roi_idxs["P1"])) == len(roi_idxs["P1"])
+
+    empty_idxs = gmw_vec_tools.get_roi_partition_idxs(
+        pts_gdf.iloc[:0], roi_gdf, "gmw_prj"
+    )
+    assert all(idxs is None for idxs in empty_idxs.values())
+
+
+@pytest.mark.parametrize(
+    "out_format, out_vec_ext",
+    [
+        ("PARQUET", "parquet.sz"),
+        ("GPKG", "gpkg"),
+        ("GeoJSON", "geojson"),
+        ("ESRI Shapefile", "shp"),
+    ],
+)
+def test_write_vec_gdf(tmp_path, out_format, out_vec_ext):
+    pts_gdf = get_test_pts_gdf(100)
+    out_vec_file = str(tmp_path / f"pts.{out_vec_ext}")
+    # A partial output from an earlier write is replaced.
+    (tmp_path / f".tmp_pts.{out_vec_ext}").mkdir()
+    gmw_vec_tools.write_vec_gdf(pts_gdf, out_vec_file, "pts", out_vec_ext, out_format)
+    out_gdf = gmw_vec_tools.read_vec_gdf(out_vec_file, "pts")
+    numpy.testing.assert_array_equal(out_gdf["pt_id"], pts_gdf["pt_id"])
+    assert not any(p.name.startswith(".tmp_") for p in tmp_path.iterdir())
+    if out_format == "ESRI Shapefile":
+        assert (tmp_path / "pts.dbf").exists()
+
+
+def test_write_vec_gdf_failed(tmp_path):
+    out_vec_file = str(tmp_path / "pts.gpkg")
+    with pytest.raises(Exception):
+        gmw_vec_tools.write_vec_gdf(
+            get_test_pts_gdf(100), out_vec_file, "pts", "gpkg", "NOT_A_DRIVER"
+        )
+    assert list(tmp_path.iterdir()) == []